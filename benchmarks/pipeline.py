@@ -0,0 +1,577 @@
+"""
+End-to-end benchmark of the webhook -> enqueue_message -> Manager -> scan tasks -> caught messages pipeline.
+
+Everything runs in one process against local stand-ins, so neither a Slack
+workspace nor RabbitMQ or MySQL is needed:
+
+- the Django webserver (ASGI, served by uvicorn) on a temporary sqlite database;
+- a fake Slack API serving attachment downloads, chat.delete and conversations.join;
+- an in-memory broker standing in for RabbitMQ, consumed by the processor's Managers;
+- a generator sending signed Slack message events, some with PDF attachments.
+
+Run from the repository root with the webserver and processor requirements installed:
+
+    python benchmarks/pipeline.py --messages 500 --concurrency 20 --pdf-ratio 0.2
+    python benchmarks/pipeline.py --texts corpus.txt --pdf-dir ./pdfs
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import queue
+import random
+import resource
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Optional
+
+import aiohttp
+from aiohttp import web
+from webhook_load import percentile, sign
+
+ROOT = Path(__file__).resolve().parent.parent
+SIGNING_SECRET = "benchmark-signing-secret"
+
+STAGES = (
+    "pattern_fetch",
+    "regex_scan",
+    "download",
+    "extraction",
+    "caught_message_post",
+)
+
+PATTERNS = [
+    ("SSN", r"\b\d{3}-\d{2}-\d{4}\b"),
+    ("Credit Card", r"\b\d{4}-?\d{4}-?\d{4}-?\d{4}\b"),
+]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class InMemoryMessage:
+    """
+    The parts of an aio_pika IncomingMessage the Manager uses.
+    """
+
+    def __init__(
+        self, broker: "InMemoryBroker", queue_name: str, body: bytes, headers: dict
+    ):
+        self.broker = broker
+        self.queue_name = queue_name
+        self.body = body
+        self.headers = headers
+        self.content_type = "application/json"
+
+    async def ack(self) -> None:
+        self.broker.on_ack(self)
+
+
+class InMemoryQueue:
+    """
+    One queue of the broker, consumed by a Manager like an aio_pika queue.
+    """
+
+    def __init__(self):
+        self._queue: asyncio.Queue = asyncio.Queue()
+
+    def put(self, message: InMemoryMessage) -> None:
+        self._queue.put_nowait(message)
+
+    def iterator(self) -> "InMemoryQueue":
+        return self
+
+    async def __aenter__(self) -> "InMemoryQueue":
+        return self
+
+    async def __aexit__(self, *exc_info) -> bool:
+        return False
+
+    def __aiter__(self) -> "InMemoryQueue":
+        return self
+
+    async def __anext__(self) -> InMemoryMessage:
+        return await self._queue.get()
+
+
+class InMemoryBroker:
+    """
+    Stands in for RabbitMQ on both sides: the webserver publishes into it from
+    its background threads like into RabbitMQPublisher, and a Manager per
+    queue consumes it like an aio_pika connection. Records the end-to-end
+    latency of every acked task by queue. Slack deletions are kept apart for
+    the deletion worker.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, expected: int):
+        self.loop = loop
+        self.expected = expected
+        self.is_closed = False
+
+        self.published = 0
+        self.acked = 0
+        self.latencies: dict[str, list[float]] = {}
+        self.done = asyncio.Event()
+        self.deletions: queue.Queue = queue.Queue()
+        self.queues: dict[str, InMemoryQueue] = {}
+
+    def queue(self, queue_name: str) -> InMemoryQueue:
+        if queue_name not in self.queues:
+            self.queues[queue_name] = InMemoryQueue()
+        return self.queues[queue_name]
+
+    # Publisher side, called from the webserver's threads
+    def publish(self, queue_name: str, body: str, properties=None) -> None:
+        if queue_name == "slack_deletions":
+            self.deletions.put(body.encode())
+            return
+
+        headers = dict(getattr(properties, "headers", None) or {})
+        message = InMemoryMessage(self, queue_name, body.encode(), headers)
+        self.loop.call_soon_threadsafe(self._publish, message)
+
+    def broadcast(self, exchange: str, body: str, properties=None) -> None:
+        pass
+
+    def _publish(self, message: InMemoryMessage) -> None:
+        self.published += 1
+        self.queue(message.queue_name).put(message)
+
+    def on_ack(self, message: InMemoryMessage) -> None:
+        latency = time.time() - message.headers["enqueued_at"]
+        self.latencies.setdefault(message.queue_name, []).append(latency)
+        self.acked += 1
+        if self.acked >= self.expected:
+            self.done.set()
+
+    async def close(self) -> None:
+        self.is_closed = True
+
+
+class FakeSlack:
+    """
+    Serves the Slack Web API calls the pipeline makes, plus attachment downloads.
+    """
+
+    def __init__(self, files: dict[str, bytes]):
+        self.files = files
+        self.deleted = 0
+        self.downloads = 0
+        self._runner: Optional[web.AppRunner] = None
+
+    async def download(self, request: web.Request) -> web.Response:
+        content = self.files.get(request.match_info["name"])
+        if content is None:
+            return web.Response(status=404)
+        self.downloads += 1
+        return web.Response(body=content, content_type="application/pdf")
+
+    async def chat_delete(self, request: web.Request) -> web.Response:
+        self.deleted += 1
+        return web.json_response({"ok": True})
+
+    async def ok(self, request: web.Request) -> web.Response:
+        return web.json_response({"ok": True})
+
+    async def start(self, port: int) -> None:
+        app = web.Application()
+        app.router.add_get("/files/{name}", self.download)
+        app.router.add_post("/api/chat.delete", self.chat_delete)
+        app.router.add_post("/api/conversations.join", self.ok)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, "127.0.0.1", port).start()
+
+    async def close(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+
+def load_texts(path: Optional[str], count: int, hit_ratio: float) -> list[str]:
+    """
+    Message texts from a corpus file, one per line, or generated ones where
+    ``hit_ratio`` of them carry a fake SSN.
+    """
+    if path:
+        lines = [line.strip() for line in Path(path).read_text().splitlines()]
+        lines = [line for line in lines if line]
+        return [lines[index % len(lines)] for index in range(count)]
+
+    rng = random.Random(0)
+    texts = []
+    for index in range(count):
+        words = " ".join(
+            rng.choice(["status", "update", "deploy", "ok"]) for _ in range(12)
+        )
+        if rng.random() < hit_ratio:
+            words += f" SSN 123-45-{index % 10000:04d}"
+        texts.append(f"benchmark message {index} {words}")
+    return texts
+
+
+def load_pdfs(path: Optional[str], pages: int, count: int = 10) -> dict[str, bytes]:
+    """
+    PDFs from a corpus directory, or generated ones; every other one has a hit.
+    """
+    if path:
+        return {pdf.name: pdf.read_bytes() for pdf in sorted(Path(path).glob("*.pdf"))}
+
+    from tests.pdf import make_pdf
+
+    pdfs = {}
+    for index in range(count):
+        page_texts = [f"quarterly report page {page}" for page in range(pages)]
+        if index % 2 == 0:
+            page_texts[-1] += " card 4111-1111-1111-1111"
+        pdfs[f"report-{index}.pdf"] = make_pdf(page_texts)
+    return pdfs
+
+
+def message_event(
+    index: int, text: str, attachment: Optional[tuple[int, str, bytes]], slack_url: str
+) -> dict:
+    files = []
+    if attachment is not None:
+        number, name, content = attachment
+        files.append(
+            {
+                # The same corpus file is shared again under the same id
+                "id": f"FBENCH{number}",
+                "name": name,
+                "filetype": "pdf",
+                "mimetype": "application/pdf",
+                "size": len(content),
+                "url_private": f"{slack_url}/files/{name}",
+            }
+        )
+
+    return {
+        "type": "event_callback",
+        "event_id": f"Ev{uuid.uuid4().hex[:10].upper()}",
+        "event_time": int(time.time()),
+        "event": {
+            "type": "message",
+            "user": "UBENCH",
+            "channel": f"CBENCH{index % 10}",
+            "ts": f"{time.time():.6f}",
+            "text": text,
+            "files": files,
+        },
+    }
+
+
+async def send_event(
+    session: aiohttp.ClientSession, url: str, event: dict
+) -> tuple[int, float]:
+    body = json.dumps(event).encode()
+    timestamp = str(int(time.time()))
+    headers = {
+        "Content-Type": "application/json",
+        "X-Slack-Request-Timestamp": timestamp,
+        "X-Slack-Signature": sign(SIGNING_SECRET, timestamp, body),
+    }
+
+    start = time.perf_counter()
+    async with session.post(url, data=body, headers=headers) as response:
+        await response.read()
+        return response.status, time.perf_counter() - start
+
+
+def histogram_quantile(value, q: float) -> float:
+    """
+    Estimate a quantile from histogram buckets the way Prometheus does.
+    """
+    if not value.count:
+        return 0.0
+
+    rank = q * value.count
+    cumulative = 0
+    lower = 0.0
+    for bound, count in zip(value.buckets, value.counts):
+        if cumulative + count >= rank:
+            if bound == float("inf"):
+                return lower
+            return lower + (bound - lower) * (rank - cumulative) / max(count, 1)
+        cumulative += count
+        lower = bound
+    return lower
+
+
+def format_ms(values: list[float]) -> str:
+    if not values:
+        return "n/a"
+    values = [value * 1000 for value in values]
+    return (
+        f"p50 {percentile(values, 50):.1f} ms, p90 {percentile(values, 90):.1f} ms, "
+        f"p99 {percentile(values, 99):.1f} ms, mean {statistics.mean(values):.1f} ms"
+    )
+
+
+def configure_environment(workdir: str, webserver_port: int, slack_port: int) -> None:
+    os.environ.update(
+        {
+            "DJANGO_SETTINGS_MODULE": "config.settings",
+            "DJANGO_SECRET_KEY": "benchmark",
+            "DB_ENGINE": "sqlite",
+            "DB_NAME": os.path.join(workdir, "benchmark.sqlite3"),
+            "SLACK_SIGNING_SECRET": SIGNING_SECRET,
+            "SLACK_BOT_TOKEN": "xoxb-benchmark",
+            "SLACK_BOT_USER": "xoxp-benchmark",
+            "SLACK_API_BASE_URL": f"http://127.0.0.1:{slack_port}/api/",
+            "WEBSERVER_BASE_URL": f"http://localhost:{webserver_port}",
+            "METRICS_PORT": "0",
+        }
+    )
+    sys.path[:0] = [str(ROOT), str(ROOT / "dlp_processor")]
+
+
+def setup_webserver(broker: InMemoryBroker) -> None:
+    import django
+    from django.core.management import call_command
+
+    django.setup()
+    call_command("migrate", verbosity=0)
+
+    import dlp.signals
+    import dlp.utils
+    from dlp.models import Pattern
+    from rest_framework_api_key.models import APIKey
+
+    dlp.utils.publisher = broker
+    dlp.signals.publisher = broker
+
+    for name, regex in PATTERNS:
+        Pattern.objects.create(name=name, regex_pattern=regex)
+    _, key = APIKey.objects.create_key(name="benchmark")
+    os.environ["WEBSERVER_API_KEY"] = key
+
+
+def worker_peak_memory(pools: list) -> Optional[float]:
+    """
+    The peak resident memory in MiB of the largest live worker of the pools,
+    from the VmHWM of /proc/<pid>/status. None when no worker could be read,
+    e.g. no pool was used or /proc is not available.
+    """
+    peaks = []
+    for pool in pools:
+        executor = pool._executor
+        processes = executor._processes if executor is not None else None
+        for pid in list(processes or {}):
+            try:
+                with open(f"/proc/{pid}/status") as f:
+                    for line in f:
+                        if line.startswith("VmHWM:"):
+                            peaks.append(int(line.split()[1]) / 1024)
+            except OSError:
+                continue
+    return max(peaks, default=None)
+
+
+def start_deletion_worker(broker: InMemoryBroker, rate_per_minute: float):
+    from dlp.deletions import DeletionWorker, RateLimiter
+
+    worker = DeletionWorker(limiter=RateLimiter(rate_per_minute))
+
+    def consume():
+        for body in iter(broker.deletions.get, None):
+            worker.handle(body)
+
+    thread = threading.Thread(target=consume, daemon=True)
+    thread.start()
+    return thread
+
+
+def start_webserver(port: int):
+    import uvicorn
+    from config.asgi import application
+
+    server = uvicorn.Server(
+        uvicorn.Config(application, host="127.0.0.1", port=port, log_level="warning")
+    )
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread
+
+
+async def run(args: argparse.Namespace) -> None:
+    workdir = tempfile.TemporaryDirectory()
+    webserver_port, slack_port = free_port(), free_port()
+    configure_environment(workdir.name, webserver_port, slack_port)
+
+    texts = load_texts(args.texts, args.messages, args.hit_ratio)
+    pdfs = load_pdfs(args.pdf_dir, args.pdf_pages)
+    rng = random.Random(1)
+
+    slack_url = f"http://127.0.0.1:{slack_port}"
+    pdf_items = [(number, *item) for number, item in enumerate(pdfs.items())]
+    events = [
+        message_event(
+            index,
+            text,
+            (
+                rng.choice(pdf_items)
+                if pdf_items and rng.random() < args.pdf_ratio
+                else None
+            ),
+            slack_url,
+        )
+        for index, text in enumerate(texts)
+    ]
+    # The webserver queues a task for the text and one per attachment
+    tasks = sum(
+        int(bool(event["event"]["text"]) or not event["event"]["files"])
+        + len(event["event"]["files"])
+        for event in events
+    )
+
+    loop = asyncio.get_running_loop()
+    broker = InMemoryBroker(loop, expected=tasks)
+    slack = FakeSlack(pdfs)
+    await slack.start(slack_port)
+
+    await asyncio.to_thread(setup_webserver, broker)
+    server, thread = await asyncio.to_thread(start_webserver, webserver_port)
+    deletion_thread = start_deletion_worker(broker, args.delete_rate)
+
+    from extraction import extraction_pool, scan_pool
+    from http_client import http_client
+    from main import FILE_MANAGER_CONCURRENCY, tasks as processor_tasks
+    from manager import Manager
+    from metrics import QUEUE_WAIT_SECONDS, STAGE_SECONDS
+
+    # One Manager per lane, as in the processor's main.py
+    manager = Manager(
+        queue_name="slack_messages",
+        tasks=processor_tasks,
+        on_startup=[http_client.start],
+        on_shutdown=[http_client.close, extraction_pool.shutdown, scan_pool.shutdown],
+        # The in-memory broker has no queue stats to read
+        stats_interval=0,
+    )
+    file_manager = Manager(
+        queue_name="slack_files",
+        tasks=processor_tasks,
+        concurrency=FILE_MANAGER_CONCURRENCY,
+        stats_interval=0,
+    )
+    for lane in (manager, file_manager):
+        lane.connection = broker
+        lane.queue = broker.queue(lane.queue_name)
+
+    url = f"http://localhost:{webserver_port}/slack/events"
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    connector = aiohttp.TCPConnector(limit=args.concurrency)
+
+    async def bounded(session: aiohttp.ClientSession, event: dict) -> tuple[int, float]:
+        async with semaphore:
+            return await send_event(session, url, event)
+
+    # The processor prints every message it scans
+    with contextlib.redirect_stdout(io.StringIO()):
+        consumers = [
+            asyncio.create_task(manager.main()),
+            asyncio.create_task(file_manager.main()),
+        ]
+        start = time.perf_counter()
+        async with aiohttp.ClientSession(connector=connector) as session:
+            acks = await asyncio.gather(*(bounded(session, event) for event in events))
+        sent = time.perf_counter()
+
+        try:
+            await asyncio.wait_for(broker.done.wait(), timeout=args.timeout)
+        except asyncio.TimeoutError:
+            pass
+        elapsed = time.perf_counter() - start
+        # Read before the Managers shut the pools and their workers down
+        workers = worker_peak_memory([extraction_pool, scan_pool])
+
+        for consumer in consumers:
+            consumer.cancel()
+        await asyncio.gather(*consumers, return_exceptions=True)
+        await file_manager.close()
+        await manager.close()
+
+    from dlp.models import CaughtMessage
+
+    caught = await asyncio.to_thread(CaughtMessage.objects.count)
+
+    server.should_exit = True
+    await asyncio.to_thread(thread.join)
+    broker.deletions.put(None)
+    await asyncio.to_thread(deletion_thread.join)
+    await slack.close()
+    workdir.cleanup()
+
+    processed = broker.acked
+    statuses = {}
+    for status, _ in acks:
+        statuses[status] = statuses.get(status, 0) + 1
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    def report(label: str, text: str) -> None:
+        print(f"{label + ':':<21}{text}")
+
+    def quantiles(value) -> str:
+        p50 = histogram_quantile(value, 0.5) * 1000
+        p99 = histogram_quantile(value, 0.99) * 1000
+        return f"p50 {p50:.1f} ms, p99 {p99:.1f} ms"
+
+    report("messages", f"{args.messages} sent, {processed} of {tasks} tasks processed")
+    report(
+        "webhook", f"{args.messages / (sent - start):.1f} events/s, statuses {statuses}"
+    )
+    report("pipeline", f"{processed / elapsed:.1f} tasks/s over {elapsed:.2f} s")
+    report("ack latency", format_ms([latency for _, latency in acks]))
+    for queue_name, latencies in sorted(broker.latencies.items()):
+        lane = queue_name.removeprefix("slack_")
+        report(f"end to end {lane}", format_ms(latencies))
+    report("queue wait", quantiles(QUEUE_WAIT_SECONDS.labels()))
+    for stage in STAGES:
+        value = STAGE_SECONDS.labels(stage)
+        report(stage, f"{value.count} calls, {quantiles(value)}")
+    report(
+        "caught messages", f"{caught} stored, {slack.deleted} Slack messages deleted"
+    )
+    report("downloads", str(slack.downloads))
+    largest = "n/a" if workers is None else f"{workers:.0f} MiB"
+    report("peak memory", f"{own:.0f} MiB (process), {largest} (largest worker)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--texts", help="file with one message text per line")
+    parser.add_argument("--hit-ratio", type=float, default=0.1)
+    parser.add_argument("--pdf-dir", help="directory of PDFs to attach")
+    parser.add_argument("--pdf-ratio", type=float, default=0.2)
+    parser.add_argument("--pdf-pages", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument(
+        "--delete-rate",
+        type=float,
+        default=60000,
+        help="Slack deletions per minute, well above Slack's own limit by default",
+    )
+    args = parser.parse_args()
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+"""
+Load test how processor throughput scales with the number of replicas.
+
+The same backlog of scan_message tasks is drained by 1 to N replicas, each a
+process of its own running the processor's Manager and its real scan_message
+task against a local RabbitMQ, such as the one of docker-compose.yml:
+
+    RABBITMQ_USER=localuser RABBITMQ_PASSWORD=localpassword \\
+        python benchmarks/replicas.py --replicas 1 2 4 --messages 20000
+
+The replicas fetch their patterns from, and report caught messages to, the
+Django webserver served by this process on a temporary sqlite database, as in
+pipeline.py. Throughput is measured between 10% and 90% of the backlog done,
+from the dlp_tasks_total counters the replicas serve, so start-up and the tail
+are left out. The run fails when a replica count scales below --min-efficiency
+of linear.
+
+Replicas share one host here, so the measured scaling is bounded by its cores
+and by the single webserver, not only by the processor.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from typing import Optional
+
+import aio_pika
+import aiohttp
+from pipeline import (
+    InMemoryBroker,
+    configure_environment,
+    free_port,
+    load_texts,
+    setup_webserver,
+    start_webserver,
+)
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def serve(args: argparse.Namespace) -> None:
+    """
+    Run one processor replica consuming ``args.queue`` until it is killed,
+    with the tasks and resources of the processor's main.py.
+    """
+    sys.path.insert(0, str(ROOT / "dlp_processor"))
+    from extraction import extraction_pool, scan_pool
+    from http_client import http_client
+    from main import tasks
+    from manager import Manager
+    from metrics import metrics_server
+
+    manager = Manager(
+        queue_name=args.queue,
+        tasks=tasks,
+        concurrency=args.concurrency,
+        on_startup=[metrics_server.start, http_client.start],
+        on_shutdown=[
+            http_client.close,
+            extraction_pool.shutdown,
+            scan_pool.shutdown,
+            metrics_server.close,
+        ],
+    )
+    asyncio.get_event_loop().run_until_complete(manager.main())
+
+
+async def fill_queue(
+    channel: aio_pika.abc.AbstractChannel, queue: str, texts: list[str]
+) -> None:
+    batch = 500
+    for start in range(0, len(texts), batch):
+        await asyncio.gather(
+            *(
+                channel.default_exchange.publish(
+                    aio_pika.Message(
+                        json.dumps(
+                            {
+                                "task": "scan_message",
+                                "args": [texts[index]],
+                                "kwargs": {
+                                    "additional_info": {
+                                        "user": "UBENCH",
+                                        "channel": queue,
+                                        "ts": f"{index}.000000",
+                                    }
+                                },
+                            }
+                        ).encode(),
+                        headers={"enqueued_at": time.time()},
+                    ),
+                    routing_key=queue,
+                )
+                for index in range(start, min(start + batch, len(texts)))
+            )
+        )
+
+
+async def scrape(session: aiohttp.ClientSession, port: int) -> dict[str, float]:
+    """
+    The samples of the metrics a replica serves, by name and labels.
+    """
+    try:
+        async with session.get(f"http://127.0.0.1:{port}/metrics") as response:
+            text = await response.text()
+    except aiohttp.ClientError:
+        return {}
+
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+    return samples
+
+
+def tasks_done(samples: dict[str, float]) -> float:
+    return sum(
+        value
+        for name, value in samples.items()
+        if name.startswith("dlp_tasks_total{") and 'status="ok"' in name
+    )
+
+
+async def run_replicas(
+    args: argparse.Namespace, connection: aio_pika.abc.AbstractConnection, count: int
+) -> tuple[float, Optional[float], Optional[float]]:
+    """
+    Drain a backlog with ``count`` replicas. Returns the throughput, and the
+    drain time the replicas estimated halfway through next to the actual one.
+    """
+    queue_name = f"bench_replicas_{uuid.uuid4().hex[:8]}"
+    channel = await connection.channel()
+    queue = await channel.declare_queue(queue_name, durable=True)
+    await fill_queue(
+        channel, queue_name, load_texts(None, args.messages, args.hit_ratio)
+    )
+
+    ports = [free_port() for _ in range(count)]
+    env = {
+        **os.environ,
+        "RABBITMQ_HOST": args.host,
+        "MANAGER_QUEUE_STATS_INTERVAL": "1",
+    }
+    replicas = [
+        subprocess.Popen(
+            [
+                sys.executable,
+                __file__,
+                "--serve",
+                "--queue",
+                queue_name,
+                "--concurrency",
+                str(args.concurrency),
+            ],
+            env={**env, "METRICS_PORT": str(port)},
+            stdout=subprocess.DEVNULL,
+        )
+        for port in ports
+    ]
+
+    marks: dict[float, float] = {}
+    estimate = halfway = None
+    deadline = time.monotonic() + args.timeout
+    try:
+        async with aiohttp.ClientSession() as session:
+            while time.monotonic() < deadline:
+                samples = await asyncio.gather(*(scrape(session, p) for p in ports))
+                now = time.monotonic()
+                done = sum(tasks_done(replica) for replica in samples)
+
+                for mark in (0.1, 0.5, 0.9, 1.0):
+                    if mark not in marks and done >= mark * args.messages:
+                        marks[mark] = now
+                if halfway is None and 0.5 in marks:
+                    halfway = now
+                    drain = f'dlp_queue_drain_seconds{{queue="{queue_name}"}}'
+                    estimate = samples[0].get(drain)
+                if 1.0 in marks:
+                    break
+                await asyncio.sleep(0.1)
+    finally:
+        for replica in replicas:
+            replica.terminate()
+        for replica in replicas:
+            replica.wait()
+        await queue.delete(if_unused=False, if_empty=False)
+        await channel.close()
+
+    if 0.9 not in marks:
+        raise SystemExit(f"{count} replicas did not drain the queue in time")
+    throughput = 0.8 * args.messages / (marks[0.9] - marks[0.1])
+    actual = marks[1.0] - halfway if 1.0 in marks else None
+    return throughput, estimate, actual
+
+
+async def run(args: argparse.Namespace) -> int:
+    workdir = tempfile.TemporaryDirectory()
+    webserver_port = free_port()
+    configure_environment(workdir.name, webserver_port, slack_port=free_port())
+
+    # Caught messages queue Slack deletions, which nothing consumes here
+    publisher = InMemoryBroker(asyncio.get_running_loop(), expected=0)
+    await asyncio.to_thread(setup_webserver, publisher)
+    server, thread = await asyncio.to_thread(start_webserver, webserver_port)
+
+    connection = await aio_pika.connect(
+        host=args.host,
+        login=str(os.getenv("RABBITMQ_USER")),
+        password=str(os.getenv("RABBITMQ_PASSWORD")),
+    )
+    results = {}
+    try:
+        async with connection:
+            for count in args.replicas:
+                results[count] = await run_replicas(args, connection, count)
+    finally:
+        server.should_exit = True
+        await asyncio.to_thread(thread.join)
+        workdir.cleanup()
+
+    base = results[args.replicas[0]][0] / args.replicas[0]
+    print(
+        f"{'replicas':>8} {'tasks/s':>10} {'speedup':>8} {'efficiency':>10} "
+        f"{'drain estimate':>15} {'actual':>8}"
+    )
+    failed = False
+    for count, (throughput, estimate, actual) in results.items():
+        efficiency = throughput / (base * count)
+        failed = failed or efficiency < args.min_efficiency
+        print(
+            f"{count:>8} {throughput:>10.1f} {throughput / base:>8.2f} "
+            f"{efficiency:>10.0%} "
+            f"{'-' if estimate is None else f'{estimate:.1f} s':>15} "
+            f"{'-' if actual is None else f'{actual:.1f} s':>8}"
+        )
+    return 1 if failed else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--replicas", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument(
+        "--hit-ratio",
+        type=float,
+        default=0.1,
+        help="share of messages carrying a fake SSN, reported as caught messages",
+    )
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--min-efficiency", type=float, default=0.8)
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--queue", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+    else:
+        sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Load test the Slack webhook with bursts of concurrent, signed events.
+
+Reports how long the webserver takes to acknowledge events, which Slack
+expects within 3 seconds:
+
+    python benchmarks/webhook_load.py --url http://localhost:8000/slack/events \
+        --secret "$SLACK_SIGNING_SECRET" --requests 2000 --concurrency 100
+"""
+
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import statistics
+import time
+import uuid
+from collections import Counter
+
+import aiohttp
+
+
+def sign(secret: str, timestamp: str, body: bytes) -> str:
+    """
+    Build the X-Slack-Signature header for a request body.
+    """
+    base = f"v0:{timestamp}:".encode() + body
+    return "v0=" + hmac.new(secret.encode(), base, hashlib.sha256).hexdigest()
+
+
+def message_event(index: int) -> dict:
+    """
+    A Slack message event; every tenth one carries a fake SSN.
+    """
+    text = f"load test message {index}"
+    if index % 10 == 0:
+        text += " SSN 123-45-6789"
+
+    return {
+        "type": "event_callback",
+        "event_id": f"Ev{uuid.uuid4().hex[:10].upper()}",
+        "event_time": int(time.time()),
+        "event": {
+            "type": "message",
+            "user": "ULOADTEST",
+            "channel": "CLOADTEST",
+            "ts": f"{time.time():.6f}",
+            "text": text,
+            "files": [],
+        },
+    }
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def send_event(
+    session: aiohttp.ClientSession, url: str, secret: str, index: int
+) -> tuple[int, float]:
+    body = json.dumps(message_event(index)).encode()
+    timestamp = str(int(time.time()))
+    headers = {
+        "Content-Type": "application/json",
+        "X-Slack-Request-Timestamp": timestamp,
+        "X-Slack-Signature": sign(secret, timestamp, body),
+    }
+
+    start = time.perf_counter()
+    try:
+        async with session.post(url, data=body, headers=headers) as response:
+            await response.read()
+            status = response.status
+    except aiohttp.ClientError:
+        status = 0
+    return status, time.perf_counter() - start
+
+
+async def run(url: str, secret: str, requests: int, concurrency: int) -> None:
+    semaphore = asyncio.Semaphore(concurrency)
+    connector = aiohttp.TCPConnector(limit=concurrency)
+
+    async with aiohttp.ClientSession(connector=connector) as session:
+
+        async def bounded(index: int) -> tuple[int, float]:
+            async with semaphore:
+                return await send_event(session, url, secret, index)
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(bounded(index) for index in range(requests)))
+        elapsed = time.perf_counter() - start
+
+    statuses = Counter(status for status, _ in results)
+    latencies = [latency * 1000 for _, latency in results]
+
+    print(f"requests:    {requests} ({concurrency} concurrent)")
+    print(f"throughput:  {requests / elapsed:.1f} events/s")
+    print(f"statuses:    {dict(statuses)}")
+    print(
+        f"ack latency: p50 {percentile(latencies, 50):.1f} ms, "
+        f"p90 {percentile(latencies, 90):.1f} ms, "
+        f"p99 {percentile(latencies, 99):.1f} ms, "
+        f"max {max(latencies):.1f} ms, "
+        f"mean {statistics.mean(latencies):.1f} ms"
+    )
+    slow = sum(1 for latency in latencies if latency >= 3000)
+    print(f"over 3s:     {slow}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default="http://localhost:8000/slack/events")
+    parser.add_argument("--secret", default=os.getenv("SLACK_SIGNING_SECRET", ""))
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    asyncio.run(run(args.url, args.secret, args.requests, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -14,7 +14,6 @@ import os
 import time
 from pathlib import Path
 
-import MySQLdb
 from dotenv import load_dotenv
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -83,6 +82,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "config.wsgi.application"
+ASGI_APPLICATION = "config.asgi.application"
 
 
 # Database
@@ -102,25 +102,60 @@ DATABASES = {
     }
 }
 
+# DB_ENGINE=sqlite runs without MySQL, e.g. for the benchmarks in benchmarks/
+if os.getenv("DB_ENGINE") == "sqlite":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.getenv("DB_NAME") or BASE_DIR / "db.sqlite3",
+            # Concurrent bulk ingestion reads before it writes in a transaction,
+            # which fails with "database is locked" unless the write lock is
+            # taken up front
+            "OPTIONS": {"transaction_mode": "IMMEDIATE", "timeout": 20},
+        }
+    }
+
 # Retry logic
 MAX_RETRIES = 5
 RETRY_DELAY = 5  # seconds
 
-for attempt in range(MAX_RETRIES):
-    try:
-        conn = MySQLdb.connect(
-            host=DATABASES["default"]["HOST"],
-            user=DATABASES["default"]["USER"],
-            passwd=DATABASES["default"]["PASSWORD"],
-            db=DATABASES["default"]["NAME"],
-        )
-        conn.close()
-        break
-    except MySQLdb.OperationalError:
-        if attempt < MAX_RETRIES - 1:
-            time.sleep(RETRY_DELAY)
-        else:
-            raise
+if DATABASES["default"]["ENGINE"] == "django.db.backends.mysql":
+    import MySQLdb
+
+    for attempt in range(MAX_RETRIES):
+        try:
+            conn = MySQLdb.connect(
+                host=DATABASES["default"]["HOST"],
+                user=DATABASES["default"]["USER"],
+                passwd=DATABASES["default"]["PASSWORD"],
+                db=DATABASES["default"]["NAME"],
+            )
+            conn.close()
+            break
+        except MySQLdb.OperationalError:
+            if attempt < MAX_RETRIES - 1:
+                time.sleep(RETRY_DELAY)
+            else:
+                raise
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/ref/settings/#caches
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    # Slack events already handled, so retries and duplicate deliveries are skipped
+    "slack_events": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "slack_events",
+        "TIMEOUT": int(os.getenv("SLACK_EVENT_DEDUPE_TTL", "3600")),
+        "OPTIONS": {
+            "MAX_ENTRIES": int(os.getenv("SLACK_EVENT_DEDUPE_ENTRIES", "100000")),
+        },
+    },
+}
 
 
 # Password validation
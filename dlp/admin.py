@@ -1,5 +1,7 @@
 from django.contrib import admin
+from django.db import connection
 
+from .lookups import boolean_mode_query
 from .models import CaughtMessage, Pattern
 
 
@@ -12,5 +14,18 @@ class PatternAdmin(admin.ModelAdmin):
 @admin.register(CaughtMessage)
 class CaughtMessageAdmin(admin.ModelAdmin):
     list_display = ("message_content", "pattern_matched", "created_at", "user_id")
+    list_select_related = ("pattern_matched",)
+    raw_id_fields = ("scanned_content",)
     search_fields = ("message_content",)
     list_filter = ("pattern_matched", "created_at")
+    # Counting every row of a large table on each page load is slow
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Search message contents through the FULLTEXT index on MySQL instead
+        of a LIKE over the whole table.
+        """
+        if boolean_mode_query(search_term) and connection.vendor == "mysql":
+            return queryset.filter(message_content__search=search_term), False
+        return super().get_search_results(request, queryset, search_term)
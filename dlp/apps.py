@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class DlpConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "dlp"
+
+    def ready(self):
+        from dlp import signals  # noqa: F401
@@ -0,0 +1,63 @@
+import hashlib
+import json
+import os
+
+from django.core.cache import cache, caches
+
+from dlp.models import Pattern
+from dlp.serializers import PatternSerializer
+
+PATTERN_LIST_CACHE_KEY = "dlp:pattern_list"
+PATTERN_LIST_CACHE_TTL = int(os.getenv("PATTERN_LIST_CACHE_TTL", "60"))
+SLACK_EVENT_CACHE_KEY = "dlp:slack_event:{}"
+
+
+def get_pattern_list() -> dict:
+    """
+    Return the serialized patterns together with their ETag. The result is
+    cached until a Pattern is saved or deleted, and for PATTERN_LIST_CACHE_TTL
+    seconds at most, since other webserver processes keep caches of their own.
+
+    There is no Last-Modified: the latest ``updated_at`` does not move when a
+    pattern is deleted, so it can't tell whether a copy is stale.
+    """
+    pattern_list = cache.get(PATTERN_LIST_CACHE_KEY)
+    if pattern_list is not None:
+        return pattern_list
+
+    data = [
+        dict(item) for item in PatternSerializer(Pattern.objects.all(), many=True).data
+    ]
+    serialized = json.dumps(data, sort_keys=True).encode()
+    pattern_list = {
+        "data": data,
+        "etag": f'"{hashlib.sha256(serialized).hexdigest()}"',
+    }
+    cache.set(PATTERN_LIST_CACHE_KEY, pattern_list, timeout=PATTERN_LIST_CACHE_TTL)
+    return pattern_list
+
+
+def invalidate_pattern_list() -> None:
+    cache.delete(PATTERN_LIST_CACHE_KEY)
+
+
+def _slack_event_key(channel: str, ts: str, event_id: str) -> str:
+    identity = f"{channel}:{ts}:{event_id}".encode()
+    return SLACK_EVENT_CACHE_KEY.format(hashlib.sha256(identity).hexdigest())
+
+
+async def claim_slack_event(channel: str, ts: str, event_id: str) -> bool:
+    """
+    Record a Slack message event as handled. Returns False when it already
+    was, e.g. for a retry Slack sent because the first delivery was slow.
+    """
+    key = _slack_event_key(channel, ts, event_id)
+    return await caches["slack_events"].aadd(key, True)
+
+
+def release_slack_event(channel: str, ts: str, event_id: str) -> None:
+    """
+    Forget a claimed Slack message event that could not be enqueued, so its
+    redelivery is handled instead of skipped.
+    """
+    caches["slack_events"].delete(_slack_event_key(channel, ts, event_id))
@@ -0,0 +1,259 @@
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+import pika
+from pika.adapters.blocking_connection import BlockingChannel
+from pika.exceptions import AMQPConnectionError, StreamLostError
+from slack_sdk import WebClient
+from slack_sdk.errors import SlackApiError
+
+from dlp.publisher import connection_parameters
+from dlp.utils import DELETION_QUEUE, SLACK_API_BASE_URL
+
+logger = logging.getLogger(__name__)
+
+# chat.delete is a Tier 3 method, about 50 calls per minute
+SLACK_DELETE_RATE_PER_MINUTE = float(os.getenv("SLACK_DELETE_RATE_PER_MINUTE", "50"))
+SLACK_DELETE_MAX_ATTEMPTS = int(os.getenv("SLACK_DELETE_MAX_ATTEMPTS", "5"))
+SLACK_DELETE_BACKOFF = float(os.getenv("SLACK_DELETE_BACKOFF", "1"))
+SLACK_DELETE_MAX_BACKOFF = 60.0
+
+# Messages deleted recently, so further hits on them are coalesced
+DELETED_MESSAGES_SIZE = int(os.getenv("DELETED_MESSAGES_SIZE", "10000"))
+DELETED_MESSAGES_TTL = float(os.getenv("DELETED_MESSAGES_TTL", "3600"))
+
+# Deletion requests that failed every attempt, kept like the processor's dead
+# letters so dlp_processor/dlq.py can list and requeue them
+DELETION_DEAD_LETTER_QUEUE = f"{DELETION_QUEUE}.dead"
+
+# Slack errors worth trying again, besides rate limiting and server errors
+RETRYABLE_ERRORS = {"internal_error", "fatal_error", "service_unavailable"}
+
+
+class RateLimiter:
+    """
+    A token bucket allowing ``rate_per_minute`` calls with bursts of up to
+    ``burst``. ``pause`` holds every call back, e.g. for a Retry-After.
+    """
+
+    def __init__(
+        self,
+        rate_per_minute: float,
+        burst: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.interval = 60.0 / rate_per_minute
+        self.burst = burst
+        self.clock = clock
+
+        self._tokens = float(burst)
+        self._updated = clock()
+        self._paused_until = 0.0
+
+    def pause(self, seconds: float) -> None:
+        self._paused_until = max(self._paused_until, self.clock() + seconds)
+
+    def delay(self) -> float:
+        """
+        Seconds to wait before the next call may be made.
+        """
+        now = self.clock()
+        self._tokens = min(
+            self.burst, self._tokens + (now - self._updated) / self.interval
+        )
+        self._updated = now
+
+        wait = max(0.0, self._paused_until - now)
+        if self._tokens < 1:
+            wait = max(wait, (1 - self._tokens) * self.interval)
+        return wait
+
+    def acquire(self, sleep: Callable[[float], None]) -> None:
+        wait = self.delay()
+        while wait > 0:
+            sleep(wait)
+            wait = self.delay()
+        self._tokens -= 1
+
+
+class DeletionFailed(Exception):
+    """
+    Raised when a message could not be deleted within ``max_attempts``.
+    """
+
+    def __init__(self, attempts: int, last_error: str):
+        super().__init__(f"Failed {attempts} attempts, last with {last_error}")
+        self.attempts = attempts
+        self.last_error = last_error
+
+
+class DeletionWorker:
+    """
+    Deletes caught Slack messages queued by the webserver, one at a time
+    within Slack's rate limit.
+
+    Hits on a message already deleted are coalesced into that one delete.
+    Rate limited calls wait for Retry-After, other transient failures are
+    retried with exponential backoff up to ``max_attempts`` times, after which
+    the request is moved to DELETION_DEAD_LETTER_QUEUE.
+    """
+
+    def __init__(
+        self,
+        client: Optional[WebClient] = None,
+        limiter: Optional[RateLimiter] = None,
+        max_attempts: int = SLACK_DELETE_MAX_ATTEMPTS,
+        backoff: float = SLACK_DELETE_BACKOFF,
+        sleep: Callable[[float], None] = time.sleep,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if client is None:
+            client = WebClient(
+                token=os.getenv("SLACK_BOT_USER"), base_url=SLACK_API_BASE_URL
+            )
+        if limiter is None:
+            limiter = RateLimiter(SLACK_DELETE_RATE_PER_MINUTE, clock=clock)
+
+        self.client = client
+        self.limiter = limiter
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.sleep = sleep
+        self.clock = clock
+
+        self._deleted: OrderedDict[tuple[str, str], float] = OrderedDict()
+
+    def _recently_deleted(self, key: tuple[str, str]) -> bool:
+        now = self.clock()
+        while self._deleted and next(iter(self._deleted.values())) < now:
+            self._deleted.popitem(last=False)
+        return key in self._deleted
+
+    def _remember(self, key: tuple[str, str]) -> None:
+        self._deleted[key] = self.clock() + DELETED_MESSAGES_TTL
+        self._deleted.move_to_end(key)
+        while len(self._deleted) > DELETED_MESSAGES_SIZE:
+            self._deleted.popitem(last=False)
+
+    def delete(self, channel: str, ts: str) -> bool:
+        """
+        Delete a message, returning whether it is gone from Slack. Raises
+        DeletionFailed when transient failures used up every attempt.
+        """
+        key = (channel, ts)
+        if self._recently_deleted(key):
+            logger.info(f"Message {ts} in {channel} was already deleted")
+            return True
+
+        # Being rate limited is not a failure, so it doesn't use up an attempt
+        attempt = 0
+        while True:
+            self.limiter.acquire(self.sleep)
+            try:
+                self.client.chat_delete(channel=channel, ts=ts)
+            except SlackApiError as e:
+                error = e.response.get("error")
+                if error == "message_not_found":
+                    self._remember(key)
+                    return True
+
+                if e.response.status_code == 429:
+                    retry_after = float(e.response.headers.get("Retry-After", 1))
+                    logger.warning(f"Rate limited by Slack for {retry_after} s")
+                    self.limiter.pause(retry_after)
+                    continue
+                if e.response.status_code < 500 and error not in RETRYABLE_ERRORS:
+                    logger.error(f"Cannot delete message {ts} in {channel}: {error}")
+                    return False
+                logger.warning(f"Deleting message {ts} in {channel} failed: {error}")
+                last_error = str(error)
+            except OSError as e:
+                logger.warning(f"Deleting message {ts} in {channel} failed: {e}")
+                last_error = repr(e)
+            else:
+                logger.info(f"Message deleted in channel {channel} at timestamp {ts}")
+                self._remember(key)
+                return True
+
+            attempt += 1
+            if attempt >= self.max_attempts:
+                break
+            backoff = self.backoff * 2 ** (attempt - 1)
+            self.sleep(min(backoff, SLACK_DELETE_MAX_BACKOFF))
+
+        logger.error(
+            f"Giving up deleting message {ts} in {channel} "
+            f"after {self.max_attempts} attempts"
+        )
+        raise DeletionFailed(attempt, last_error)
+
+    def handle(self, body: bytes) -> None:
+        try:
+            message = json.loads(body)
+            channel, ts = str(message["channel"]), str(message["ts"])
+        except (ValueError, KeyError, TypeError):
+            logger.error(f"Dropping malformed deletion request: {body!r}")
+            return
+        self.delete(channel, ts)
+
+    def run(self) -> None:
+        """
+        Consume the deletion queue until interrupted, reconnecting to RabbitMQ
+        when the connection is lost.
+        """
+        while True:
+            try:
+                connection = pika.BlockingConnection(connection_parameters())
+            except AMQPConnectionError:
+                logger.warning("Could not connect to RabbitMQ, retrying")
+                time.sleep(5)
+                continue
+
+            # Waiting on Slack must keep answering RabbitMQ heartbeats
+            self.sleep = connection.sleep
+            try:
+                channel = connection.channel()
+                channel.queue_declare(queue=DELETION_QUEUE, durable=True)
+                channel.queue_declare(queue=DELETION_DEAD_LETTER_QUEUE, durable=True)
+                channel.basic_qos(prefetch_count=10)
+
+                for method, properties, body in channel.consume(DELETION_QUEUE):
+                    try:
+                        self.handle(body)
+                    except DeletionFailed as e:
+                        dead_letter(channel, body, properties, e)
+                    channel.basic_ack(method.delivery_tag)
+            except (AMQPConnectionError, StreamLostError):
+                logger.warning("RabbitMQ connection lost, reconnecting")
+            finally:
+                self.sleep = time.sleep
+                if connection.is_open:
+                    connection.close()
+
+
+def dead_letter(
+    channel: BlockingChannel,
+    body: bytes,
+    properties: pika.BasicProperties,
+    error: DeletionFailed,
+) -> None:
+    """
+    Move a deletion request to DELETION_DEAD_LETTER_QUEUE, with the failure
+    headers the processor's dead letters carry.
+    """
+    headers = {
+        **(properties.headers or {}),
+        "attempts": error.attempts,
+        "last_error": error.last_error,
+        "dead_lettered_at": time.time(),
+    }
+    channel.basic_publish(
+        exchange="",
+        routing_key=DELETION_DEAD_LETTER_QUEUE,
+        body=body,
+        properties=pika.BasicProperties(delivery_mode=2, headers=headers),
+    )
@@ -0,0 +1,35 @@
+from django.db.models import Lookup, TextField
+from django.db.models.lookups import IContains
+
+
+def boolean_mode_query(terms: str) -> str:
+    """
+    Turn search input into a boolean mode query requiring every word. Each
+    word is quoted, so characters such as + - * ( ) < > ~ @ are searched for
+    instead of parsed as operators, which would fail on unbalanced input.
+    """
+    words = terms.replace('"', " ").split()
+    return " ".join(f'+"{word}"' for word in words)
+
+
+@TextField.register_lookup
+class FullTextSearch(Lookup):
+    """
+    ``field__search=terms`` uses the column's FULLTEXT index on MySQL, in
+    boolean mode with every word of ``terms`` required. Other databases fall
+    back to a case-insensitive ``icontains``.
+    """
+
+    lookup_name = "search"
+
+    def as_mysql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        rhs_params = [
+            boolean_mode_query(param) if isinstance(param, str) else param
+            for param in rhs_params
+        ]
+        return f"MATCH ({lhs}) AGAINST ({rhs} IN BOOLEAN MODE)", lhs_params + rhs_params
+
+    def as_sql(self, compiler, connection):
+        return compiler.compile(IContains(self.lhs, self.rhs))
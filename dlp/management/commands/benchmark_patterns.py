@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from dlp.models import Pattern
+from dlp.validators import PATTERN_BUDGET_MS, benchmark_pattern
+
+
+class Command(BaseCommand):
+    help = (
+        "Time every stored pattern against representative and adversarial "
+        "inputs and flag the ones over the budget."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--budget-ms",
+            type=float,
+            default=PATTERN_BUDGET_MS,
+            help="Slowest search of one input allowed, in milliseconds.",
+        )
+
+    def handle(self, *args, **options):
+        budget_ms = options["budget_ms"]
+        flagged = []
+
+        for pattern in Pattern.objects.order_by("id"):
+            benchmark = benchmark_pattern(pattern.regex_pattern)
+            name, seconds = benchmark.slowest
+            line = (
+                f"{pattern.id:>5}  {pattern.name:<30} "
+                f"{seconds * 1000:>10.2f} ms  {name}"
+            )
+
+            if benchmark.over_budget(budget_ms):
+                flagged.append(pattern)
+                self.stdout.write(self.style.ERROR(line))
+            else:
+                self.stdout.write(line)
+
+        if flagged:
+            names = ", ".join(pattern.name for pattern in flagged)
+            raise CommandError(
+                f"{len(flagged)} pattern(s) over the {budget_ms:g} ms budget: {names}"
+            )
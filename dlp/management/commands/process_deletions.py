@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from dlp.deletions import DeletionWorker
+
+
+class Command(BaseCommand):
+    help = "Delete caught messages from Slack as they are queued by the webserver."
+
+    def handle(self, *args, **options):
+        self.stdout.write("Waiting for Slack messages to delete")
+        try:
+            DeletionWorker().run()
+        except KeyboardInterrupt:
+            pass
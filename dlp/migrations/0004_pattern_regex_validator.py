@@ -0,0 +1,22 @@
+# Generated by Django 5.1.2 on 2026-10-18 13:22
+
+from django.db import migrations, models
+
+import dlp.validators
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dlp", "0003_remove_caughtmessage_additional_info_and_more"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="pattern",
+            name="regex_pattern",
+            field=models.CharField(
+                max_length=500, validators=[dlp.validators.validate_regex_pattern]
+            ),
+        ),
+    ]
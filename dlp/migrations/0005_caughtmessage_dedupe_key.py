@@ -0,0 +1,54 @@
+# Generated by Django 5.1.2 on 2026-10-18 13:24
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def backfill_dedupe_keys(apps, schema_editor):
+    """
+    Key the existing rows. Duplicates stored before the key existed keep an
+    empty key, only the oldest row of each is keyed.
+    """
+    CaughtMessage = apps.get_model("dlp", "CaughtMessage")
+
+    seen = set()
+    batch = []
+    for caught_message in CaughtMessage.objects.order_by("id").iterator():
+        parts = [
+            caught_message.channel,
+            caught_message.timestamp,
+            caught_message.pattern_matched_id,
+            caught_message.source_type,
+            caught_message.file_id or "",
+        ]
+        key = hashlib.sha256("\x1f".join(map(str, parts)).encode()).hexdigest()
+        if key in seen:
+            continue
+        seen.add(key)
+
+        caught_message.dedupe_key = key
+        batch.append(caught_message)
+        if len(batch) >= 1000:
+            CaughtMessage.objects.bulk_update(batch, ["dedupe_key"])
+            batch = []
+
+    CaughtMessage.objects.bulk_update(batch, ["dedupe_key"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dlp", "0004_pattern_regex_validator"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="caughtmessage",
+            name="dedupe_key",
+            field=models.CharField(
+                editable=False, max_length=64, null=True, unique=True
+            ),
+        ),
+        migrations.RunPython(backfill_dedupe_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.1.2 on 2026-10-18 13:25
+
+from django.db import migrations, models
+
+FULLTEXT_INDEX = "dlp_caughtm_message_content_ft"
+
+
+def add_fulltext_index(apps, schema_editor):
+    """
+    Back the admin's message search with a FULLTEXT index, MySQL only.
+    """
+    if schema_editor.connection.vendor != "mysql":
+        return
+    schema_editor.execute(
+        f"ALTER TABLE dlp_caughtmessage ADD FULLTEXT INDEX {FULLTEXT_INDEX} "
+        "(message_content)"
+    )
+
+
+def remove_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "mysql":
+        return
+    schema_editor.execute(f"ALTER TABLE dlp_caughtmessage DROP INDEX {FULLTEXT_INDEX}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dlp", "0005_caughtmessage_dedupe_key"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="caughtmessage",
+            index=models.Index(
+                fields=["channel", "timestamp"], name="dlp_caughtm_channel_5adcd2_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="caughtmessage",
+            index=models.Index(
+                fields=["pattern_matched", "created_at"],
+                name="dlp_caughtm_pattern_3efe79_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="caughtmessage",
+            index=models.Index(
+                fields=["user_id"], name="dlp_caughtm_user_id_11db24_idx"
+            ),
+        ),
+        migrations.RunPython(add_fulltext_index, remove_fulltext_index),
+    ]
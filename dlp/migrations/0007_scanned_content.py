@@ -0,0 +1,66 @@
+# Generated by Django 5.1.2 on 2026-10-18 13:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dlp", "0006_caughtmessage_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ScannedContent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("sha256", models.CharField(max_length=64, unique=True)),
+                (
+                    "size",
+                    models.PositiveIntegerField(help_text="Size of the text in bytes"),
+                ),
+                ("compressed", models.BooleanField(default=False)),
+                ("data", models.BinaryField()),
+            ],
+            options={
+                "abstract": False,
+            },
+        ),
+        migrations.AddField(
+            model_name="caughtmessage",
+            name="content_hash",
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name="caughtmessage",
+            name="match_end",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="caughtmessage",
+            name="match_start",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="caughtmessage",
+            name="scanned_content",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="caught_messages",
+                to="dlp.scannedcontent",
+            ),
+        ),
+    ]
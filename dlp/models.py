@@ -1,5 +1,16 @@
+import hashlib
+import os
+import zlib
+from typing import Optional
+
 from django.db import models
 
+from . import lookups  # noqa: F401
+from .validators import validate_regex_pattern
+
+# Scanned content is stored zlib compressed from this many bytes on, 0 disables it
+CONTENT_COMPRESSION_MIN_BYTES = int(os.getenv("CONTENT_COMPRESSION_MIN_BYTES", "1024"))
+
 
 class BaseModel(models.Model):
     """
@@ -16,19 +27,66 @@ class BaseModel(models.Model):
 
 class Pattern(BaseModel):
     name = models.CharField(max_length=100)
-    regex_pattern = models.CharField(max_length=500)
+    regex_pattern = models.CharField(
+        max_length=500, validators=[validate_regex_pattern]
+    )
     description = models.TextField(blank=True)
 
     def __str__(self):
         return self.name
 
 
+class ScannedContent(BaseModel):
+    """
+    The full text a pattern was caught in: a message, or the page of a file.
+    Stored once per content hash however many caught messages refer to it.
+    """
+
+    sha256 = models.CharField(max_length=64, unique=True)
+    size = models.PositiveIntegerField(help_text="Size of the text in bytes")
+    compressed = models.BooleanField(default=False)
+    data = models.BinaryField()
+
+    def __str__(self):
+        return self.sha256
+
+    @classmethod
+    def from_text(cls, text: str, sha256: Optional[str] = None) -> "ScannedContent":
+        raw = text.encode()
+        compressed = 0 < CONTENT_COMPRESSION_MIN_BYTES <= len(raw)
+        return cls(
+            sha256=sha256 or hashlib.sha256(raw).hexdigest(),
+            size=len(raw),
+            compressed=compressed,
+            data=zlib.compress(raw) if compressed else raw,
+        )
+
+    @property
+    def text(self) -> str:
+        data = bytes(self.data)
+        if self.compressed:
+            data = zlib.decompress(data)
+        return data.decode()
+
+
 class CaughtMessage(BaseModel):
     user_id = models.CharField(max_length=50)
     channel = models.CharField(max_length=255)
     timestamp = models.CharField(max_length=50)
+    # A snippet of the scanned content around the match
     message_content = models.TextField(null=True, blank=True)
     pattern_matched = models.ForeignKey(Pattern, on_delete=models.CASCADE)
+    # Offsets of the match in the scanned content
+    match_start = models.PositiveIntegerField(null=True, blank=True)
+    match_end = models.PositiveIntegerField(null=True, blank=True)
+    content_hash = models.CharField(max_length=64, null=True, blank=True)
+    scanned_content = models.ForeignKey(
+        ScannedContent,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="caught_messages",
+    )
     file_name = models.CharField(max_length=255, null=True, blank=True)
     file_id = models.CharField(max_length=50, null=True, blank=True)
     source_type = models.CharField(
@@ -36,6 +94,36 @@ class CaughtMessage(BaseModel):
         choices=[("message", "Message"), ("file", "File")],
         default="message",
     )
+    # One row per pattern hit in a Slack message or attachment, see get_dedupe_key
+    dedupe_key = models.CharField(max_length=64, unique=True, null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Finding the caught messages of a Slack message
+            models.Index(fields=["channel", "timestamp"]),
+            # The admin's pattern filter, ordered by date
+            models.Index(fields=["pattern_matched", "created_at"]),
+            models.Index(fields=["user_id"]),
+        ]
 
     def __str__(self):
         return f"Message caught at {self.created_at}"
+
+    def get_dedupe_key(self) -> str:
+        """
+        Identify the hit of a pattern in one Slack message or attachment, so a
+        redelivered scan of the same message doesn't store it twice.
+        """
+        parts = [
+            self.channel,
+            self.timestamp,
+            self.pattern_matched_id,
+            self.source_type,
+            self.file_id or "",
+        ]
+        return hashlib.sha256("\x1f".join(map(str, parts)).encode()).hexdigest()
+
+    def save(self, *args, **kwargs):
+        if not self.dedupe_key:
+            self.dedupe_key = self.get_dedupe_key()
+        super().save(*args, **kwargs)
@@ -0,0 +1,140 @@
+import logging
+import os
+import threading
+from typing import Optional
+
+import pika
+from pika.adapters.blocking_connection import BlockingChannel
+from pika.exceptions import AMQPChannelError, AMQPConnectionError, StreamLostError
+
+logger = logging.getLogger(__name__)
+
+RECOVERABLE_ERRORS = (AMQPConnectionError, AMQPChannelError, StreamLostError)
+
+
+def connection_parameters(host: str = "rabbitmq") -> pika.ConnectionParameters:
+    rabbitmq_user = os.getenv("RABBITMQ_USER")
+    rabbitmq_password = os.getenv("RABBITMQ_PASSWORD")
+    credentials = pika.PlainCredentials(str(rabbitmq_user), str(rabbitmq_password))
+    return pika.ConnectionParameters(host=host, credentials=credentials)
+
+
+class RabbitMQPublisher:
+    """
+    Publishes messages to RabbitMQ over long-lived connections.
+
+    pika's BlockingConnection is not thread-safe, so every thread (e.g. each
+    WSGI worker thread) lazily opens its own connection and channel and keeps
+    reusing them. Queues and exchanges are declared once per channel. When the
+    connection turns out to be broken the message is published again on a new one.
+    """
+
+    def __init__(
+        self,
+        host: str = "rabbitmq",
+        confirm_delivery: Optional[bool] = None,
+    ):
+        if confirm_delivery is None:
+            confirm_delivery = os.getenv(
+                "RABBITMQ_PUBLISHER_CONFIRMS", "false"
+            ).lower() in ("1", "true", "yes")
+
+        self.host = host
+        self.confirm_delivery = confirm_delivery
+
+        self._local = threading.local()
+
+    def _connect(self) -> BlockingChannel:
+        connection = pika.BlockingConnection(connection_parameters(self.host))
+        channel = connection.channel()
+        if self.confirm_delivery:
+            channel.confirm_delivery()
+
+        self._local.connection = connection
+        self._local.channel = channel
+        self._local.declared = set()
+        return channel
+
+    def _get_channel(self) -> BlockingChannel:
+        connection = getattr(self._local, "connection", None)
+        channel = getattr(self._local, "channel", None)
+
+        if connection is None or connection.is_closed or channel.is_closed:
+            return self._connect()
+
+        # Answer heartbeats and notice a connection the broker dropped while idle
+        connection.process_data_events(time_limit=0)
+        return channel
+
+    def publish(
+        self,
+        queue: str,
+        body: str,
+        properties: Optional[pika.BasicProperties] = None,
+    ) -> None:
+        """
+        Publish ``body`` to a durable queue, reconnecting once if needed.
+        """
+        self._publish(body, properties, queue=queue)
+
+    def broadcast(
+        self,
+        exchange: str,
+        body: str,
+        properties: Optional[pika.BasicProperties] = None,
+    ) -> None:
+        """
+        Publish ``body`` to every queue bound to a durable fanout exchange.
+        """
+        self._publish(body, properties, exchange=exchange)
+
+    def _publish(
+        self,
+        body: str,
+        properties: Optional[pika.BasicProperties],
+        queue: str = "",
+        exchange: str = "",
+    ) -> None:
+        for attempt in range(2):
+            try:
+                channel = self._get_channel()
+                declared = self._local.declared
+
+                if queue and ("queue", queue) not in declared:
+                    channel.queue_declare(queue=queue, durable=True)
+                    declared.add(("queue", queue))
+                if exchange and ("exchange", exchange) not in declared:
+                    channel.exchange_declare(
+                        exchange=exchange, exchange_type="fanout", durable=True
+                    )
+                    declared.add(("exchange", exchange))
+
+                channel.basic_publish(
+                    exchange=exchange,
+                    routing_key=queue,
+                    body=body,
+                    properties=properties,
+                )
+                return
+            except RECOVERABLE_ERRORS:
+                self.close()
+                if attempt:
+                    raise
+                logger.warning("RabbitMQ connection lost, reconnecting")
+
+    def close(self) -> None:
+        """
+        Close the calling thread's connection.
+        """
+        connection = getattr(self._local, "connection", None)
+        self._local.connection = None
+        self._local.channel = None
+
+        if connection is not None and connection.is_open:
+            try:
+                connection.close()
+            except RECOVERABLE_ERRORS:
+                pass
+
+
+publisher = RabbitMQPublisher()
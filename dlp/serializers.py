@@ -1,6 +1,8 @@
+import hashlib
+
 from rest_framework import serializers
 
-from .models import CaughtMessage, Pattern
+from .models import CaughtMessage, Pattern, ScannedContent
 
 
 class PatternSerializer(serializers.ModelSerializer):
@@ -9,10 +11,127 @@ class PatternSerializer(serializers.ModelSerializer):
         fields = ["id", "name", "regex_pattern"]
 
 
+class PatternPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    Resolves patterns from the map prefetched by CaughtMessageListSerializer,
+    falling back to one query per value when used on its own.
+    """
+
+    def to_internal_value(self, data):
+        patterns = self.context.get("patterns")
+        if patterns is None:
+            return super().to_internal_value(data)
+
+        try:
+            pattern = patterns.get(int(data))
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        if pattern is None:
+            self.fail("does_not_exist", pk_value=data)
+        return pattern
+
+
+def attach_scanned_content(items: list[dict]) -> None:
+    """
+    Store the content sent with caught messages once per hash, and link every
+    caught message to the content its hash refers to. Content is usually sent
+    only with the first of the caught messages found in it.
+    """
+    contents = {}
+    for item in items:
+        content = item.pop("content", None)
+        if content is not None:
+            contents.setdefault(item["content_hash"], content)
+
+    hashes = {item["content_hash"] for item in items if item.get("content_hash")}
+    if not hashes:
+        return
+
+    stored = ScannedContent.objects.in_bulk(hashes, field_name="sha256")
+    missing = [
+        ScannedContent.from_text(content, sha256=content_hash)
+        for content_hash, content in contents.items()
+        if content_hash not in stored
+    ]
+    if missing:
+        ScannedContent.objects.bulk_create(missing, ignore_conflicts=True)
+        stored = ScannedContent.objects.in_bulk(hashes, field_name="sha256")
+
+    for item in items:
+        item["scanned_content"] = stored.get(item.get("content_hash"))
+
+
+class CaughtMessageListSerializer(serializers.ListSerializer):
+    def to_internal_value(self, data):
+        # Validate every item against a single query for the referenced patterns
+        if isinstance(data, list):
+            pattern_ids = set()
+            for item in data:
+                try:
+                    pattern_ids.add(int(item.get("pattern_matched")))
+                except (AttributeError, TypeError, ValueError):
+                    continue
+            self.context["patterns"] = Pattern.objects.in_bulk(pattern_ids)
+
+        return super().to_internal_value(data)
+
+    def create(self, validated_data):
+        """
+        Store the caught messages that aren't stored yet and return those.
+        Hits a redelivered scan already reported are skipped.
+        """
+        attach_scanned_content(validated_data)
+
+        caught_messages = {}
+        for item in validated_data:
+            caught_message = CaughtMessage(**item)
+            caught_message.dedupe_key = caught_message.get_dedupe_key()
+            caught_messages.setdefault(caught_message.dedupe_key, caught_message)
+
+        existing = set(
+            CaughtMessage.objects.filter(
+                dedupe_key__in=caught_messages.keys()
+            ).values_list("dedupe_key", flat=True)
+        )
+        new_messages = [
+            caught_message
+            for dedupe_key, caught_message in caught_messages.items()
+            if dedupe_key not in existing
+        ]
+
+        # A concurrent delivery of the same scan may still win the race
+        return CaughtMessage.objects.bulk_create(new_messages, ignore_conflicts=True)
+
+
 class CaughtMessageSerializer(serializers.ModelSerializer):
 
-    pattern_matched = serializers.PrimaryKeyRelatedField(queryset=Pattern.objects.all())
+    pattern_matched = PatternPrimaryKeyRelatedField(queryset=Pattern.objects.all())
+    # The full scanned text, stored apart from the caught message
+    content = serializers.CharField(
+        write_only=True, required=False, allow_blank=True, trim_whitespace=False
+    )
 
     class Meta:
         model = CaughtMessage
         fields = "__all__"
+        read_only_fields = ["scanned_content"]
+        list_serializer_class = CaughtMessageListSerializer
+
+    def validate(self, attrs):
+        content = attrs.get("content")
+        if content is not None:
+            content_hash = hashlib.sha256(content.encode()).hexdigest()
+            if attrs.get("content_hash") not in (None, "", content_hash):
+                raise serializers.ValidationError(
+                    {"content_hash": "Does not match the SHA-256 of the content."}
+                )
+            attrs["content_hash"] = content_hash
+        return attrs
+
+    def create(self, validated_data):
+        attach_scanned_content([validated_data])
+        caught_message = CaughtMessage(**validated_data)
+        instance, self.created = CaughtMessage.objects.get_or_create(
+            dedupe_key=caught_message.get_dedupe_key(), defaults=validated_data
+        )
+        return instance
@@ -0,0 +1,35 @@
+import json
+import logging
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from dlp.caching import get_pattern_list, invalidate_pattern_list
+from dlp.models import Pattern
+from dlp.publisher import publisher
+
+logger = logging.getLogger(__name__)
+
+PATTERN_UPDATES_EXCHANGE = "pattern_updates"
+
+
+def notify_pattern_change() -> None:
+    """
+    Drop the cached pattern list and tell every processor which version is
+    current, so they refresh right away instead of waiting for their TTL.
+    """
+    invalidate_pattern_list()
+
+    version = get_pattern_list()["etag"]
+    try:
+        publisher.broadcast(PATTERN_UPDATES_EXCHANGE, json.dumps({"version": version}))
+    except Exception:
+        # Processors still pick the change up when their PATTERN_PUSH_TTL expires
+        logger.exception("Failed to broadcast pattern update")
+
+
+@receiver([post_save, post_delete], sender=Pattern)
+def pattern_changed(sender, **kwargs) -> None:
+    # Wait for the commit so a concurrent request cannot cache the old rows again
+    transaction.on_commit(notify_pattern_change)
@@ -0,0 +1,82 @@
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+
+from dlp.lookups import boolean_mode_query
+from dlp.models import CaughtMessage, Pattern
+
+
+class CaughtMessageAdminTestCase(TestCase):
+    def setUp(self):
+        self.pattern = Pattern.objects.create(
+            name="SSN", regex_pattern=r"\b\d{3}-\d{2}-\d{4}\b"
+        )
+        self.user = User.objects.create_superuser("admin", "admin@example.com", "pw")
+        self.client.force_login(self.user)
+
+    def caught_message(self, index, content):
+        return CaughtMessage.objects.create(
+            user_id="U123",
+            channel="C123",
+            timestamp=f"1730222429.{index:06d}",
+            message_content=content,
+            pattern_matched=self.pattern,
+        )
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        # Arrange
+        self.caught_message(0, "SSN 123-45-6789")
+        with CaptureQueriesContext(connection) as few:
+            self.client.get("/admin/dlp/caughtmessage/")
+
+        for index in range(1, 10):
+            self.caught_message(index, f"SSN 123-45-{index:04d}")
+
+        # Act
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get("/admin/dlp/caughtmessage/")
+
+        # Assert
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(many), len(few))
+
+    def test_search_message_content(self):
+        # Arrange
+        self.caught_message(0, "SSN 123-45-6789")
+        self.caught_message(1, "nothing to see")
+
+        # Act
+        response = self.client.get("/admin/dlp/caughtmessage/", {"q": "123-45"})
+
+        # Assert
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [m.message_content for m in response.context["cl"].result_list],
+            ["SSN 123-45-6789"],
+        )
+
+    def test_search_lookup_falls_back_to_icontains(self):
+        # Arrange
+        self.caught_message(0, "SSN 123-45-6789")
+
+        # Act
+        results = CaughtMessage.objects.filter(message_content__search="ssn 123")
+
+        # Assert
+        self.assertEqual(results.count(), 1)
+
+
+class BooleanModeQueryTestCase(SimpleTestCase):
+    def test_requires_every_word(self):
+        self.assertEqual(boolean_mode_query("ssn  leak"), '+"ssn" +"leak"')
+
+    def test_quotes_operators(self):
+        # Act
+        query = boolean_mode_query('+(123-45-6789* "secret" ~@x')
+
+        # Assert: nothing is left outside the quotes to be parsed as an operator
+        self.assertEqual(query, '+"+(123-45-6789*" +"secret" +"~@x"')
+
+    def test_ignores_blank_input(self):
+        self.assertEqual(boolean_mode_query(' " '), "")
@@ -0,0 +1,200 @@
+import json
+from unittest.mock import MagicMock
+
+import pika
+
+from django.test import SimpleTestCase
+from slack_sdk.errors import SlackApiError
+from slack_sdk.web import SlackResponse
+
+from dlp.deletions import (
+    DELETION_DEAD_LETTER_QUEUE,
+    DeletionFailed,
+    DeletionWorker,
+    RateLimiter,
+    dead_letter,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def slack_error(error, status_code=200, headers=None):
+    response = SlackResponse(
+        client=None,
+        http_verb="POST",
+        api_url="https://slack.com/api/chat.delete",
+        req_args={},
+        data={"ok": False, "error": error},
+        headers=headers or {},
+        status_code=status_code,
+    )
+    return SlackApiError(error, response)
+
+
+class RateLimiterTestCase(SimpleTestCase):
+    def test_spaces_out_calls(self):
+        # Arrange
+        clock = FakeClock()
+        limiter = RateLimiter(rate_per_minute=60, clock=clock)
+
+        # Act
+        for _ in range(3):
+            limiter.acquire(clock.sleep)
+
+        # Assert: the first call is free, then one per second
+        self.assertEqual(clock.now, 2.0)
+
+    def test_pause_holds_calls_back(self):
+        # Arrange
+        clock = FakeClock()
+        limiter = RateLimiter(rate_per_minute=60, clock=clock)
+
+        # Act
+        limiter.pause(30)
+        limiter.acquire(clock.sleep)
+
+        # Assert
+        self.assertEqual(clock.now, 30.0)
+
+
+class DeletionWorkerTestCase(SimpleTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.client = MagicMock()
+        self.worker = DeletionWorker(
+            client=self.client,
+            limiter=RateLimiter(rate_per_minute=6000, clock=self.clock),
+            max_attempts=3,
+            backoff=1,
+            sleep=self.clock.sleep,
+            clock=self.clock,
+        )
+
+    def test_coalesces_hits_on_the_same_message(self):
+        # Act
+        self.worker.handle(json.dumps({"channel": "C1", "ts": "1.0"}).encode())
+        self.worker.handle(json.dumps({"channel": "C1", "ts": "1.0"}).encode())
+        self.worker.handle(json.dumps({"channel": "C1", "ts": "2.0"}).encode())
+
+        # Assert
+        self.assertEqual(self.client.chat_delete.call_count, 2)
+
+    def test_waits_for_retry_after(self):
+        # Arrange
+        self.client.chat_delete.side_effect = [
+            slack_error("ratelimited", 429, {"Retry-After": "30"}),
+            {"ok": True},
+        ]
+
+        # Act
+        deleted = self.worker.delete("C1", "1.0")
+
+        # Assert
+        self.assertTrue(deleted)
+        self.assertEqual(self.client.chat_delete.call_count, 2)
+        self.assertGreaterEqual(self.clock.now, 30)
+
+    def test_retries_server_errors_with_backoff(self):
+        # Arrange
+        self.client.chat_delete.side_effect = [
+            slack_error("internal_error", 500),
+            slack_error("internal_error", 500),
+            {"ok": True},
+        ]
+
+        # Act
+        deleted = self.worker.delete("C1", "1.0")
+
+        # Assert
+        self.assertTrue(deleted)
+        self.assertEqual([s for s in self.clock.sleeps if s >= 1], [1, 2])
+
+    def test_rate_limits_do_not_use_up_attempts(self):
+        # Arrange
+        rate_limited = slack_error("ratelimited", 429, {"Retry-After": "1"})
+        self.client.chat_delete.side_effect = [
+            rate_limited,
+            rate_limited,
+            slack_error("internal_error", 500),
+            rate_limited,
+            slack_error("internal_error", 500),
+            {"ok": True},
+        ]
+
+        # Act
+        deleted = self.worker.delete("C1", "1.0")
+
+        # Assert
+        self.assertTrue(deleted)
+        self.assertEqual(self.client.chat_delete.call_count, 6)
+
+    def test_gives_up_after_max_attempts(self):
+        # Arrange
+        self.client.chat_delete.side_effect = ConnectionError("down")
+
+        # Act
+        with self.assertRaises(DeletionFailed) as raised:
+            self.worker.delete("C1", "1.0")
+
+        # Assert
+        self.assertEqual(raised.exception.attempts, 3)
+        self.assertEqual(self.client.chat_delete.call_count, 3)
+
+    def test_dead_letters_keep_the_request_and_failure(self):
+        # Arrange
+        channel = MagicMock()
+        body = json.dumps({"channel": "C1", "ts": "1.0"}).encode()
+
+        # Act
+        dead_letter(
+            channel,
+            body,
+            pika.BasicProperties(headers={"enqueued_at": 1.0}),
+            DeletionFailed(3, "internal_error"),
+        )
+
+        # Assert
+        kwargs = channel.basic_publish.call_args.kwargs
+        self.assertEqual(kwargs["routing_key"], DELETION_DEAD_LETTER_QUEUE)
+        self.assertEqual(kwargs["body"], body)
+        headers = kwargs["properties"].headers
+        self.assertEqual(headers["attempts"], 3)
+        self.assertEqual(headers["last_error"], "internal_error")
+        self.assertEqual(headers["enqueued_at"], 1.0)
+        self.assertIn("dead_lettered_at", headers)
+
+    def test_does_not_retry_permanent_errors(self):
+        # Arrange
+        self.client.chat_delete.side_effect = slack_error("cant_delete_message")
+
+        # Act
+        deleted = self.worker.delete("C1", "1.0")
+
+        # Assert
+        self.assertFalse(deleted)
+        self.client.chat_delete.assert_called_once()
+
+    def test_missing_message_counts_as_deleted(self):
+        # Arrange
+        self.client.chat_delete.side_effect = slack_error("message_not_found")
+
+        # Act / Assert
+        self.assertTrue(self.worker.delete("C1", "1.0"))
+
+    def test_drops_malformed_requests(self):
+        # Act
+        self.worker.handle(b"not json")
+
+        # Assert
+        self.client.chat_delete.assert_not_called()
@@ -0,0 +1,30 @@
+from unittest.mock import patch
+
+from django.test import TestCase
+
+from dlp.models import ScannedContent
+
+
+class ScannedContentTestCase(TestCase):
+    @patch("dlp.models.CONTENT_COMPRESSION_MIN_BYTES", 100)
+    def test_compresses_large_content(self):
+        # Arrange
+        text = "SSN 123-45-6789 " * 100
+
+        # Act
+        ScannedContent.from_text(text).save()
+        scanned_content = ScannedContent.objects.get()
+
+        # Assert
+        self.assertTrue(scanned_content.compressed)
+        self.assertLess(len(scanned_content.data), scanned_content.size)
+        self.assertEqual(scanned_content.text, text)
+
+    @patch("dlp.models.CONTENT_COMPRESSION_MIN_BYTES", 100)
+    def test_keeps_small_content_as_is(self):
+        # Act
+        scanned_content = ScannedContent.from_text("SSN 123-45-6789")
+
+        # Assert
+        self.assertFalse(scanned_content.compressed)
+        self.assertEqual(bytes(scanned_content.data), b"SSN 123-45-6789")
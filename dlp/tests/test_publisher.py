@@ -0,0 +1,110 @@
+import threading
+from unittest.mock import MagicMock, patch
+
+from django.test import TestCase
+from pika.exceptions import StreamLostError
+
+from dlp.publisher import RabbitMQPublisher
+
+
+def make_connection() -> MagicMock:
+    connection = MagicMock()
+    connection.is_closed = False
+    connection.is_open = True
+    connection.channel.return_value.is_closed = False
+    return connection
+
+
+@patch("dlp.publisher.pika.BlockingConnection")
+class RabbitMQPublisherTestCase(TestCase):
+    def test_reuses_connection_and_channel(self, mock_blocking_connection):
+        # Arrange
+        connection = make_connection()
+        mock_blocking_connection.return_value = connection
+        publisher = RabbitMQPublisher()
+
+        # Act
+        for _ in range(3):
+            publisher.publish("slack_messages", "{}")
+
+        # Assert
+        mock_blocking_connection.assert_called_once()
+        connection.channel.return_value.queue_declare.assert_called_once_with(
+            queue="slack_messages", durable=True
+        )
+        self.assertEqual(connection.channel.return_value.basic_publish.call_count, 3)
+
+    def test_broadcasts_to_fanout_exchange(self, mock_blocking_connection):
+        # Arrange
+        connection = make_connection()
+        mock_blocking_connection.return_value = connection
+        publisher = RabbitMQPublisher()
+
+        # Act
+        for _ in range(2):
+            publisher.broadcast("pattern_updates", "{}")
+
+        # Assert
+        channel = connection.channel.return_value
+        channel.exchange_declare.assert_called_once_with(
+            exchange="pattern_updates", exchange_type="fanout", durable=True
+        )
+        channel.queue_declare.assert_not_called()
+        channel.basic_publish.assert_called_with(
+            exchange="pattern_updates", routing_key="", body="{}", properties=None
+        )
+
+    def test_reconnects_when_connection_is_lost(self, mock_blocking_connection):
+        # Arrange
+        broken, healthy = make_connection(), make_connection()
+        broken.channel.return_value.basic_publish.side_effect = StreamLostError()
+        mock_blocking_connection.side_effect = [broken, healthy]
+        publisher = RabbitMQPublisher()
+
+        # Act
+        publisher.publish("slack_messages", "{}")
+
+        # Assert
+        self.assertEqual(mock_blocking_connection.call_count, 2)
+        healthy.channel.return_value.basic_publish.assert_called_once()
+
+    def test_gives_up_after_one_reconnect(self, mock_blocking_connection):
+        # Arrange
+        connection = make_connection()
+        connection.channel.return_value.basic_publish.side_effect = StreamLostError()
+        mock_blocking_connection.return_value = connection
+        publisher = RabbitMQPublisher()
+
+        # Act / Assert
+        with self.assertRaises(StreamLostError):
+            publisher.publish("slack_messages", "{}")
+
+    def test_enables_publisher_confirms(self, mock_blocking_connection):
+        # Arrange
+        connection = make_connection()
+        mock_blocking_connection.return_value = connection
+        publisher = RabbitMQPublisher(confirm_delivery=True)
+
+        # Act
+        publisher.publish("slack_messages", "{}")
+
+        # Assert
+        connection.channel.return_value.confirm_delivery.assert_called_once()
+
+    def test_uses_one_connection_per_thread(self, mock_blocking_connection):
+        # Arrange
+        mock_blocking_connection.side_effect = lambda *args, **kwargs: make_connection()
+        publisher = RabbitMQPublisher()
+
+        # Act
+        threads = [
+            threading.Thread(target=publisher.publish, args=("slack_messages", "{}"))
+            for _ in range(3)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # Assert
+        self.assertEqual(mock_blocking_connection.call_count, 3)
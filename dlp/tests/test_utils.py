@@ -1,19 +1,32 @@
+import json
+import threading
 from unittest.mock import MagicMock, patch
 
 from django.test import TestCase
 
-from dlp.utils import add_bot_to_channel, delete_slack_message, enqueue_message
+from dlp.publisher import RabbitMQPublisher
+from dlp.utils import (
+    BackgroundQueueFull,
+    add_bot_to_channel,
+    delete_slack_message,
+    enqueue_message,
+    enqueue_slack_deletion,
+    run_in_background,
+)
 
 
 class EnqueueMessageTestCase(TestCase):
-    @patch("dlp.utils.pika.BlockingConnection")
-    def test_enqueue_message(self, mock_blocking_connection):
+    @patch("dlp.utils.publisher", new_callable=RabbitMQPublisher)
+    @patch("dlp.publisher.pika.BlockingConnection")
+    def test_enqueue_message(self, mock_blocking_connection, mock_publisher):
         # Arrange
         mock_connection = MagicMock()
         mock_channel = MagicMock()
 
         mock_blocking_connection.return_value = mock_connection
         mock_connection.channel.return_value = mock_channel
+        mock_connection.is_closed = False
+        mock_channel.is_closed = False
 
         message_text = "Test message"
         additional_info = {
@@ -24,6 +37,7 @@ class EnqueueMessageTestCase(TestCase):
 
         # Act
 
+        enqueue_message(message_text, additional_info)
         enqueue_message(message_text, additional_info)
 
         # Assert
@@ -32,8 +46,80 @@ class EnqueueMessageTestCase(TestCase):
         mock_channel.queue_declare.assert_called_once_with(
             queue="slack_messages", durable=True
         )
-        mock_channel.basic_publish.assert_called_once()
-        mock_connection.close.assert_called_once()
+        self.assertEqual(mock_channel.basic_publish.call_count, 2)
+        mock_connection.close.assert_not_called()
+        properties = mock_channel.basic_publish.call_args.kwargs["properties"]
+        self.assertEqual(properties.delivery_mode, 2)
+        self.assertIn("enqueued_at", properties.headers)
+
+    @patch("dlp.utils.publisher")
+    def test_enqueue_message_splits_attachments(self, mock_publisher):
+        # Arrange
+        files = [{"id": "F1", "name": "a.pdf"}, {"id": "F2", "name": "b.pdf"}]
+        additional_info = {"user": "U123", "channel": "C123", "files": files}
+
+        # Act
+        enqueue_message("Test message", additional_info)
+
+        # Assert: the text and each attachment get a task on their own lane
+        published = [
+            (queue, json.loads(body))
+            for (queue, body), _ in mock_publisher.publish.call_args_list
+        ]
+        context = {"user": "U123", "channel": "C123"}
+        self.assertEqual(
+            published,
+            [
+                (
+                    "slack_messages",
+                    {
+                        "task": "scan_message",
+                        "args": ["Test message"],
+                        "kwargs": {"additional_info": context},
+                    },
+                ),
+                (
+                    "slack_files",
+                    {
+                        "task": "scan_file",
+                        "args": [files[0]],
+                        "kwargs": {"additional_info": context},
+                    },
+                ),
+                (
+                    "slack_files",
+                    {
+                        "task": "scan_file",
+                        "args": [files[1]],
+                        "kwargs": {"additional_info": context},
+                    },
+                ),
+            ],
+        )
+
+    @patch("dlp.utils.publisher")
+    def test_enqueue_message_without_text_only_scans_files(self, mock_publisher):
+        # Act
+        enqueue_message("", {"files": [{"id": "F1"}]})
+
+        # Assert
+        mock_publisher.publish.assert_called_once()
+        self.assertEqual(mock_publisher.publish.call_args.args[0], "slack_files")
+
+
+class EnqueueSlackDeletionTestCase(TestCase):
+    @patch("dlp.utils.publisher")
+    def test_enqueue_slack_deletion(self, mock_publisher):
+        # Act
+        enqueue_slack_deletion("C123", "1624325400.000200")
+
+        # Assert
+        mock_publisher.publish.assert_called_once()
+        queue, body = mock_publisher.publish.call_args.args
+        self.assertEqual(queue, "slack_deletions")
+        self.assertEqual(
+            json.loads(body), {"channel": "C123", "ts": "1624325400.000200"}
+        )
 
 
 class AddBotToChannelTestCase(TestCase):
@@ -67,4 +153,32 @@ class DeleteSlackMessageTestCase(TestCase):
         delete_slack_message(channel_id, timestamp)
 
         # Assert
-        mock_client.chat_delete.assert_called_once_with(channel=channel_id, ts=timestamp)
\ No newline at end of file
+        mock_client.chat_delete.assert_called_once_with(
+            channel=channel_id, ts=timestamp
+        )
+
+
+class RunInBackgroundTestCase(TestCase):
+    def test_run_in_background(self):
+        # Arrange
+        func = MagicMock(return_value="done")
+
+        # Act
+        future = run_in_background(func, "C123", "general")
+
+        # Assert
+        self.assertEqual(future.result(timeout=5), "done")
+        func.assert_called_once_with("C123", "general")
+
+    @patch("dlp.utils.background_slots", threading.BoundedSemaphore(1))
+    def test_run_in_background_refuses_when_full(self):
+        # Arrange
+        release = threading.Event()
+        future = run_in_background(release.wait)
+
+        # Act / Assert
+        with self.assertRaises(BackgroundQueueFull):
+            run_in_background(len, "abc")
+        release.set()
+        future.result(timeout=5)
+        self.assertEqual(run_in_background(len, "abc").result(timeout=5), 3)
@@ -0,0 +1,84 @@
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from dlp.models import Pattern
+from dlp.validators import benchmark_pattern, validate_regex_pattern
+
+
+class BenchmarkPatternTestCase(TestCase):
+    def test_times_every_input(self):
+        # Act
+        benchmark = benchmark_pattern(r"\b\d{3}-\d{2}-\d{4}\b", length=1000)
+
+        # Assert
+        self.assertIsNone(benchmark.stalled_on)
+        self.assertIn("representative", benchmark.timings)
+        self.assertIn("near misses of '1-'", benchmark.timings)
+        self.assertFalse(benchmark.over_budget())
+
+    def test_kills_catastrophic_backtracking(self):
+        # Act
+        benchmark = benchmark_pattern(r"(a+)+$", timeout=1, length=1000)
+
+        # Assert
+        self.assertEqual(benchmark.stalled_on, "run of 'a'")
+        self.assertTrue(benchmark.over_budget())
+
+
+class ValidateRegexPatternTestCase(TestCase):
+    def test_accepts_fast_pattern(self):
+        validate_regex_pattern(r"\b\d{4}-?\d{4}-?\d{4}-?\d{4}\b")
+
+    def test_rejects_invalid_regex(self):
+        with self.assertRaises(ValidationError) as cm:
+            validate_regex_pattern(r"(\d{3}")
+
+        self.assertEqual(cm.exception.code, "invalid")
+
+    @patch("dlp.validators.PATTERN_BENCHMARK_TIMEOUT", 1)
+    def test_rejects_catastrophic_pattern(self):
+        with self.assertRaises(ValidationError) as cm:
+            validate_regex_pattern(r"(\w+\s?)+$")
+
+        self.assertEqual(cm.exception.code, "too_slow")
+
+    @patch("dlp.validators.PATTERN_BUDGET_MS", 0)
+    def test_rejects_pattern_over_budget(self):
+        with self.assertRaises(ValidationError) as cm:
+            validate_regex_pattern(r"secret")
+
+        self.assertEqual(cm.exception.code, "too_slow")
+
+    def test_model_validation(self):
+        pattern = Pattern(name="Broken", regex_pattern=r"[a-")
+
+        with self.assertRaises(ValidationError) as cm:
+            pattern.full_clean()
+
+        self.assertIn("regex_pattern", cm.exception.message_dict)
+
+
+class BenchmarkPatternsCommandTestCase(TestCase):
+    def test_reports_patterns_within_budget(self):
+        # Arrange
+        Pattern.objects.create(name="SSN", regex_pattern=r"\b\d{3}-\d{2}-\d{4}\b")
+        out = StringIO()
+
+        # Act
+        call_command("benchmark_patterns", stdout=out)
+
+        # Assert
+        self.assertIn("SSN", out.getvalue())
+
+    @patch("dlp.validators.PATTERN_BENCHMARK_TIMEOUT", 1)
+    def test_flags_slow_patterns(self):
+        # Arrange: stored before validation existed
+        Pattern.objects.create(name="Words", regex_pattern=r"(\w+\s?)+$")
+
+        # Act / Assert
+        with self.assertRaisesMessage(CommandError, "Words"):
+            call_command("benchmark_patterns", stdout=StringIO())
@@ -1,6 +1,8 @@
+import hashlib
 import json
 from unittest.mock import patch
 
+from django.core.cache import cache, caches
 from django.http import JsonResponse
 from django.test import RequestFactory, TestCase
 from rest_framework import status
@@ -8,13 +10,16 @@ from rest_framework.test import APITestCase
 from rest_framework_api_key.models import APIKey
 
 from dlp.enums import SlackEventType, SlackWebhookEventType
-from dlp.models import CaughtMessage, Pattern
+from dlp.models import CaughtMessage, Pattern, ScannedContent
 from dlp.serializers import PatternSerializer
+from dlp.utils import BackgroundQueueFull
 from dlp.views import slack_event_webhooks_handler
 
 
 class PatternListAPIViewTestCase(APITestCase):
     def setUp(self):
+        cache.clear()
+
         _, key = APIKey.objects.create_key(name="Test API Key")
         self.api_key = key
 
@@ -37,6 +42,66 @@ class PatternListAPIViewTestCase(APITestCase):
         serializer = PatternSerializer(patterns, many=True)
         self.assertEqual(response.data, serializer.data)
 
+    def test_get_patterns_sets_validator_headers(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Api-Key {self.api_key}")
+        response = self.client.get("/api/patterns/")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["ETag"])
+        self.assertFalse(response.has_header("Last-Modified"))
+
+    def test_get_patterns_not_modified(self):
+        # Arrange
+        self.client.credentials(HTTP_AUTHORIZATION=f"Api-Key {self.api_key}")
+        etag = self.client.get("/api/patterns/")["ETag"]
+
+        # Act: only the API key lookup hits the database
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/patterns/", HTTP_IF_NONE_MATCH=etag)
+
+        # Assert
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+        self.assertFalse(response.content)
+
+    @patch("dlp.signals.publisher")
+    def test_pattern_changes_invalidate_cache(self, mock_publisher):
+        # Arrange
+        self.client.credentials(HTTP_AUTHORIZATION=f"Api-Key {self.api_key}")
+        etag = self.client.get("/api/patterns/")["ETag"]
+
+        # Act
+        with self.captureOnCommitCallbacks(execute=True):
+            Pattern.objects.filter(name="SSN").delete()
+        response = self.client.get("/api/patterns/", HTTP_IF_NONE_MATCH=etag)
+
+        # Assert
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual([p["name"] for p in response.data], ["Credit Card"])
+        mock_publisher.broadcast.assert_called_once_with(
+            "pattern_updates", json.dumps({"version": response["ETag"]})
+        )
+
+    @patch("dlp.signals.publisher")
+    def test_pattern_changes_survive_broadcast_failure(self, mock_publisher):
+        # Arrange
+        mock_publisher.broadcast.side_effect = ConnectionError()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Api-Key {self.api_key}")
+        etag = self.client.get("/api/patterns/")["ETag"]
+
+        # Act
+        with self.assertLogs("dlp.signals", "ERROR"):
+            with self.captureOnCommitCallbacks(execute=True):
+                Pattern.objects.filter(name="SSN").delete()
+        # The revalidation a processor makes once its PATTERN_PUSH_TTL is over
+        response = self.client.get("/api/patterns/", HTTP_IF_NONE_MATCH=etag)
+
+        # Assert: it catches up with the change it was not told about
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual([p["name"] for p in response.data], ["Credit Card"])
+
 
 class CaughtMessageCreateAPIViewTestCase(APITestCase):
     def setUp(self):
@@ -48,7 +113,8 @@ class CaughtMessageCreateAPIViewTestCase(APITestCase):
 
         self.client.credentials(HTTP_AUTHORIZATION=f"Api-Key {self.key}")
 
-    def test_create_caught_message(self):
+    @patch("dlp.views.enqueue_slack_deletion")
+    def test_create_caught_message(self, mock_enqueue_slack_deletion):
         # Arrange
         data = {
             "user_id": "U123456",
@@ -59,25 +125,242 @@ class CaughtMessageCreateAPIViewTestCase(APITestCase):
         }
 
         # Act
-        response = self.client.post("/api/caught_messages/", data, format="json")
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post("/api/caught_messages/", data, format="json")
 
         # Assert
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        mock_enqueue_slack_deletion.assert_called_once_with(
+            "C123456", "1730222429.482539"
+        )
 
         caught_message = CaughtMessage.objects.get(user_id="U123456")
         self.assertEqual(
             caught_message.message_content,
             "This is a test message with 1234-5678-9012-3456.",
         )
+        self.assertEqual(caught_message.dedupe_key, caught_message.get_dedupe_key())
+
+    @patch("dlp.views.enqueue_slack_deletion")
+    def test_create_duplicate_caught_message(self, mock_enqueue_slack_deletion):
+        # Arrange
+        data = {
+            "user_id": "U123456",
+            "channel": "C123456",
+            "timestamp": "1730222429.482539",
+            "message_content": "This is a test message with 1234-5678-9012-3456.",
+            "pattern_matched": self.pattern.id,
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/api/caught_messages/", data, format="json")
+
+        # Act
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post("/api/caught_messages/", data, format="json")
+
+        # Assert
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(CaughtMessage.objects.count(), 1)
+        mock_enqueue_slack_deletion.assert_called_once()
+
+
+class CaughtMessageBulkCreateAPIViewTestCase(APITestCase):
+    def setUp(self):
+        self.credit_card = Pattern.objects.create(
+            name="Credit Card", regex_pattern=r"\b\d{4}-?\d{4}-?\d{4}-?\d{4}\b"
+        )
+        self.ssn = Pattern.objects.create(
+            name="SSN", regex_pattern=r"\b\d{3}-\d{2}-\d{4}\b"
+        )
+
+        self.api_key, self.key = APIKey.objects.create_key(name="test-key")
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Api-Key {self.key}")
+
+    def caught_message(self, pattern, **kwargs):
+        data = {
+            "user_id": "U123456",
+            "channel": "C123456",
+            "timestamp": "1730222429.482539",
+            "message_content": "1234-5678-9012-3456 and 123-45-6789",
+            "pattern_matched": pattern.id,
+        }
+        data.update(kwargs)
+        return data
+
+    @patch("dlp.views.enqueue_slack_deletion")
+    def test_bulk_create_caught_messages(self, mock_enqueue_slack_deletion):
+        # Arrange
+        data = [
+            self.caught_message(self.credit_card),
+            self.caught_message(self.ssn),
+            self.caught_message(self.ssn, timestamp="1730222430.000000"),
+        ]
+
+        # Act
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                "/api/caught_messages/bulk/", data, format="json"
+            )
+
+        # Assert
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(CaughtMessage.objects.count(), 3)
+        self.assertEqual(mock_enqueue_slack_deletion.call_count, 2)
+        mock_enqueue_slack_deletion.assert_any_call("C123456", "1730222429.482539")
+        mock_enqueue_slack_deletion.assert_any_call("C123456", "1730222430.000000")
+
+    @patch("dlp.views.enqueue_slack_deletion")
+    def test_bulk_create_is_all_or_nothing(self, mock_enqueue_slack_deletion):
+        # Arrange
+        data = [
+            self.caught_message(self.credit_card),
+            self.caught_message(self.ssn, pattern_matched=9999),
+        ]
+
+        # Act
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                "/api/caught_messages/bulk/", data, format="json"
+            )
+
+        # Assert
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(CaughtMessage.objects.count(), 0)
+        mock_enqueue_slack_deletion.assert_not_called()
+
+    @patch("dlp.views.enqueue_slack_deletion")
+    def test_bulk_create_validates_patterns_in_one_query(
+        self, mock_enqueue_slack_deletion
+    ):
+        # Arrange
+        data = [self.caught_message(self.credit_card) for _ in range(5)]
+
+        # Act / Assert: API key, patterns, savepoint, existing keys, insert,
+        # savepoint release
+        with self.assertNumQueries(6):
+            response = self.client.post(
+                "/api/caught_messages/bulk/", data, format="json"
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    @patch("dlp.views.enqueue_slack_deletion")
+    def test_bulk_create_skips_redelivered_messages(self, mock_enqueue_slack_deletion):
+        # Arrange
+        data = [
+            self.caught_message(self.credit_card),
+            self.caught_message(self.ssn),
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/api/caught_messages/bulk/", data, format="json")
+        mock_enqueue_slack_deletion.reset_mock()
+
+        # Act: a redelivery reporting the same hits plus a new one
+        data.append(self.caught_message(self.ssn, timestamp="1730222430.000000"))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                "/api/caught_messages/bulk/", data, format="json"
+            )
+
+        # Assert
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.json()), 1)
+        self.assertEqual(CaughtMessage.objects.count(), 3)
+        mock_enqueue_slack_deletion.assert_called_once_with(
+            "C123456", "1730222430.000000"
+        )
+
+    @patch("dlp.views.enqueue_slack_deletion")
+    def test_bulk_create_collapses_duplicates_in_batch(
+        self, mock_enqueue_slack_deletion
+    ):
+        # Arrange
+        data = [self.caught_message(self.ssn), self.caught_message(self.ssn)]
+
+        # Act
+        response = self.client.post("/api/caught_messages/bulk/", data, format="json")
+
+        # Assert
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(CaughtMessage.objects.count(), 1)
+
+    @patch("dlp.views.enqueue_slack_deletion")
+    def test_bulk_create_stores_content_once_per_hash(
+        self, mock_enqueue_slack_deletion
+    ):
+        # Arrange: the content is only sent with the first hit on it
+        content = "1234-5678-9012-3456 and 123-45-6789"
+        content_hash = hashlib.sha256(content.encode()).hexdigest()
+        data = [
+            self.caught_message(
+                self.credit_card,
+                message_content="1234-5678-9012-3456",
+                match_start=0,
+                match_end=19,
+                content_hash=content_hash,
+                content=content,
+            ),
+            self.caught_message(
+                self.ssn,
+                message_content="123-45-6789",
+                match_start=24,
+                match_end=35,
+                content_hash=content_hash,
+            ),
+        ]
+
+        # Act
+        response = self.client.post("/api/caught_messages/bulk/", data, format="json")
+
+        # Assert
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        scanned_content = ScannedContent.objects.get()
+        self.assertEqual(scanned_content.text, content)
+        self.assertEqual(scanned_content.caught_messages.count(), 2)
+        caught_message = CaughtMessage.objects.get(pattern_matched=self.ssn)
+        self.assertEqual(
+            scanned_content.text[caught_message.match_start : caught_message.match_end],
+            "123-45-6789",
+        )
+
+    @patch("dlp.views.enqueue_slack_deletion")
+    def test_bulk_create_rejects_content_hash_mismatch(
+        self, mock_enqueue_slack_deletion
+    ):
+        # Arrange
+        data = [
+            self.caught_message(
+                self.credit_card, content="some text", content_hash="0" * 64
+            )
+        ]
+
+        # Act
+        response = self.client.post("/api/caught_messages/bulk/", data, format="json")
+
+        # Assert
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(ScannedContent.objects.exists())
+
+
+def run_immediately(func, *args):
+    return func(*args)
+
+
+def run_and_swallow_errors(func, *args):
+    try:
+        func(*args)
+    except Exception:
+        pass
 
 
 class SlackEventWebhooksHandlerTestCase(TestCase):
     def setUp(self):
         self.factory = RequestFactory()
         self.slack_signing_secret = "test_secret"
+        caches["slack_events"].clear()
 
     @patch("dlp.views.SignatureVerifier.is_valid_request")
-    def test_url_verification(self, mock_is_valid_request):
+    async def test_url_verification(self, mock_is_valid_request):
         # Arrange
         mock_is_valid_request.return_value = True
 
@@ -94,7 +377,7 @@ class SlackEventWebhooksHandlerTestCase(TestCase):
             HTTP_AUTHORIZATION="Test",
         )
 
-        response = slack_event_webhooks_handler(request)
+        response = await slack_event_webhooks_handler(request)
 
         # Assert
         self.assertEqual(response.status_code, 200)
@@ -102,8 +385,11 @@ class SlackEventWebhooksHandlerTestCase(TestCase):
         self.assertJSONEqual(response.content, {"challenge": "test_challenge"})
 
     @patch("dlp.views.SignatureVerifier.is_valid_request")
+    @patch("dlp.views.run_in_background", side_effect=run_immediately)
     @patch("dlp.views.enqueue_message")
-    def test_event_callback_message(self, mock_enqueue_message, mock_is_valid_request):
+    async def test_event_callback_message(
+        self, mock_enqueue_message, mock_run_in_background, mock_is_valid_request
+    ):
         # Arrange
         mock_is_valid_request.return_value = True
 
@@ -129,7 +415,7 @@ class SlackEventWebhooksHandlerTestCase(TestCase):
         )
 
         # Assert
-        response = slack_event_webhooks_handler(request)
+        response = await slack_event_webhooks_handler(request)
         self.assertEqual(response.status_code, 200)
         mock_enqueue_message.assert_called_once_with(
             "Test message",
@@ -142,9 +428,112 @@ class SlackEventWebhooksHandlerTestCase(TestCase):
         )
 
     @patch("dlp.views.SignatureVerifier.is_valid_request")
+    @patch("dlp.views.run_in_background", side_effect=run_immediately)
+    @patch("dlp.views.enqueue_message")
+    async def test_event_callback_retry_is_skipped(
+        self, mock_enqueue_message, mock_run_in_background, mock_is_valid_request
+    ):
+        # Arrange
+        mock_is_valid_request.return_value = True
+
+        payload = {
+            "type": SlackWebhookEventType.EVENT_CALLBACK.value,
+            "event_id": "Ev123",
+            "event": {
+                "type": SlackEventType.MESSAGE.value,
+                "user": "U123",
+                "channel": "C123",
+                "ts": "1624325400.000200",
+                "text": "Test message",
+            },
+        }
+
+        def request(**headers):
+            return self.factory.post(
+                "/slack/events/",
+                data=json.dumps(payload),
+                content_type="application/json",
+                **headers,
+            )
+
+        # Act
+        first = await slack_event_webhooks_handler(request())
+        retry = await slack_event_webhooks_handler(
+            request(
+                HTTP_X_SLACK_RETRY_NUM="1", HTTP_X_SLACK_RETRY_REASON="http_timeout"
+            )
+        )
+
+        # Assert
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(retry.status_code, 200)
+        mock_enqueue_message.assert_called_once()
+
+    def message_event_request(self, **headers):
+        payload = {
+            "type": SlackWebhookEventType.EVENT_CALLBACK.value,
+            "event_id": "Ev123",
+            "event": {
+                "type": SlackEventType.MESSAGE.value,
+                "user": "U123",
+                "channel": "C123",
+                "ts": "1624325400.000200",
+                "text": "Test message",
+            },
+        }
+        return self.factory.post(
+            "/slack/events/",
+            data=json.dumps(payload),
+            content_type="application/json",
+            **headers,
+        )
+
+    @patch("dlp.views.SignatureVerifier.is_valid_request", return_value=True)
+    @patch("dlp.views.run_in_background", side_effect=run_and_swallow_errors)
+    @patch("dlp.views.enqueue_message")
+    async def test_event_callback_failed_publish_is_redelivered(
+        self, mock_enqueue_message, mock_run_in_background, mock_is_valid_request
+    ):
+        # Arrange
+        mock_enqueue_message.side_effect = [ConnectionError, None]
+
+        # Act
+        first = await slack_event_webhooks_handler(self.message_event_request())
+        retry = await slack_event_webhooks_handler(
+            self.message_event_request(HTTP_X_SLACK_RETRY_NUM="1")
+        )
+
+        # Assert: the claim was released, so the retry is enqueued
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(mock_enqueue_message.call_count, 2)
+
+    @patch("dlp.views.SignatureVerifier.is_valid_request", return_value=True)
+    @patch("dlp.views.run_in_background")
+    @patch("dlp.views.enqueue_message")
+    async def test_event_callback_deferred_when_saturated(
+        self, mock_enqueue_message, mock_run_in_background, mock_is_valid_request
+    ):
+        # Arrange
+        mock_run_in_background.side_effect = BackgroundQueueFull
+
+        # Act
+        first = await slack_event_webhooks_handler(self.message_event_request())
+        mock_run_in_background.side_effect = run_immediately
+        retry = await slack_event_webhooks_handler(
+            self.message_event_request(HTTP_X_SLACK_RETRY_NUM="1")
+        )
+
+        # Assert: turned away for Slack to redeliver, which is then enqueued
+        self.assertEqual(first.status_code, 503)
+        self.assertEqual(retry.status_code, 200)
+        mock_enqueue_message.assert_called_once()
+
+    @patch("dlp.views.SignatureVerifier.is_valid_request")
+    @patch("dlp.views.run_in_background", side_effect=run_immediately)
     @patch("dlp.views.add_bot_to_channel")
-    def test_event_callback_channel_created(
-        self, mock_add_bot_to_channel, mock_is_valid_request
+    async def test_event_callback_channel_created(
+        self, mock_add_bot_to_channel, mock_run_in_background, mock_is_valid_request
     ):
         # Arrange
         mock_is_valid_request.return_value = True
@@ -168,7 +557,7 @@ class SlackEventWebhooksHandlerTestCase(TestCase):
             HTTP_AUTHORIZATION="Test",
         )
 
-        response = slack_event_webhooks_handler(request)
+        response = await slack_event_webhooks_handler(request)
 
         # Assert
         self.assertEqual(response.status_code, 200)
@@ -10,4 +10,9 @@ urlpatterns = [
         views.CaughtMessageCreateAPIView.as_view(),
         name="create_caught_message",
     ),
+    path(
+        "api/caught_messages/bulk/",
+        views.CaughtMessageBulkCreateAPIView.as_view(),
+        name="bulk_create_caught_messages",
+    ),
 ]
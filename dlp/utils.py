@@ -1,43 +1,119 @@
 import json
 import logging
 import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable
 
 import pika
 from slack_sdk import WebClient
 from slack_sdk.errors import SlackApiError
 
+from dlp.publisher import publisher
+
 logger = logging.getLogger(__name__)
 
+# Lets the benchmarks point the Slack client at a local stand-in
+SLACK_API_BASE_URL = os.getenv("SLACK_API_BASE_URL", WebClient.BASE_URL)
 
-def enqueue_message(message_text: str, additional_info: dict) -> None:
+# Slack message texts and their attachments are scanned from separate queues,
+# so slow file scans never hold up text messages
+MESSAGE_QUEUE = "slack_messages"
+FILE_QUEUE = "slack_files"
+
+# Caught Slack messages waiting to be deleted by the process_deletions worker
+DELETION_QUEUE = "slack_deletions"
+
+# Runs the blocking work of Slack events after the webhook has been acknowledged
+background_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("WEBHOOK_WORKERS", "4")),
+    thread_name_prefix="slack-webhook",
+)
+# How many calls may wait for or run on background_executor, beyond that events
+# are turned away for Slack to redeliver instead of queueing without bound
+background_slots = threading.BoundedSemaphore(
+    int(os.getenv("WEBHOOK_QUEUE_LIMIT", "1000"))
+)
+
+
+class BackgroundQueueFull(Exception):
     """
-    Enqueues a message to RabbitMQ to be processed by the dlp_processor service
+    Raised when background_executor already has as many calls as it may queue.
     """
-    rabbitmq_user = os.getenv("RABBITMQ_USER")
-    rabbitmq_password = os.getenv("RABBITMQ_PASSWORD")
-    credentials = pika.PlainCredentials(str(rabbitmq_user), str(rabbitmq_password))
 
-    connection = pika.BlockingConnection(
-        pika.ConnectionParameters(host="rabbitmq", credentials=credentials)
-    )
 
-    task_message = {
-        "task": "scan_message",
-        "args": (message_text,),
-        "kwargs": {"additional_info": additional_info},
-    }
+def _log_background_error(future: Future) -> None:
+    exception = future.exception()
+    if exception is not None:
+        logger.error("Background task failed", exc_info=exception)
+
 
-    channel = connection.channel()
-    channel.queue_declare(queue="slack_messages", durable=True)
-    channel.basic_publish(
-        exchange="",
-        routing_key="slack_messages",
-        body=json.dumps(task_message),
+def _run_in_slot(func: Callable, *args):
+    try:
+        return func(*args)
+    finally:
+        background_slots.release()
+
+
+def run_in_background(func: Callable, *args) -> Future:
+    """
+    Run ``func(*args)`` on a worker thread without waiting for it. Raises
+    BackgroundQueueFull when WEBHOOK_QUEUE_LIMIT calls are already pending.
+    """
+    if not background_slots.acquire(blocking=False):
+        raise BackgroundQueueFull
+    future = background_executor.submit(_run_in_slot, func, *args)
+    future.add_done_callback(_log_background_error)
+    return future
+
+
+def publish_task(queue: str, task: str, *args, **kwargs) -> None:
+    """
+    Publish a task for the dlp_processor service to run from ``queue``.
+    """
+    task_message = {"task": task, "args": args, "kwargs": kwargs}
+
+    publisher.publish(
+        queue,
+        json.dumps(task_message),
         properties=pika.BasicProperties(
             delivery_mode=2,
+            # Lets the processor measure how long messages wait in the queue
+            headers={"enqueued_at": time.time()},
         ),
     )
-    connection.close()
+
+
+def enqueue_message(message_text: str, additional_info: dict) -> None:
+    """
+    Enqueues a message to RabbitMQ to be processed by the dlp_processor service.
+
+    The text is scanned from MESSAGE_QUEUE and every attachment on its own
+    from FILE_QUEUE.
+    """
+    files = additional_info.get("files") or []
+    message_info = {
+        key: value for key, value in additional_info.items() if key != "files"
+    }
+
+    if message_text or not files:
+        publish_task(
+            MESSAGE_QUEUE, "scan_message", message_text, additional_info=message_info
+        )
+    for file_info in files:
+        publish_task(FILE_QUEUE, "scan_file", file_info, additional_info=message_info)
+
+
+def enqueue_slack_deletion(channel: str, ts: str) -> None:
+    """
+    Queue a Slack message for deletion by the process_deletions worker.
+    """
+    publisher.publish(
+        DELETION_QUEUE,
+        json.dumps({"channel": channel, "ts": ts}),
+        properties=pika.BasicProperties(delivery_mode=2),
+    )
 
 
 def add_bot_to_channel(channel_id: str, channel_name: str) -> None:
@@ -45,7 +121,7 @@ def add_bot_to_channel(channel_id: str, channel_name: str) -> None:
     Adds dlp_scanner to a given channel
     """
     slack_bot_token = os.getenv("SLACK_BOT_TOKEN")
-    client = WebClient(token=slack_bot_token)
+    client = WebClient(token=slack_bot_token, base_url=SLACK_API_BASE_URL)
 
     try:
         client.conversations_join(channel=channel_id)
@@ -61,7 +137,7 @@ def delete_slack_message(channel: str, ts: str) -> None:
     Deletes a Slack message based on channel ID and timestamp.
     """
     slack_bot_token = os.getenv("SLACK_BOT_USER")
-    client = WebClient(token=slack_bot_token)
+    client = WebClient(token=slack_bot_token, base_url=SLACK_API_BASE_URL)
 
     try:
         client.chat_delete(channel=channel, ts=ts)
@@ -0,0 +1,147 @@
+import json
+import os
+import re
+import subprocess
+import sys
+from dataclasses import dataclass, field
+from typing import Optional
+
+from django.core.exceptions import ValidationError
+
+# Slowest a single search of one benchmark input may take, in milliseconds
+PATTERN_BUDGET_MS = float(os.getenv("PATTERN_BUDGET_MS", "50"))
+# Hard limit for benchmarking one pattern, in seconds
+PATTERN_BENCHMARK_TIMEOUT = float(os.getenv("PATTERN_BENCHMARK_TIMEOUT", "5"))
+# Length of the benchmark inputs, about a long Slack message
+PATTERN_BENCHMARK_CHARS = int(os.getenv("PATTERN_BENCHMARK_CHARS", "10000"))
+
+# Repeated units of text that make backtracking regexes try many ways to match
+ADVERSARIAL_UNITS = ["1", "1 ", "1-", "1.", "a", "a ", "a.", "a@", "a1", " ", "\n"]
+# Near misses: runs just long enough to start a match, then broken off
+NEAR_MISS_RUN = 15
+
+REPRESENTATIVE_TEXT = (
+    "Hi team, the deploy for ticket OPS-4521 finished at 10:42 UTC. "
+    "Call me on +1 (555) 010-2368 or mail jane.doe@example.com, "
+    "invoice 2024-10-18 #88213 totals $1,234.56 for 3 seats. "
+)
+
+# Runs in a fresh interpreter so a runaway search can be killed without harm
+TIMING_SCRIPT = """
+import json, re, sys, time
+data = json.load(sys.stdin)
+regex = re.compile(data["pattern"])
+for name, text in data["inputs"].items():
+    start = time.perf_counter()
+    regex.search(text)
+    print(json.dumps([name, time.perf_counter() - start]), flush=True)
+"""
+
+
+@dataclass
+class PatternBenchmark:
+    """
+    Search times of a regex per benchmark input, in seconds. ``stalled_on``
+    names the input the search was killed on once the hard limit was hit.
+    """
+
+    timings: dict[str, float] = field(default_factory=dict)
+    stalled_on: Optional[str] = None
+
+    @property
+    def slowest(self) -> tuple[Optional[str], float]:
+        if self.stalled_on is not None:
+            return self.stalled_on, float("inf")
+        if not self.timings:
+            return None, 0.0
+        name = max(self.timings, key=self.timings.get)
+        return name, self.timings[name]
+
+    def over_budget(self, budget_ms: Optional[float] = None) -> bool:
+        if budget_ms is None:
+            budget_ms = PATTERN_BUDGET_MS
+        return self.slowest[1] * 1000 > budget_ms
+
+
+def benchmark_inputs(length: int) -> dict[str, str]:
+    """
+    Representative Slack text plus adversarial inputs of about ``length`` characters.
+    """
+    repeats = length // len(REPRESENTATIVE_TEXT) + 1
+    inputs = {"representative": (REPRESENTATIVE_TEXT * repeats)[:length]}
+    for unit in ADVERSARIAL_UNITS:
+        inputs[f"run of {unit!r}"] = unit * (length // len(unit)) + "!"
+        near_miss = unit * NEAR_MISS_RUN + "!"
+        inputs[f"near misses of {unit!r}"] = near_miss * (length // len(near_miss))
+    return inputs
+
+
+def benchmark_pattern(
+    pattern: str,
+    timeout: Optional[float] = None,
+    length: Optional[int] = None,
+) -> PatternBenchmark:
+    """
+    Time ``pattern`` against every benchmark input in a subprocess, killing
+    it after ``timeout`` seconds.
+    """
+    if timeout is None:
+        timeout = PATTERN_BENCHMARK_TIMEOUT
+    if length is None:
+        length = PATTERN_BENCHMARK_CHARS
+
+    inputs = benchmark_inputs(length)
+    payload = json.dumps({"pattern": pattern, "inputs": inputs})
+
+    try:
+        completed = subprocess.run(
+            [sys.executable, "-c", TIMING_SCRIPT],
+            input=payload,
+            capture_output=True,
+            text=True,
+            timeout=timeout,
+        )
+        output, stalled = completed.stdout, False
+    except subprocess.TimeoutExpired as e:
+        output = e.stdout or ""
+        if isinstance(output, bytes):
+            output = output.decode()
+        stalled = True
+
+    benchmark = PatternBenchmark()
+    for line in output.splitlines():
+        name, seconds = json.loads(line)
+        benchmark.timings[name] = seconds
+
+    if stalled:
+        benchmark.stalled_on = next(
+            (name for name in inputs if name not in benchmark.timings), None
+        )
+    return benchmark
+
+
+def validate_regex_pattern(value: str) -> None:
+    """
+    Reject patterns that don't compile, or whose search of a benchmark input
+    takes longer than PATTERN_BUDGET_MS, such as catastrophically
+    backtracking ones.
+    """
+    try:
+        re.compile(value)
+    except re.error as e:
+        raise ValidationError(f"Invalid regular expression: {e}", code="invalid")
+
+    benchmark = benchmark_pattern(value)
+    name, seconds = benchmark.slowest
+    if benchmark.stalled_on is not None:
+        raise ValidationError(
+            f"Pattern did not finish searching the {name} input within "
+            f"{PATTERN_BENCHMARK_TIMEOUT:g} s, it backtracks catastrophically",
+            code="too_slow",
+        )
+    if benchmark.over_budget():
+        raise ValidationError(
+            f"Pattern took {seconds * 1000:.0f} ms to search the {name} input, "
+            f"over the budget of {PATTERN_BUDGET_MS:g} ms",
+            code="too_slow",
+        )
@@ -1,8 +1,12 @@
 import json
+import logging
 import os
-from typing import Union
+from typing import Iterable, Union
 
+from asgiref.sync import sync_to_async
+from django.db import transaction
 from django.http import HttpRequest, HttpResponse, JsonResponse
+from django.utils.cache import get_conditional_response
 from django.views.decorators.csrf import csrf_exempt
 from rest_framework import status
 from rest_framework.response import Response
@@ -10,17 +14,44 @@ from rest_framework.views import APIView
 from rest_framework_api_key.permissions import HasAPIKey
 from slack_sdk.signature import SignatureVerifier
 
+from dlp.caching import claim_slack_event, get_pattern_list, release_slack_event
 from dlp.enums import SlackEventType, SlackWebhookEventType
-from dlp.models import Pattern
-from dlp.utils import add_bot_to_channel, delete_slack_message, enqueue_message
+from dlp.utils import (
+    BackgroundQueueFull,
+    add_bot_to_channel,
+    enqueue_message,
+    enqueue_slack_deletion,
+    run_in_background,
+)
 
-from .serializers import CaughtMessageSerializer, PatternSerializer
+from .serializers import CaughtMessageSerializer
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_claimed_message(
+    event_key: tuple[str, str, str], message_text: str, additional_info: dict
+) -> None:
+    """
+    Enqueue the message of a claimed Slack event, releasing the claim when it
+    can't be published so a redelivery of the event is not skipped.
+    """
+    try:
+        enqueue_message(message_text, additional_info)
+    except Exception:
+        release_slack_event(*event_key)
+        raise
 
 
 @csrf_exempt
-def slack_event_webhooks_handler(
+async def slack_event_webhooks_handler(
     request: HttpRequest,
 ) -> Union[HttpResponse, JsonResponse]:
+    """
+    Acknowledge Slack events right away. Anything that talks to RabbitMQ or
+    Slack runs in the background so Slack never waits on it, and events are
+    answered with 503 for Slack to redeliver while too many already wait.
+    """
 
     slack_signing_secret = os.environ.get("SLACK_SIGNING_SECRET")
     verifier = SignatureVerifier(signing_secret=str(slack_signing_secret))
@@ -40,13 +71,38 @@ def slack_event_webhooks_handler(
 
             if event.get("type") == SlackEventType.MESSAGE and not event.get("bot_id"):
 
+                event_key = (
+                    str(event.get("channel")),
+                    str(event.get("ts")),
+                    str(event_data.get("event_id")),
+                )
+                is_new_event = await claim_slack_event(*event_key)
+                if not is_new_event:
+                    retry = request.headers.get("X-Slack-Retry-Num")
+                    logger.info(
+                        f"Skipping duplicate event {event_data.get('event_id')} "
+                        f"(retry {retry})"
+                    )
+                    return HttpResponse(status=200)
+
                 additional_info = {
                     "user": event.get("user"),
                     "channel": event.get("channel"),
                     "ts": event.get("ts"),
                     "files": event.get("files", []),
                 }
-                enqueue_message(event.get("text", ""), additional_info)
+                try:
+                    run_in_background(
+                        enqueue_claimed_message,
+                        event_key,
+                        event.get("text", ""),
+                        additional_info,
+                    )
+                except BackgroundQueueFull:
+                    # Slack redelivers the event later, which must not be skipped
+                    logger.warning(f"Too many events queued, deferring {event_key}")
+                    await sync_to_async(release_slack_event)(*event_key)
+                    return HttpResponse(status=503)
 
             elif event.get("type") == SlackEventType.CHANNEL_CREATED:
                 channel_info = event.get("channel")
@@ -54,7 +110,10 @@ def slack_event_webhooks_handler(
                 channel_name = channel_info.get("name")
 
                 if channel_id:
-                    add_bot_to_channel(channel_id, channel_name)
+                    try:
+                        run_in_background(add_bot_to_channel, channel_id, channel_name)
+                    except BackgroundQueueFull:
+                        return HttpResponse(status=503)
 
         return HttpResponse(status=200)
 
@@ -66,10 +125,34 @@ class PatternListAPIView(APIView):
     permission_classes = [HasAPIKey]
 
     def get(self, request):
-        """@TODO: include caching here"""
-        patterns = Pattern.objects.all()
-        serializer = PatternSerializer(patterns, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        """
+        Serve the cached pattern list, answering conditional requests with
+        304 Not Modified while the patterns are unchanged.
+        """
+        pattern_list = get_pattern_list()
+
+        response = Response(pattern_list["data"], status=status.HTTP_200_OK)
+        response["ETag"] = pattern_list["etag"]
+
+        return get_conditional_response(
+            request, etag=pattern_list["etag"], response=response
+        )
+
+
+def queue_deletions(messages: Iterable[tuple[str, str]]) -> None:
+    """
+    Queue Slack messages for deletion once the caught messages are committed,
+    so ingestion never waits on Slack.
+    """
+
+    def publish():
+        for channel, timestamp in messages:
+            try:
+                enqueue_slack_deletion(str(channel), str(timestamp))
+            except Exception:
+                logger.exception(f"Failed to queue deletion of {timestamp}")
+
+    transaction.on_commit(publish)
 
 
 class CaughtMessageCreateAPIView(APIView):
@@ -80,14 +163,36 @@ class CaughtMessageCreateAPIView(APIView):
         if serializer.is_valid():
             serializer.save()
 
-            try:
+            if not serializer.created:
+                # Already stored and queued for deletion by an earlier delivery
+                return Response(serializer.data, status=status.HTTP_200_OK)
+
+            channel = serializer.validated_data.get("channel")
+            timestamp = serializer.validated_data.get("timestamp")
+            queue_deletions([(channel, timestamp)])
+
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
 
-                channel = serializer.validated_data.get("channel")
-                timestamp = serializer.validated_data.get("timestamp")
+class CaughtMessageBulkCreateAPIView(APIView):
+    permission_classes = [HasAPIKey]
 
-                delete_slack_message(str(channel), str(timestamp))
+    def post(self, request):
+        serializer = CaughtMessageSerializer(data=request.data, many=True)
+        if serializer.is_valid():
+            with transaction.atomic():
+                created = serializer.save()
+
+                # Several patterns usually hit the same Slack message, delete it
+                # once. Messages only reported again by a redelivery were
+                # queued already.
+                queue_deletions(
+                    dict.fromkeys(
+                        (caught_message.channel, caught_message.timestamp)
+                        for caught_message in created
+                    )
+                )
 
-            except Exception as e:
-                print(e)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
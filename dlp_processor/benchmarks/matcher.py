@@ -0,0 +1,110 @@
+"""
+Compare the Matcher prefilter against one ``search`` per pattern.
+
+Run from the dlp_processor directory:
+
+    python -m benchmarks.matcher
+    python -m benchmarks.matcher --sizes 10 100 1000 --text-kb 256
+"""
+
+import argparse
+import random
+import re
+import string
+import time
+
+from matcher import Matcher
+from patterns import CompiledPattern
+
+
+def build_patterns(count: int, seed: int = 0) -> list[CompiledPattern]:
+    """
+    Generate ``count`` DLP-like patterns: the usual SSN and credit card shapes
+    plus keyword prefixed secrets and identifiers.
+    """
+    rng = random.Random(seed)
+    regexes = [r"\b\d{3}-\d{2}-\d{4}\b", r"\b\d{4}-?\d{4}-?\d{4}-?\d{4}\b"]
+    while len(regexes) < count:
+        keyword = "".join(rng.choices(string.ascii_lowercase, k=rng.randint(5, 10)))
+        if len(regexes) % 2:
+            regexes.append(rf"\b{keyword}[:=]\s*[A-Za-z0-9]{{8,}}")
+        else:
+            regexes.append(rf"\b{keyword.upper()}-\d{{{4 + len(regexes) % 5}}}\b")
+
+    return [
+        CompiledPattern(index, f"pattern {index}", re.compile(regex))
+        for index, regex in enumerate(regexes[:count])
+    ]
+
+
+def build_text(size_kb: int, digits: bool = True, seed: int = 0) -> str:
+    """
+    Generate prose-like text without sensitive data, optionally sprinkled
+    with numbers.
+    """
+    rng = random.Random(seed)
+    words = []
+    length = 0
+    while length < size_kb * 1024:
+        if digits and rng.random() < 0.1:
+            word = str(rng.randint(0, 99999))
+        else:
+            word = "".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 9)))
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)
+
+
+def sequential_scan(patterns: list[CompiledPattern], text: str) -> list[int]:
+    return [pattern.id for pattern in patterns if pattern.regex.search(text)]
+
+
+def timed(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--text-kb", type=int, default=64)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    texts = {
+        "words": build_text(args.text_kb, digits=False),
+        "numbers": build_text(args.text_kb),
+        "hit": build_text(args.text_kb) + " SSN 123-45-6789",
+    }
+
+    print(f"text size: {args.text_kb} KiB, best of {args.repeat}, times in ms")
+    print(
+        f"{'patterns':>8} {'build':>8}"
+        + "".join(f" {name + ' seq':>12} {name + ' matcher':>15}" for name in texts)
+    )
+
+    for size in args.sizes:
+        patterns = build_patterns(size)
+
+        start = time.perf_counter()
+        matcher = Matcher(patterns)
+        build_time = time.perf_counter() - start
+
+        row = f"{size:>8} {build_time * 1000:>8.2f}"
+        for text in texts.values():
+            assert [m.pattern_id for m in matcher.scan(text)] == sequential_scan(
+                patterns, text
+            )
+            sequential = timed(lambda: sequential_scan(patterns, text), args.repeat)
+            prefiltered = timed(lambda: matcher.scan(text), args.repeat)
+            row += f" {sequential * 1000:>12.2f} {prefiltered * 1000:>15.2f}"
+
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
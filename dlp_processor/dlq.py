@@ -0,0 +1,144 @@
+"""
+Inspect, requeue and purge the messages the processor dead-lettered:
+
+    python dlq.py list --limit 20
+    python dlq.py requeue --limit 100
+    python dlq.py purge
+"""
+
+import argparse
+import asyncio
+import json
+import os
+from datetime import datetime, timezone
+from typing import Optional
+
+import aio_pika
+from aio_pika.abc import AbstractChannel, AbstractIncomingMessage
+from manager import dead_letter_queue_name
+
+# Headers the processor adds when a message fails, dropped on requeue
+FAILURE_HEADERS = ("attempts", "last_error", "dead_lettered_at")
+
+
+def describe(message: AbstractIncomingMessage) -> dict:
+    headers = message.headers or {}
+    dead_lettered_at = headers.get("dead_lettered_at")
+    try:
+        body = json.loads(message.body.decode())
+    except ValueError:
+        body = message.body.decode(errors="replace")
+    return {
+        "dead_lettered_at": (
+            datetime.fromtimestamp(dead_lettered_at, timezone.utc).isoformat()
+            if isinstance(dead_lettered_at, (int, float))
+            else None
+        ),
+        "attempts": headers.get("attempts"),
+        "error": headers.get("last_error"),
+        "body": body,
+    }
+
+
+async def get_messages(
+    channel: AbstractChannel, queue_name: str, limit: Optional[int]
+) -> list[AbstractIncomingMessage]:
+    """
+    Get up to ``limit`` messages from the head of a queue without acking
+    them, so they return to it unless acked before the channel is closed.
+    """
+    queue = await channel.declare_queue(queue_name, durable=True)
+    messages = []
+    while limit is None or len(messages) < limit:
+        message = await queue.get(no_ack=False, fail=False)
+        if message is None:
+            break
+        messages.append(message)
+    return messages
+
+
+async def list_dead_letters(
+    channel: AbstractChannel, queue_name: str, limit: Optional[int]
+) -> list[dict]:
+    messages = await get_messages(channel, dead_letter_queue_name(queue_name), limit)
+    return [describe(message) for message in messages]
+
+
+async def requeue_dead_letters(
+    channel: AbstractChannel, queue_name: str, limit: Optional[int]
+) -> int:
+    """
+    Move dead-lettered messages back to ``queue_name`` with a fresh count
+    of attempts, e.g. once the bug that failed them is fixed.
+    """
+    await channel.declare_queue(queue_name, durable=True)
+    messages = await get_messages(channel, dead_letter_queue_name(queue_name), limit)
+    for message in messages:
+        headers = {
+            key: value
+            for key, value in (message.headers or {}).items()
+            if key not in FAILURE_HEADERS
+        }
+        await channel.default_exchange.publish(
+            aio_pika.Message(
+                message.body,
+                headers=headers,
+                content_type=message.content_type,
+                delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+            ),
+            routing_key=queue_name,
+        )
+        await message.ack()
+    return len(messages)
+
+
+async def purge_dead_letters(channel: AbstractChannel, queue_name: str) -> int:
+    dead_letter_queue = dead_letter_queue_name(queue_name)
+    queue = await channel.declare_queue(dead_letter_queue, durable=True)
+    result = await queue.purge()
+    return result.message_count
+
+
+async def run(args: argparse.Namespace) -> None:
+    connection = await aio_pika.connect(
+        host=args.host,
+        login=str(os.getenv("RABBITMQ_USER")),
+        password=str(os.getenv("RABBITMQ_PASSWORD")),
+    )
+    async with connection:
+        channel = await connection.channel()
+        if args.command == "list":
+            for entry in await list_dead_letters(channel, args.queue, args.limit):
+                print(json.dumps(entry))
+        elif args.command == "requeue":
+            count = await requeue_dead_letters(channel, args.queue, args.limit)
+            print(f"Requeued {count} messages to {args.queue}")
+        elif args.command == "purge":
+            count = await purge_dead_letters(channel, args.queue)
+            print(f"Purged {count} messages from {dead_letter_queue_name(args.queue)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--host", default="rabbitmq")
+    parser.add_argument(
+        "--queue",
+        default="slack_messages",
+        help="queue whose dead letters to handle",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    list_parser = commands.add_parser("list", help="print dead letters as JSON lines")
+    list_parser.add_argument("--limit", type=int, default=20)
+    requeue_parser = commands.add_parser(
+        "requeue", help="move dead letters back to the queue"
+    )
+    requeue_parser.add_argument("--limit", type=int, default=None)
+    commands.add_parser("purge", help="delete every dead letter")
+
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
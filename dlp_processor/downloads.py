@@ -0,0 +1,111 @@
+import hashlib
+import io
+import os
+import tempfile
+from dataclasses import dataclass
+from typing import BinaryIO, Optional, Union
+
+
+class DownloadTooLarge(Exception):
+    pass
+
+
+@dataclass
+class Download:
+    """
+    A downloaded file, held in memory or spilled to a temporary file.
+    """
+
+    size: int
+    sha256: str
+    content: Optional[bytes] = None
+    path: Optional[str] = None
+
+    @property
+    def source(self) -> Union[bytes, str]:
+        """
+        What extraction reads from: the bytes, or the path of the spilled file.
+        """
+        return self.path if self.path is not None else self.content
+
+    def cleanup(self) -> None:
+        if self.path is not None:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+            self.path = None
+
+
+class DownloadBuffer:
+    """
+    Collects a download chunk by chunk without ever holding more than
+    ``spill_bytes`` in memory: larger files are moved to a temporary file in
+    ``directory``. Raises DownloadTooLarge once more than ``max_bytes`` arrived.
+    The SHA-256 of the content is computed along the way.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        spill_bytes: Optional[int] = None,
+        directory: Optional[str] = None,
+    ):
+        if spill_bytes is None:
+            spill_bytes = int(os.getenv("DOWNLOAD_SPILL_BYTES", str(8 * 1024 * 1024)))
+        if directory is None:
+            directory = os.getenv("DOWNLOAD_DIR") or None
+
+        self.max_bytes = max_bytes
+        self.spill_bytes = spill_bytes
+        self.directory = directory
+
+        self.size = 0
+        self._hash = hashlib.sha256()
+        self._buffer: BinaryIO = io.BytesIO()
+        self._path: Optional[str] = None
+
+    def write(self, chunk: bytes) -> None:
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise DownloadTooLarge(f"Download exceeds {self.max_bytes} bytes")
+
+        self._hash.update(chunk)
+
+        if self._path is None and self.size > self.spill_bytes:
+            spill = tempfile.NamedTemporaryFile(
+                dir=self.directory, prefix="dlp-", suffix=".download", delete=False
+            )
+            spill.write(self._buffer.getvalue())
+            self._buffer = spill
+            self._path = spill.name
+
+        self._buffer.write(chunk)
+
+    def finish(self) -> Download:
+        digest = self._hash.hexdigest()
+        if self._path is None:
+            return Download(
+                size=self.size, sha256=digest, content=self._buffer.getvalue()
+            )
+
+        self._buffer.close()
+        return Download(size=self.size, sha256=digest, path=self._path)
+
+    def abort(self) -> None:
+        self._buffer.close()
+        if self._path is not None:
+            try:
+                os.remove(self._path)
+            except FileNotFoundError:
+                pass
+            self._path = None
+
+
+def open_source(source: Union[bytes, str]) -> BinaryIO:
+    """
+    Open the content of a Download for reading, in memory or from disk.
+    """
+    if isinstance(source, bytes):
+        return io.BytesIO(source)
+    return open(source, "rb")
@@ -0,0 +1,105 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ExtractionPool:
+    """
+    Runs CPU-bound file extraction in a pool of worker processes so it never
+    blocks the asyncio event loop.
+
+    The pool is created lazily on first use. At most ``max_workers`` calls are
+    submitted at a time, the others wait their turn here, so ``timeout`` only
+    counts the time a call spends running. A call that takes longer than
+    ``timeout`` seconds raises ``asyncio.TimeoutError`` and the pool is
+    terminated, since a runaway call (e.g. a backtracking regex) can't be
+    interrupted otherwise. Calls running next to it fail with
+    ``BrokenProcessPool``, and the next call starts a new pool.
+    """
+
+    def __init__(
+        self, max_workers: Optional[int] = None, timeout: Optional[float] = None
+    ):
+        if max_workers is None:
+            max_workers = int(os.getenv("EXTRACTION_WORKERS", "0")) or os.cpu_count()
+        if timeout is None:
+            timeout = float(os.getenv("EXTRACTION_TIMEOUT", "60"))
+
+        self.max_workers = max_workers
+        self.timeout = timeout
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._slots = asyncio.Semaphore(max_workers)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # Forking a process that already runs the event loop's threads is unsafe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    async def run(self, func: Callable, *args, timeout: Optional[float] = None) -> Any:
+        """
+        Run ``func(*args)`` in a worker process and return its result, within
+        ``timeout`` seconds or the pool's own timeout.
+        """
+        async with self._slots:
+            # The pool may be restarted while the call runs, only the one it
+            # was submitted to may be torn down on its account
+            executor = self._get_executor()
+            future = executor.submit(func, *args)
+            try:
+                return await asyncio.wait_for(
+                    asyncio.wrap_future(future), timeout or self.timeout
+                )
+            except asyncio.TimeoutError:
+                # A call still waiting for a worker process is just dropped,
+                # only a runaway one is worth killing the pool for
+                if not future.cancel() and not future.done():
+                    logger.error("Extraction worker timed out, terminating the pool")
+                    self.terminate(executor)
+                raise
+            except BrokenProcessPool:
+                # A worker died (e.g. killed for using too much memory), start over
+                if self._executor is executor:
+                    logger.error("Extraction worker died, restarting the pool")
+                    self.shutdown(executor)
+                raise
+            except asyncio.CancelledError:
+                # Cancelled by the teardown of its pool rather than by the caller
+                if future.cancelled() and self._executor is not executor:
+                    raise BrokenProcessPool("The pool was terminated") from None
+                raise
+
+    def terminate(self, expected: Optional[ProcessPoolExecutor] = None) -> None:
+        """
+        Kill the worker processes, including those still busy, and drop the
+        pool, unless it was already replaced by another than ``expected``.
+        """
+        executor = self._executor
+        if executor is None or (expected is not None and executor is not expected):
+            return
+        for process in list(executor._processes.values()):
+            process.terminate()
+        self.shutdown(executor)
+
+    def shutdown(self, expected: Optional[ProcessPoolExecutor] = None) -> None:
+        executor = self._executor
+        if executor is None or (expected is not None and executor is not expected):
+            return
+        self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+extraction_pool = ExtractionPool()
+# Message texts are scanned in a pool of their own, so they never wait behind
+# file extractions or fail with them when a runaway extraction is killed
+scan_pool = ExtractionPool(max_workers=int(os.getenv("SCAN_WORKERS", "2")))
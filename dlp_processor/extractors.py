@@ -0,0 +1,379 @@
+import dataclasses
+import io
+import logging
+import posixpath
+import re
+import zipfile
+from dataclasses import dataclass, field
+from typing import BinaryIO, Callable, Iterator, Optional
+from xml.etree.ElementTree import iterparse
+
+from pdfminer.high_level import extract_pages, extract_text
+from pdfminer.layout import LTContainer, LTItem, LTPage, LTText, LTTextBox
+
+logger = logging.getLogger(__name__)
+
+# Extracted text is handed to the matcher in chunks of about this many characters
+TEXT_CHUNK_CHARS = 64 * 1024
+
+WORD_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+SHEET_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+
+
+@dataclass(frozen=True)
+class ExtractionLimits:
+    """
+    Bounds on how much of a file an extractor reads.
+    """
+
+    max_pages: int = 0
+    streaming: bool = True
+    max_archive_members: int = 1000
+    max_archive_bytes: int = 200 * 1024 * 1024
+    max_archive_depth: int = 2
+    # What is left of the max_archive_bytes of the outermost archive, shared
+    # with the archives and documents nested in it
+    budget: Optional[list[int]] = field(default=None, repr=False, compare=False)
+
+
+def archive_budget(limits: ExtractionLimits) -> list[int]:
+    """
+    The bytes an archive may still expand to, as a list shared by every
+    BoundedReader reading from it.
+    """
+    if limits.budget is not None:
+        return limits.budget
+    return [limits.max_archive_bytes]
+
+
+class ExtractionLimitExceeded(Exception):
+    pass
+
+
+# Yields the text of a file chunk by chunk
+Extractor = Callable[[BinaryIO, ExtractionLimits], Iterator[str]]
+
+_by_filetype: dict[str, Extractor] = {}
+_by_mimetype: dict[str, Extractor] = {}
+_by_extension: dict[str, Extractor] = {}
+
+
+def register_extractor(
+    filetypes: tuple[str, ...] = (),
+    mimetypes: tuple[str, ...] = (),
+    extensions: tuple[str, ...] = (),
+) -> Callable[[Extractor], Extractor]:
+    """
+    Register an extractor for Slack filetypes, mimetypes and file name
+    extensions (the latter are used for archive members).
+    """
+
+    def decorator(extractor: Extractor) -> Extractor:
+        for filetype in filetypes:
+            _by_filetype[filetype] = extractor
+        for mimetype in mimetypes:
+            _by_mimetype[mimetype] = extractor
+        for extension in extensions:
+            _by_extension[extension] = extractor
+        return extractor
+
+    return decorator
+
+
+def find_extractor(
+    filetype: Optional[str] = None,
+    mimetype: Optional[str] = None,
+    filename: Optional[str] = None,
+) -> Optional[Extractor]:
+    """
+    Return the extractor for a file, preferring its Slack filetype.
+    """
+    if filetype in _by_filetype:
+        return _by_filetype[filetype]
+
+    if mimetype:
+        mimetype = mimetype.split(";")[0].strip().lower()
+        if mimetype in _by_mimetype:
+            return _by_mimetype[mimetype]
+
+    if filename:
+        extension = posixpath.splitext(filename)[1].lower()
+        if extension in _by_extension:
+            return _by_extension[extension]
+
+    if mimetype and mimetype.startswith("text/"):
+        return extract_plain_text
+    return None
+
+
+def chunked(parts: Iterator[str]) -> Iterator[str]:
+    """
+    Join small pieces of text into chunks of about TEXT_CHUNK_CHARS.
+    """
+    buffer: list[str] = []
+    size = 0
+    for part in parts:
+        buffer.append(part)
+        size += len(part)
+        if size >= TEXT_CHUNK_CHARS:
+            yield "".join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer)
+
+
+class BoundedReader(io.RawIOBase):
+    """
+    Wraps a stream and raises ExtractionLimitExceeded once the bytes read
+    through every reader sharing ``budget`` exceed the limit. Guards against
+    archives that decompress to far more than their download size.
+    """
+
+    def __init__(self, raw: BinaryIO, budget: list[int]):
+        self.raw = raw
+        self.budget = budget
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self.raw.read(len(buffer))
+        self.budget[0] -= len(data)
+        if self.budget[0] < 0:
+            raise ExtractionLimitExceeded("Archive expands beyond its size limit")
+        buffer[: len(data)] = data
+        return len(data)
+
+
+def page_text(page: LTPage) -> str:
+    """
+    Render the text of one layout page the same way pdfminer's ``extract_text`` does.
+    """
+    parts: list[str] = []
+
+    def render(item: LTItem) -> None:
+        if isinstance(item, LTContainer):
+            for child in item:
+                render(child)
+        elif isinstance(item, LTText):
+            parts.append(item.get_text())
+        if isinstance(item, LTTextBox):
+            parts.append("\n")
+
+    render(page)
+    parts.append("\f")
+    return "".join(parts)
+
+
+def extract_text_from_pdf(f: BinaryIO, max_pages: int = 0) -> str:
+    """
+    Extract the text of a whole PDF at once.
+    """
+    return extract_text(f, maxpages=max_pages)
+
+
+def iter_pdf_pages(f: BinaryIO, max_pages: int = 0) -> Iterator[str]:
+    """
+    Yield the text of a PDF one page at a time.
+    """
+    for page in extract_pages(f, maxpages=max_pages):
+        yield page_text(page)
+
+
+@register_extractor(
+    filetypes=("pdf",), mimetypes=("application/pdf",), extensions=(".pdf",)
+)
+def extract_pdf(f: BinaryIO, limits: ExtractionLimits) -> Iterator[str]:
+    if limits.streaming:
+        yield from iter_pdf_pages(f, limits.max_pages)
+    else:
+        yield extract_text_from_pdf(f, limits.max_pages)
+
+
+@register_extractor(
+    filetypes=(
+        "text",
+        "csv",
+        "tsv",
+        "markdown",
+        "json",
+        "xml",
+        "html",
+        "yaml",
+    ),
+    mimetypes=("application/json", "application/xml", "application/x-yaml"),
+    extensions=(
+        ".txt",
+        ".csv",
+        ".tsv",
+        ".md",
+        ".json",
+        ".xml",
+        ".html",
+        ".yaml",
+        ".log",
+    ),
+)
+def extract_plain_text(f: BinaryIO, limits: ExtractionLimits) -> Iterator[str]:
+    """
+    Decode the file as UTF-8 and read it chunk by chunk, no parsing needed.
+    """
+    reader = io.TextIOWrapper(f, encoding="utf-8-sig", errors="replace")
+    try:
+        while True:
+            chunk = reader.read(TEXT_CHUNK_CHARS)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        # Leave closing the underlying stream to its owner
+        reader.detach()
+
+
+def iter_docx_paragraphs(part: BinaryIO) -> Iterator[str]:
+    parts: list[str] = []
+    for _, element in iterparse(part, events=("end",)):
+        if element.tag == f"{WORD_NS}t":
+            parts.append(element.text or "")
+        elif element.tag == f"{WORD_NS}tab":
+            parts.append("\t")
+        elif element.tag in (f"{WORD_NS}br", f"{WORD_NS}cr"):
+            parts.append("\n")
+        elif element.tag == f"{WORD_NS}p":
+            parts.append("\n")
+            yield "".join(parts)
+            parts = []
+            element.clear()
+
+
+def docx_parts(names: list[str]) -> list[str]:
+    """
+    The parts of a DOCX holding text: the body first, then the rest.
+    """
+    pattern = re.compile(r"word/(header\d*|footer\d*|footnotes|endnotes|comments)\.xml")
+    return ["word/document.xml"] + sorted(filter(pattern.fullmatch, names))
+
+
+@register_extractor(
+    filetypes=("docx",),
+    mimetypes=(
+        "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    ),
+    extensions=(".docx",),
+)
+def extract_docx(f: BinaryIO, limits: ExtractionLimits) -> Iterator[str]:
+    budget = archive_budget(limits)
+    with zipfile.ZipFile(f) as archive:
+        names = archive.namelist()
+        for name in docx_parts(names):
+            if name not in names:
+                continue
+            with archive.open(name) as part:
+                yield from chunked(iter_docx_paragraphs(BoundedReader(part, budget)))
+
+
+def xlsx_shared_strings(archive: zipfile.ZipFile, budget: list[int]) -> list[str]:
+    if "xl/sharedStrings.xml" not in archive.namelist():
+        return []
+
+    strings: list[str] = []
+    with archive.open("xl/sharedStrings.xml") as part:
+        for _, element in iterparse(BoundedReader(part, budget), events=("end",)):
+            if element.tag == f"{SHEET_NS}si":
+                strings.append(
+                    "".join(t.text or "" for t in element.iter(f"{SHEET_NS}t"))
+                )
+                element.clear()
+    return strings
+
+
+def iter_xlsx_rows(part: BinaryIO, shared_strings: list[str]) -> Iterator[str]:
+    values: list[str] = []
+    for _, element in iterparse(part, events=("end",)):
+        if element.tag == f"{SHEET_NS}c":
+            cell_type = element.get("t")
+            if cell_type == "inlineStr":
+                value = "".join(t.text or "" for t in element.iter(f"{SHEET_NS}t"))
+            else:
+                value = element.findtext(f"{SHEET_NS}v") or ""
+                if cell_type == "s" and value.isdigit():
+                    index = int(value)
+                    if index < len(shared_strings):
+                        value = shared_strings[index]
+            values.append(value)
+        elif element.tag == f"{SHEET_NS}row":
+            yield "\t".join(values) + "\n"
+            values = []
+            element.clear()
+
+
+@register_extractor(
+    filetypes=("xlsx",),
+    mimetypes=("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",),
+    extensions=(".xlsx",),
+)
+def extract_xlsx(f: BinaryIO, limits: ExtractionLimits) -> Iterator[str]:
+    budget = archive_budget(limits)
+    with zipfile.ZipFile(f) as archive:
+        shared_strings = xlsx_shared_strings(archive, budget)
+        sheets = sorted(
+            (
+                name
+                for name in archive.namelist()
+                if re.fullmatch(r"xl/worksheets/sheet\d+\.xml", name)
+            ),
+            key=lambda name: int(re.search(r"\d+", posixpath.basename(name)).group()),
+        )
+        for name in sheets:
+            with archive.open(name) as part:
+                rows = iter_xlsx_rows(BoundedReader(part, budget), shared_strings)
+                yield from chunked(rows)
+            yield "\f"
+
+
+@register_extractor(
+    filetypes=("zip",),
+    mimetypes=("application/zip", "application/x-zip-compressed"),
+    extensions=(".zip",),
+)
+def extract_zip(f: BinaryIO, limits: ExtractionLimits) -> Iterator[str]:
+    """
+    Walk the archive member by member, extracting each one whose type is
+    supported. Nested archives are followed up to ``max_archive_depth``, and
+    draw on the same ``max_archive_bytes`` as the archive they are in.
+    """
+    budget = archive_budget(limits)
+    nested_limits = dataclasses.replace(
+        limits, max_archive_depth=limits.max_archive_depth - 1, budget=budget
+    )
+
+    with zipfile.ZipFile(f) as archive:
+        members = [info for info in archive.infolist() if not info.is_dir()]
+        if len(members) > limits.max_archive_members:
+            logger.warning(
+                f"Archive has {len(members)} members, "
+                f"scanning the first {limits.max_archive_members}"
+            )
+
+        for info in members[: limits.max_archive_members]:
+            extractor = find_extractor(filename=info.filename)
+            if extractor is None:
+                continue
+            if extractor is extract_zip and limits.max_archive_depth <= 0:
+                logger.warning(f"Skipping nested archive {info.filename}")
+                continue
+
+            with archive.open(info) as member:
+                stream = BoundedReader(member, budget)
+                if extractor is extract_plain_text:
+                    yield from extractor(io.BufferedReader(stream), nested_limits)
+                else:
+                    # Other formats need random access, read the member first
+                    if info.file_size > budget[0]:
+                        raise ExtractionLimitExceeded(
+                            "Archive expands beyond its size limit"
+                        )
+                    with io.BytesIO(stream.read(info.file_size)) as data:
+                        yield from extractor(data, nested_limits)
+            # Keep the page overlap from joining text of different members
+            yield "\f"
@@ -0,0 +1,201 @@
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+    """
+    A dict that forgets its least recently used entries beyond ``max_entries``,
+    or beyond ``max_size`` in total as measured by ``size`` when one is given.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        max_size: int = 0,
+        size: Optional[Callable[[Any], int]] = None,
+    ):
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self.size = size
+        self._entries: OrderedDict = OrderedDict()
+        self._sizes: dict = {}
+        self._total_size = 0
+
+    def get(self, key) -> Any:
+        if key not in self._entries:
+            return None
+        self._entries.move_to_end(key)
+        return self._entries[key]
+
+    def put(self, key, value) -> None:
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if self.size is not None:
+            self._total_size -= self._sizes.get(key, 0)
+            self._sizes[key] = self.size(value)
+            self._total_size += self._sizes[key]
+
+        while len(self._entries) > self.max_entries or (
+            self.max_size and self._total_size > self.max_size
+        ):
+            evicted, _ = self._entries.popitem(last=False)
+            self._total_size -= self._sizes.pop(evicted, 0)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def results_size(results: list) -> int:
+    """
+    Characters of page text held by scan results, each page counted once.
+    """
+    return sum(len(text) for text in {text for _, text in results})
+
+
+class FileScanCache:
+    """
+    Remembers the scan results of files so a file shared into several
+    channels, or re-uploaded, is not downloaded and extracted again.
+
+    Two mappings are kept: Slack file id -> SHA-256 of the content, which
+    lets a known file skip the download, and (content hash, scan key) ->
+    results, which lets identical content skip the extraction. The scan key
+    identifies the pattern-set version and scan settings the results belong
+    to, so a pattern change never serves stale results.
+
+    Both live in memory with LRU eviction, results bounded by the
+    ``max_bytes`` of page text they hold as well. When ``directory`` is set
+    they are also pickled to disk, bounded to ``max_disk_entries`` files per
+    mapping, so they survive restarts and are shared by processors on the same
+    host. Results with matches keep the page text the matches were found in,
+    which must not be left on disk in plain text, so only results without
+    matches are written there.
+    """
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        directory: Optional[str] = None,
+        max_disk_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+    ):
+        if max_entries is None:
+            max_entries = int(os.getenv("FILE_CACHE_SIZE", "1024"))
+        if max_bytes is None:
+            max_bytes = int(os.getenv("FILE_CACHE_BYTES", str(64 * 1024 * 1024)))
+        if directory is None:
+            directory = os.getenv("FILE_CACHE_DIR") or None
+        if max_disk_entries is None:
+            max_disk_entries = int(os.getenv("FILE_CACHE_DISK_ENTRIES", "10000"))
+
+        self.directory = directory
+        self.max_disk_entries = max_disk_entries
+
+        self._hashes = LRUCache(max_entries)
+        self._results = LRUCache(max_entries, max_bytes, results_size)
+        # Files in each disk directory as of the last write, so the directory
+        # is only listed again once it has grown past max_disk_entries
+        self._disk_counts: dict[str, int] = {}
+
+    def _disk_path(self, kind: str, key) -> str:
+        name = hashlib.sha256(repr(key).encode()).hexdigest()
+        return os.path.join(self.directory, kind, f"{name}.pickle")
+
+    def _disk_get(self, kind: str, key) -> Any:
+        if not self.directory:
+            return None
+        try:
+            with open(self._disk_path(kind, key), "rb") as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            logger.exception(f"Ignoring unreadable cache entry {kind}/{key}")
+            return None
+
+    def _disk_put(self, kind: str, key, value: Any) -> None:
+        if not self.directory:
+            return
+        path = self._disk_path(kind, key)
+        directory = os.path.dirname(path)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            is_new = not os.path.exists(path)
+            # Write to a temporary file first so readers never see half an entry
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(value, f)
+            os.replace(tmp_path, path)
+        except OSError:
+            logger.exception(f"Failed to write cache entry {kind}/{key}")
+            return
+
+        if directory not in self._disk_counts:
+            self._disk_counts[directory] = self._prune(directory)
+        elif is_new:
+            self._disk_counts[directory] += 1
+            if self._disk_counts[directory] > self.max_disk_entries:
+                self._disk_counts[directory] = self._prune(directory)
+
+    def _prune(self, directory: str) -> int:
+        """
+        Remove the oldest entries beyond ``max_disk_entries``, and a tenth more
+        so the next few writes don't list the directory again. Other processes
+        may write to it too, so the entries are counted anew. Returns how many
+        are left.
+        """
+        entries = [
+            entry for entry in os.scandir(directory) if entry.name.endswith(".pickle")
+        ]
+        if len(entries) <= self.max_disk_entries:
+            return len(entries)
+
+        keep = self.max_disk_entries - self.max_disk_entries // 10
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[: len(entries) - keep]:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+        return keep
+
+    def _get(self, memory: LRUCache, kind: str, key) -> Any:
+        value = memory.get(key)
+        if value is None:
+            value = self._disk_get(kind, key)
+            if value is not None:
+                memory.put(key, value)
+        return value
+
+    def get_hash(self, file_id: str) -> Optional[str]:
+        """
+        Return the content hash of a file scanned before, if still cached.
+        """
+        return self._get(self._hashes, "files", file_id)
+
+    def get(self, digest: str, scan_key: str) -> Optional[list]:
+        """
+        Return the results of scanning content with ``digest`` under ``scan_key``.
+        """
+        return self._get(self._results, "results", (digest, scan_key))
+
+    def put(
+        self, file_id: Optional[str], digest: str, scan_key: str, results: list
+    ) -> None:
+        if file_id:
+            self._hashes.put(file_id, digest)
+            self._disk_put("files", file_id, digest)
+
+        self._results.put((digest, scan_key), results)
+        if not results:
+            self._disk_put("results", (digest, scan_key), results)
+
+
+file_scan_cache = FileScanCache()
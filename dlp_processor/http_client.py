@@ -0,0 +1,99 @@
+import logging
+import os
+from typing import Optional
+
+import aiohttp
+from metrics import (
+    HTTP_CONNECTIONS_CREATED_TOTAL,
+    HTTP_CONNECTIONS_REUSED_TOTAL,
+    HTTP_REQUESTS_TOTAL,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class HttpClient:
+    """
+    A processor-wide aiohttp session so calls to the webserver and to Slack
+    reuse keep-alive connections instead of opening a new one per request.
+
+    The session is created on ``start``, or lazily by ``get_session``, and
+    must be released with ``close``. Connection reuse is counted through aiohttp
+    tracing, exported as metrics and reported by ``stats``.
+    """
+
+    def __init__(
+        self,
+        limit: Optional[int] = None,
+        limit_per_host: Optional[int] = None,
+        keepalive_timeout: Optional[float] = None,
+    ):
+        if limit is None:
+            limit = int(os.getenv("HTTP_POOL_LIMIT", "100"))
+        if limit_per_host is None:
+            limit_per_host = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", "20"))
+        if keepalive_timeout is None:
+            keepalive_timeout = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "30"))
+
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+
+        self.requests = 0
+        self.connections_created = 0
+        self.connections_reused = 0
+
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def _on_request_start(self, session, context, params) -> None:
+        self.requests += 1
+        HTTP_REQUESTS_TOTAL.inc()
+
+    async def _on_connection_create_end(self, session, context, params) -> None:
+        self.connections_created += 1
+        HTTP_CONNECTIONS_CREATED_TOTAL.inc()
+
+    async def _on_connection_reuseconn(self, session, context, params) -> None:
+        self.connections_reused += 1
+        HTTP_CONNECTIONS_REUSED_TOTAL.inc()
+
+    async def start(self) -> None:
+        if self._session is not None and not self._session.closed:
+            return
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(self._on_request_start)
+        trace_config.on_connection_create_end.append(self._on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(self._on_connection_reuseconn)
+
+        connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            keepalive_timeout=self.keepalive_timeout,
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector, trace_configs=[trace_config]
+        )
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        """
+        Return the shared session, starting it first if needed.
+        """
+        await self.start()
+        return self._session
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "connections_created": self.connections_created,
+            "connections_reused": self.connections_reused,
+        }
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            logger.info(f"HTTP client closed: {self.stats()}")
+        self._session = None
+
+
+http_client = HttpClient()
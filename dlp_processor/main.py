@@ -1,25 +1,62 @@
 import asyncio
 import logging
+import os
 
+from extraction import extraction_pool, scan_pool
+from http_client import http_client
 from manager import Manager
-from tasks import scan_message_task
+from metrics import metrics_server
+from patterns import PATTERN_UPDATES_EXCHANGE, pattern_store
+from tasks import scan_file_task, scan_message_task
 
 logger = logging.getLogger(__name__)
 
 tasks = {
     "scan_message": scan_message_task,
+    "scan_file": scan_file_task,
 }
 
+# Attachments are consumed from their own queue with a concurrency of their
+# own, so slow file scans never hold up text messages
+FILE_MANAGER_CONCURRENCY = int(os.getenv("FILE_MANAGER_CONCURRENCY", "4"))
+FILE_MANAGER_PREFETCH_COUNT = int(
+    os.getenv("FILE_MANAGER_PREFETCH_COUNT", str(FILE_MANAGER_CONCURRENCY))
+)
+
 
 if __name__ == "__main__":
-    manager = Manager(queue_name="slack_messages", tasks=tasks)
+    manager = Manager(
+        queue_name="slack_messages",
+        tasks=tasks,
+        on_startup=[
+            metrics_server.start,
+            http_client.start,
+            pattern_store.enable_push,
+        ],
+        on_shutdown=[
+            http_client.close,
+            extraction_pool.shutdown,
+            scan_pool.shutdown,
+            metrics_server.close,
+        ],
+        on_reconnect=[pattern_store.invalidate],
+        subscriptions={PATTERN_UPDATES_EXCHANGE: pattern_store.on_pattern_event},
+    )
+    file_manager = Manager(
+        queue_name="slack_files",
+        tasks=tasks,
+        concurrency=FILE_MANAGER_CONCURRENCY,
+        prefetch_count=FILE_MANAGER_PREFETCH_COUNT,
+    )
     loop = asyncio.get_event_loop()
 
     try:
-        loop.run_until_complete(manager.main())
+        loop.run_until_complete(asyncio.gather(manager.main(), file_manager.main()))
     except KeyboardInterrupt:
         print("Manager interrupted by user.")
     finally:
+        # Shared resources are shut down once both lanes are done
+        loop.run_until_complete(file_manager.close())
         loop.run_until_complete(manager.close())
         pending = asyncio.all_tasks(loop)
         for task in pending:
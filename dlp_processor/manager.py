@@ -1,24 +1,113 @@
 import asyncio
+import inspect
 import json
 import logging
 import os
+import time
+from typing import Callable, Optional
 
 import aio_pika
+from aio_pika.abc import AbstractIncomingMessage
+from metrics import (
+    DEAD_LETTERS_TOTAL,
+    QUEUE_CONSUMERS,
+    QUEUE_DEPTH,
+    QUEUE_DRAIN_SECONDS,
+    QUEUE_PROCESSING_RATE,
+    QUEUE_WAIT_SECONDS,
+    TASK_RETRIES_TOTAL,
+    TASK_SECONDS,
+    TASKS_IN_FLIGHT,
+    TASKS_TOTAL,
+)
 
 logger = logging.getLogger(__name__)
 
+# Longest error message kept in the headers of a retried or dead-lettered message
+MAX_ERROR_CHARS = 1000
+
+# Weight of the latest interval in the smoothed processing rate
+RATE_SMOOTHING = 0.3
+
+
+def retry_queue_name(queue_name: str, delay_ms: int) -> str:
+    """Queue holding failed messages for ``delay_ms`` before they are retried."""
+    return f"{queue_name}.retry.{delay_ms}"
+
+
+def dead_letter_queue_name(queue_name: str) -> str:
+    """Queue keeping the messages of ``queue_name`` that won't be retried anymore."""
+    return f"{queue_name}.dead"
+
 
 class Manager:
 
-    def __init__(self, queue_name: str, tasks: dict):
+    def __init__(
+        self,
+        queue_name: str,
+        tasks: dict,
+        prefetch_count: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        on_startup: Optional[list[Callable]] = None,
+        on_shutdown: Optional[list[Callable]] = None,
+        on_reconnect: Optional[list[Callable]] = None,
+        subscriptions: Optional[dict[str, Callable]] = None,
+        max_attempts: Optional[int] = None,
+        retry_delay: Optional[float] = None,
+        max_retry_delay: Optional[float] = None,
+        stats_interval: Optional[float] = None,
+    ):
         self.loop = asyncio.get_event_loop()
         self.queue_name = queue_name
         self.tasks = tasks
 
+        if concurrency is None:
+            concurrency = int(os.getenv("MANAGER_CONCURRENCY", "10"))
+        if prefetch_count is None:
+            prefetch_count = int(os.getenv("MANAGER_PREFETCH_COUNT", str(concurrency)))
+
+        if max_attempts is None:
+            max_attempts = int(os.getenv("MANAGER_MAX_ATTEMPTS", "5"))
+        if retry_delay is None:
+            retry_delay = float(os.getenv("MANAGER_RETRY_DELAY", "5"))
+        if max_retry_delay is None:
+            max_retry_delay = float(os.getenv("MANAGER_MAX_RETRY_DELAY", "300"))
+        if stats_interval is None:
+            stats_interval = float(os.getenv("MANAGER_QUEUE_STATS_INTERVAL", "15"))
+
+        self.concurrency = concurrency
+        self.prefetch_count = prefetch_count
+
+        # A failing task is run at most max_attempts times, waiting retry_delay
+        # seconds after the first failure and twice as long after every other
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+
+        # Seconds between readings of the queue's depth, 0 disables them
+        self.stats_interval = stats_interval
+
+        # Callables run once the connection is up and after in-flight tasks finished
+        self.on_startup = on_startup or []
+        self.on_shutdown = on_shutdown or []
+        # Callables run after the robust connection recovered from a broker outage
+        self.on_reconnect = on_reconnect or []
+
+        # Fanout exchange name -> coroutine called with every event broadcast on it
+        self.subscriptions = subscriptions or {}
+
         self.connection = None
         self.channel = None
         self.queue = None
 
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._in_flight: set[asyncio.Task] = set()
+        self._declared: set[str] = set()
+
+        self._finished = 0
+        self._rate: Optional[float] = None
+        self._monitor: Optional[asyncio.Task] = None
+
     async def _connect(self):
         """Establish a connection to RabbitMQ."""
 
@@ -26,37 +115,242 @@ class Manager:
         rabbitmq_password = os.getenv("RABBITMQ_PASSWORD")
 
         self.connection = await aio_pika.connect_robust(
-            host="rabbitmq",
+            host=os.getenv("RABBITMQ_HOST", "rabbitmq"),
             login=str(rabbitmq_user),
             password=str(rabbitmq_password),
             loop=self.loop,
         )
 
         self.channel = await self.connection.channel()
-        await self.channel.set_qos(prefetch_count=1)
+        await self.channel.set_qos(prefetch_count=self.prefetch_count)
         self.queue = await self.channel.declare_queue(self.queue_name, durable=True)
 
+        for exchange_name, callback in self.subscriptions.items():
+            await self._subscribe(exchange_name, callback)
+
+        self.connection.reconnect_callbacks.add(self._on_reconnect)
+
+    async def _subscribe(self, exchange_name: str, callback: Callable) -> None:
+        """Consume a fanout exchange through an exclusive queue of our own."""
+        exchange = await self.channel.declare_exchange(
+            exchange_name, aio_pika.ExchangeType.FANOUT, durable=True
+        )
+        # Server-named and exclusive: every processor receives every event
+        queue = await self.channel.declare_queue(exclusive=True, auto_delete=True)
+        await queue.bind(exchange)
+
+        async def on_event(message: AbstractIncomingMessage) -> None:
+            try:
+                await callback(json.loads(message.body.decode()))
+            except Exception:
+                logger.exception(f"Failed to handle event from {exchange_name}")
+
+        await queue.consume(on_event, no_ack=True)
+
+    async def _on_reconnect(self, *args) -> None:
+        """Events broadcast while the connection was down are lost, let hooks resync."""
+        logger.info("Reconnected to RabbitMQ")
+        await self._run_hooks(self.on_reconnect)
+
+    async def _run_hooks(self, hooks: list[Callable]) -> None:
+        for hook in hooks:
+            result = hook()
+            if inspect.isawaitable(result):
+                await result
+
     async def close(self):
-        """Close the connection to RabbitMQ."""
+        """Wait for in-flight tasks, run shutdown hooks and close the connection to RabbitMQ."""
+        if self._monitor is not None:
+            self._monitor.cancel()
+            await asyncio.gather(self._monitor, return_exceptions=True)
+            self._monitor = None
+
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+
+        await self._run_hooks(self.on_shutdown)
+
         if self.connection and not self.connection.is_closed:
             await self.connection.close()
 
-    async def _get_messages(self):
-        """Read and pop messages from SQS queue"""
-        if self.connection is None or self.connection.is_closed:
-            await self._connect()
+    def _observe_queue_wait(self, message: AbstractIncomingMessage) -> None:
+        enqueued_at = (message.headers or {}).get("enqueued_at")
+        if isinstance(enqueued_at, (int, float)):
+            QUEUE_WAIT_SECONDS.observe(max(0.0, time.time() - enqueued_at))
+
+    def retry_delay_for(self, attempts: int) -> float:
+        """Seconds a message waits before its next attempt after ``attempts`` failed."""
+        return min(self.retry_delay * 2 ** (attempts - 1), self.max_retry_delay)
+
+    async def _declare(self, queue_name: str, arguments: Optional[dict] = None) -> None:
+        """Declare a queue the first time a message is sent to it."""
+        if queue_name not in self._declared:
+            await self.channel.declare_queue(
+                queue_name, durable=True, arguments=arguments
+            )
+            self._declared.add(queue_name)
+
+    async def _republish(
+        self, message: AbstractIncomingMessage, queue_name: str, headers: dict
+    ) -> None:
+        await self.channel.default_exchange.publish(
+            aio_pika.Message(
+                message.body,
+                headers=headers,
+                content_type=message.content_type,
+                delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+            ),
+            routing_key=queue_name,
+        )
+
+    def _failure_headers(self, message: AbstractIncomingMessage, error: str) -> dict:
+        headers = dict(message.headers or {})
+        # RabbitMQ's own dead-lettering history, attempts are counted below
+        headers.pop("x-death", None)
+        headers["attempts"] = int(headers.get("attempts", 0)) + 1
+        headers["last_error"] = error[:MAX_ERROR_CHARS]
+        return headers
+
+    async def _dead_letter(
+        self, message: AbstractIncomingMessage, task_name: Optional[str], error: str
+    ) -> None:
+        """Move a message to the dead letter queue, where it waits to be inspected."""
+        headers = self._failure_headers(message, error)
+        headers["dead_lettered_at"] = time.time()
+
+        queue_name = dead_letter_queue_name(self.queue_name)
+        await self._declare(queue_name)
+        await self._republish(message, queue_name, headers)
+        await message.ack()
 
-        messages = []
+        logger.error(f"Dead-lettered {task_name} message: {error}")
+        DEAD_LETTERS_TOTAL.labels(task_name).inc()
 
+    async def _retry(
+        self, message: AbstractIncomingMessage, task_name: str, error: str
+    ) -> None:
+        """
+        Hold a failed message back in a delay queue, from which RabbitMQ
+        dead-letters it to our queue once its delay expired. Messages that
+        failed ``max_attempts`` times are dead-lettered for good instead.
+        """
+        headers = self._failure_headers(message, error)
+        attempts = headers["attempts"]
+        if attempts >= self.max_attempts:
+            await self._dead_letter(
+                message, task_name, f"Failed {attempts} times, last with {error}"
+            )
+            return
+
+        delay_ms = int(self.retry_delay_for(attempts) * 1000)
+        queue_name = retry_queue_name(self.queue_name, delay_ms)
+        await self._declare(
+            queue_name,
+            {
+                "x-message-ttl": delay_ms,
+                "x-dead-letter-exchange": "",
+                "x-dead-letter-routing-key": self.queue_name,
+            },
+        )
+        await self._republish(message, queue_name, headers)
+        await message.ack()
+
+        logger.warning(
+            f"Retrying {task_name} in {delay_ms / 1000:g} s, attempt {attempts} failed"
+        )
+        TASK_RETRIES_TOTAL.labels(task_name).inc()
+
+    async def _run_task(self, message: AbstractIncomingMessage) -> None:
+        """
+        Run the task a message refers to and ack it once the task is done.
+
+        Failed tasks are retried with exponential backoff, messages that are
+        malformed, name an unknown task or failed too often are dead-lettered.
+        """
+        self._observe_queue_wait(message)
+        TASKS_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        task_name = None
+        status = "failed"
         try:
-            message = await self.queue.get(fail=False, timeout=5)
-            if message:
-                messages.append(message)
-            else:
-                await asyncio.sleep(1)
-        except Exception as e:
-            print(f"Error fetching messages: {e}")
-        return messages
+            try:
+                body = json.loads(message.body.decode())
+                task_name = body.get("task")
+                args = body.get("args", ())
+                kwargs = body.get("kwargs", {})
+            except (ValueError, AttributeError) as e:
+                status = "malformed"
+                await self._dead_letter(message, None, f"Malformed message: {e}")
+                return
+
+            task = self.tasks.get(task_name)
+            if task is None:
+                status = "unknown"
+                error = f"Unknown task: {task_name}"
+                await self._dead_letter(message, task_name, error)
+                return
+
+            try:
+                await task(*args, **kwargs)
+            except Exception as e:
+                logger.exception(f"Task {task_name} failed")
+                await self._retry(message, task_name, f"{type(e).__name__}: {e}")
+                return
+
+            await message.ack()
+            status = "ok"
+        except Exception:
+            # Left unacked, the message is redelivered once the channel recovers
+            logger.exception("Could not ack, retry or dead-letter the message")
+        finally:
+            TASKS_IN_FLIGHT.dec()
+            TASK_SECONDS.labels(task_name).observe(time.perf_counter() - start)
+            TASKS_TOTAL.labels(task_name, status).inc()
+            self._finished += 1
+            self._semaphore.release()
+
+    async def update_queue_stats(self, elapsed: float) -> None:
+        """
+        Read the depth and consumer count of the queue with a passive declare,
+        and estimate how long its consumers take to drain it when every one
+        finishes tasks at the rate this processor did over ``elapsed`` seconds.
+        """
+        queue = await self.channel.declare_queue(
+            self.queue_name, passive=True, robust=False
+        )
+        depth = queue.declaration_result.message_count
+        consumers = queue.declaration_result.consumer_count
+
+        rate = self._finished / elapsed if elapsed > 0 else 0.0
+        self._finished = 0
+        if self._rate is not None:
+            rate = RATE_SMOOTHING * rate + (1 - RATE_SMOOTHING) * self._rate
+        self._rate = rate
+
+        if not depth:
+            drain_seconds = 0.0
+        elif rate > 0 and consumers:
+            drain_seconds = depth / (rate * consumers)
+        else:
+            drain_seconds = float("inf")
+
+        QUEUE_DEPTH.labels(self.queue_name).set(depth)
+        QUEUE_CONSUMERS.labels(self.queue_name).set(consumers)
+        QUEUE_PROCESSING_RATE.labels(self.queue_name).set(rate)
+        QUEUE_DRAIN_SECONDS.labels(self.queue_name).set(drain_seconds)
+
+    async def _monitor_queue(self) -> None:
+        last = time.monotonic()
+        while True:
+            await asyncio.sleep(self.stats_interval)
+            now = time.monotonic()
+            try:
+                await self.update_queue_stats(now - last)
+            except Exception:
+                # E.g. while the connection recovers, try again next interval
+                logger.exception(f"Failed to read the stats of {self.queue_name}")
+                continue
+            last = now
 
     async def main(self) -> None:
         """For a given task:
@@ -66,22 +360,22 @@ class Manager:
         Messages from queue are expected to have the format:
         >>> message = dict(task='say', args=('something',), kwargs={})
         >>> message = dict(task='say', args=(), kwargs={'something': 'something else'})
-        """
 
-        while True:
-            messages = await self._get_messages()
+        Up to ``concurrency`` tasks run at the same time, each message is
+        acked as soon as its own task finishes.
+        """
+        if self.connection is None or self.connection.is_closed:
+            await self._connect()
 
-            print(f"Received {len(messages)} messages")
+        await self._run_hooks(self.on_startup)
 
-            for message in messages:
-                body = json.loads(message.body.decode())
+        if self.stats_interval and self._monitor is None:
+            self._monitor = asyncio.create_task(self._monitor_queue())
 
-                task_name = body.get("task")
-                args = body.get("args", ())
-                kwargs = body.get("kwargs", {})
+        async with self.queue.iterator() as queue_iter:
+            async for message in queue_iter:
+                await self._semaphore.acquire()
 
-                task = self.tasks.get(task_name)
-                if task:
-                    await task(*args, **kwargs)
-                    await message.ack()
-            await asyncio.sleep(1)
+                task = asyncio.create_task(self._run_task(message))
+                self._in_flight.add(task)
+                task.add_done_callback(self._in_flight.discard)
@@ -0,0 +1,141 @@
+import re
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, AbstractSet, Optional
+
+try:
+    from re import _constants as sre_constants
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_constants  # type: ignore[no-redef]
+    import sre_parse  # type: ignore[no-redef]
+
+if TYPE_CHECKING:
+    from patterns import CompiledPattern
+
+DIGIT_REGEX = re.compile(r"\d")
+
+# Shorter literals are too common to rule anything out
+MIN_LITERAL_LENGTH = 3
+
+
+@dataclass(frozen=True)
+class PatternMatch:
+    pattern_id: int
+    start: int
+    end: int
+
+
+def required_literal(regex: re.Pattern) -> Optional[str]:
+    """
+    Return the longest literal string every match of ``regex`` must contain,
+    taken from the top level of the parsed pattern.
+    """
+    if regex.flags & re.IGNORECASE or not isinstance(regex.pattern, str):
+        return None
+
+    longest, current = "", ""
+    for op, av in sre_parse.parse(regex.pattern, regex.flags):
+        if op is sre_constants.LITERAL:
+            current += chr(av)
+        else:
+            current = ""
+        if len(current) > len(longest):
+            longest = current
+
+    return longest if len(longest) >= MIN_LITERAL_LENGTH else None
+
+
+def _is_digit_set(items) -> bool:
+    if not items or items[0][0] is sre_constants.NEGATE:
+        return False
+    for op, av in items:
+        if op is sre_constants.CATEGORY and av is sre_constants.CATEGORY_DIGIT:
+            continue
+        if op is sre_constants.LITERAL and chr(av).isdecimal():
+            continue
+        if op is sre_constants.RANGE and ord("0") <= av[0] <= av[1] <= ord("9"):
+            continue
+        return False
+    return True
+
+
+def _requires_digit(subpattern) -> bool:
+    for op, av in subpattern:
+        if op is sre_constants.LITERAL and chr(av).isdecimal():
+            return True
+        if op is sre_constants.IN and _is_digit_set(av):
+            return True
+        if op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT):
+            min_repeat, _, item = av
+            if min_repeat >= 1 and _requires_digit(item):
+                return True
+        if op is sre_constants.SUBPATTERN and _requires_digit(av[-1]):
+            return True
+        if op is sre_constants.BRANCH and all(
+            _requires_digit(branch) for branch in av[1]
+        ):
+            return True
+    return False
+
+
+def requires_digit(regex: re.Pattern) -> bool:
+    """
+    Return True when every match of ``regex`` must contain a digit.
+    """
+    if not isinstance(regex.pattern, str):
+        return False
+    return _requires_digit(sre_parse.parse(regex.pattern, regex.flags))
+
+
+class Matcher:
+    """
+    Scans a text for every pattern of a pattern set.
+
+    Each pattern is analysed once for a literal it must contain and for
+    whether it can only match text containing a digit. ``scan`` uses those
+    as a prefilter: a literal is looked up with a single substring search
+    shared by every pattern needing it, and one digit search rules out all
+    digit-shaped patterns at once. Only patterns that survive the prefilter
+    run their regex, so ``scan`` reports the same first match per pattern as
+    calling ``search`` on each pattern in turn.
+    """
+
+    def __init__(self, patterns: list["CompiledPattern"]):
+        self.patterns = patterns
+        self._literals = [required_literal(pattern.regex) for pattern in patterns]
+        self._needs_digit = [requires_digit(pattern.regex) for pattern in patterns]
+
+    def scan(
+        self, text: str, ignore: AbstractSet[int] = frozenset()
+    ) -> list[PatternMatch]:
+        """
+        Return the first match of every pattern found in ``text``, in pattern
+        order. Patterns whose id is in ``ignore`` are skipped.
+        """
+        matches: list[PatternMatch] = []
+        literal_found: dict[str, bool] = {}
+        has_digit: Optional[bool] = None
+
+        for pattern, literal, needs_digit in zip(
+            self.patterns, self._literals, self._needs_digit
+        ):
+            if pattern.id in ignore:
+                continue
+
+            if literal is not None:
+                if literal not in literal_found:
+                    literal_found[literal] = literal in text
+                if not literal_found[literal]:
+                    continue
+
+            if needs_digit:
+                if has_digit is None:
+                    has_digit = DIGIT_REGEX.search(text) is not None
+                if not has_digit:
+                    continue
+
+            match = pattern.regex.search(text)
+            if match:
+                matches.append(PatternMatch(pattern.id, *match.span()))
+
+        return matches
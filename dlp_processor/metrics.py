@@ -0,0 +1,299 @@
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (
+    0.001,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def format_labels(names: tuple[str, ...], values: tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+registry: list["Metric"] = []
+
+
+def render() -> str:
+    return "".join(metric.render() for metric in registry)
+
+
+class CounterValue:
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+
+class GaugeValue(CounterValue):
+    def dec(self, amount: float = 1) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class HistogramValue:
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.sum += value
+        self.count += 1
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        """
+        Observe the duration of the ``with`` block, also when it raises.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+
+class Metric:
+    """
+    A metric in the Prometheus text exposition format, optionally split by
+    labels. ``labels`` returns the value of one label set; the methods of a
+    metric without labels act on its single value directly.
+    """
+
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: dict[tuple[str, ...], object] = {}
+
+        if not self.labelnames:
+            self.labels()
+        registry.append(self)
+
+    def _new_value(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        key = tuple(str(value) for value in values)
+        if len(key) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+
+        value = self._values.get(key)
+        if value is None:
+            value = self._values[key] = self._new_value()
+        return value
+
+    def _samples(self, labels: str, value) -> Iterator[str]:
+        yield f"{self.name}{labels} {format_value(value.value)}"
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+        for key, value in sorted(self._values.items()):
+            lines.extend(self._samples(format_labels(self.labelnames, key), value))
+        return "\n".join(lines) + "\n"
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def _new_value(self) -> CounterValue:
+        return CounterValue()
+
+    def inc(self, amount: float = 1) -> None:
+        self.labels().inc(amount)
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def _new_value(self) -> GaugeValue:
+        return GaugeValue()
+
+    def inc(self, amount: float = 1) -> None:
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1) -> None:
+        self.labels().dec(amount)
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        super().__init__(name, documentation, labelnames)
+
+    def _new_value(self) -> HistogramValue:
+        return HistogramValue(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+    def _samples(self, labels: str, value: HistogramValue) -> Iterator[str]:
+        # Bucket samples carry the "le" label next to the metric's own labels
+        prefix = labels[1:-1] + "," if labels else ""
+        cumulative = 0
+        for bound, count in zip(value.buckets, value.counts):
+            cumulative += count
+            le = format_value(bound)
+            yield f'{self.name}_bucket{{{prefix}le="{le}"}} {cumulative}'
+        yield f"{self.name}_sum{labels} {format_value(value.sum)}"
+        yield f"{self.name}_count{labels} {value.count}"
+
+
+# The metrics of the processor, by stage of handling a message
+QUEUE_WAIT_SECONDS = Histogram(
+    "dlp_queue_wait_seconds",
+    "Time messages waited in RabbitMQ before their task started.",
+)
+STAGE_SECONDS = Histogram(
+    "dlp_stage_seconds",
+    "Duration of each stage of scanning a message.",
+    ("stage",),
+)
+TASK_SECONDS = Histogram(
+    "dlp_task_seconds", "Duration of tasks from start to ack.", ("task",)
+)
+TASKS_TOTAL = Counter(
+    "dlp_tasks_total", "Tasks run, by task name and outcome.", ("task", "status")
+)
+TASKS_IN_FLIGHT = Gauge("dlp_tasks_in_flight", "Tasks currently running.")
+TASK_RETRIES_TOTAL = Counter(
+    "dlp_task_retries_total", "Failed tasks scheduled to run again.", ("task",)
+)
+DEAD_LETTERS_TOTAL = Counter(
+    "dlp_dead_letters_total", "Messages moved to the dead letter queue.", ("task",)
+)
+QUEUE_DEPTH = Gauge(
+    "dlp_queue_depth", "Messages ready in RabbitMQ, by queue.", ("queue",)
+)
+QUEUE_CONSUMERS = Gauge(
+    "dlp_queue_consumers", "Consumers of each queue across processors.", ("queue",)
+)
+QUEUE_PROCESSING_RATE = Gauge(
+    "dlp_queue_processing_rate",
+    "Tasks per second this processor finishes, by queue.",
+    ("queue",),
+)
+QUEUE_DRAIN_SECONDS = Gauge(
+    "dlp_queue_drain_seconds",
+    "Estimated time for every consumer to drain the queue at this processor's rate.",
+    ("queue",),
+)
+SCAN_TIMEOUTS_TOTAL = Counter(
+    "dlp_scan_timeouts_total",
+    "Scans given up after exceeding their timeout, by source type.",
+    ("source_type",),
+)
+PATTERN_HITS_TOTAL = Counter(
+    "dlp_pattern_hits_total",
+    "Caught messages by pattern and source type.",
+    ("pattern_id", "source_type"),
+)
+HTTP_REQUESTS_TOTAL = Counter(
+    "dlp_http_requests_total", "Requests sent by the shared HTTP client."
+)
+HTTP_CONNECTIONS_CREATED_TOTAL = Counter(
+    "dlp_http_connections_created_total",
+    "Connections the shared HTTP client opened.",
+)
+HTTP_CONNECTIONS_REUSED_TOTAL = Counter(
+    "dlp_http_connections_reused_total",
+    "Requests the shared HTTP client sent on a kept-alive connection.",
+)
+
+
+class MetricsServer:
+    """
+    Serves every metric at ``/metrics`` from the processor's event loop.
+    A ``port`` of 0 disables the server.
+    """
+
+    def __init__(self, port: Optional[int] = None):
+        if port is None:
+            port = int(os.getenv("METRICS_PORT", "9100"))
+        self.port = port
+        self._runner: Optional[web.AppRunner] = None
+
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        return web.Response(
+            text=render(),
+            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+        )
+
+    async def start(self) -> None:
+        if not self.port or self._runner is not None:
+            return
+
+        app = web.Application()
+        app.router.add_get("/metrics", self.handle_metrics)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, "0.0.0.0", self.port).start()
+        logger.info(f"Serving metrics on port {self.port}")
+
+    async def close(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+metrics_server = MetricsServer()
@@ -0,0 +1,176 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from matcher import Matcher
+from utils import fetch_patterns
+
+logger = logging.getLogger(__name__)
+
+# Fanout exchange the webserver announces new pattern versions on
+PATTERN_UPDATES_EXCHANGE = "pattern_updates"
+
+
+@dataclass(frozen=True)
+class CompiledPattern:
+    id: int
+    name: str
+    regex: re.Pattern
+
+
+class PatternSet:
+    """
+    An immutable snapshot of the webserver patterns, compiled once.
+    """
+
+    def __init__(self, patterns: list[dict], version: str):
+        self.version = version
+        self.patterns: list[CompiledPattern] = []
+
+        for pattern in patterns:
+            try:
+                regex = re.compile(pattern["regex_pattern"])
+            except re.error as e:
+                logger.error(f"Skipping invalid pattern {pattern.get('id')}: {e}")
+                continue
+            self.patterns.append(
+                CompiledPattern(pattern["id"], pattern.get("name", ""), regex)
+            )
+
+        self.matcher = Matcher(self.patterns)
+
+    def __len__(self) -> int:
+        return len(self.patterns)
+
+
+def pattern_set_version(patterns: list[dict]) -> str:
+    """
+    Derive a stable version for a pattern list when the webserver sent no ETag.
+    """
+    serialized = json.dumps(patterns, sort_keys=True).encode()
+    return hashlib.sha256(serialized).hexdigest()
+
+
+class PatternStore:
+    """
+    Holds the current PatternSet in memory and only rebuilds it when the
+    pattern list served by the webserver changes.
+
+    The store revalidates with a conditional GET once ``ttl`` seconds have
+    passed; ``invalidate`` forces a revalidation on the next ``get``. Once
+    ``enable_push`` is called the webserver announces new versions through
+    ``on_pattern_event``, and the store only revalidates every ``push_ttl``
+    seconds in case an announcement was missed, e.g. while disconnected.
+    """
+
+    def __init__(
+        self,
+        ttl: Optional[float] = None,
+        push_ttl: Optional[float] = None,
+        event_retry_delay: Optional[float] = None,
+        event_max_attempts: Optional[int] = None,
+    ):
+        if ttl is None:
+            ttl = float(os.getenv("PATTERN_CACHE_TTL", "30"))
+        if push_ttl is None:
+            push_ttl = float(os.getenv("PATTERN_PUSH_TTL", "300"))
+        if event_retry_delay is None:
+            event_retry_delay = float(os.getenv("PATTERN_EVENT_RETRY_DELAY", "1"))
+        if event_max_attempts is None:
+            event_max_attempts = int(os.getenv("PATTERN_EVENT_MAX_ATTEMPTS", "7"))
+        self.ttl = ttl
+        self.push_ttl = push_ttl
+        self.event_retry_delay = event_retry_delay
+        self.event_max_attempts = event_max_attempts
+
+        self._pattern_set: Optional[PatternSet] = None
+        self._etag: Optional[str] = None
+        self._expires_at = 0.0
+        self._lock = asyncio.Lock()
+        self.push_enabled = False
+
+    def _is_fresh(self) -> bool:
+        return self._pattern_set is not None and time.monotonic() < self._expires_at
+
+    async def get(self) -> PatternSet:
+        if not self._is_fresh():
+            await self.refresh()
+        return self._pattern_set or PatternSet([], version="")
+
+    async def refresh(self, force: bool = False) -> None:
+        async with self._lock:
+            # Another coroutine may have refreshed while we waited for the lock
+            if not force and self._is_fresh():
+                return
+
+            etag = self._etag if self._pattern_set is not None else None
+            patterns, etag = await fetch_patterns(etag)
+
+            if patterns is not None:
+                version = etag or pattern_set_version(patterns)
+                if self._pattern_set is None or self._pattern_set.version != version:
+                    self._pattern_set = PatternSet(patterns, version)
+                    logger.info(
+                        f"Loaded {len(self._pattern_set)} patterns (version {version})"
+                    )
+                self._etag = etag
+            elif etag is None:
+                if self._pattern_set is None:
+                    # Nothing to fall back to, try again on the next message
+                    return
+                # The fetch failed, keep the current set and retry after the TTL
+                self._expires_at = time.monotonic() + self.ttl
+                return
+
+            ttl = self.push_ttl if self.push_enabled else self.ttl
+            self._expires_at = time.monotonic() + ttl
+
+    def enable_push(self) -> None:
+        """
+        Poll only every ``push_ttl`` seconds, pattern changes now arrive
+        through ``on_pattern_event``.
+        """
+        self.push_enabled = True
+        self.invalidate()
+
+    async def on_pattern_event(self, event: dict) -> None:
+        """
+        Swap in the announced pattern version unless it is already loaded.
+        Tasks that already hold the previous PatternSet finish with it.
+
+        Webserver processes cache the pattern list on their own, so the fetch
+        may still get the previous version. It is retried with exponential
+        backoff until the announced version is served, and otherwise left to
+        the ``push_ttl`` revalidation.
+        """
+        version = event.get("version")
+        if not version:
+            await self.refresh(force=True)
+            return
+
+        for attempt in range(self.event_max_attempts):
+            current = self._pattern_set
+            if current is not None and current.version == version:
+                return
+            if attempt:
+                await asyncio.sleep(self.event_retry_delay * 2 ** (attempt - 1))
+            await self.refresh(force=True)
+
+        current = self._pattern_set
+        if current is None or current.version != version:
+            logger.warning(
+                f"Pattern version {version} was announced but not served after "
+                f"{self.event_max_attempts} attempts"
+            )
+
+    def invalidate(self) -> None:
+        self._expires_at = 0.0
+
+
+pattern_store = PatternStore()
@@ -0,0 +1,95 @@
+from typing import TYPE_CHECKING, Iterator, Optional, Union
+
+from downloads import open_source
+from matcher import Matcher, PatternMatch
+
+if TYPE_CHECKING:
+    from extractors import ExtractionLimits, Extractor
+    from patterns import CompiledPattern
+
+# Text carried over from the previous page so matches spanning a page break are found
+PAGE_OVERLAP_CHARS = 256
+
+# Matchers built in this worker process, keyed on pattern set version
+_matchers: dict[str, Matcher] = {}
+
+
+class MatcherMissing(Exception):
+    """
+    Raised in a worker that has no Matcher for a pattern set version yet.
+    """
+
+
+def get_matcher(version: str, patterns: list["CompiledPattern"]) -> Matcher:
+    """
+    Return the Matcher for a pattern set version, building it once per worker.
+    """
+    matcher = _matchers.get(version)
+    if matcher is None:
+        _matchers.clear()
+        matcher = _matchers[version] = Matcher(patterns)
+    return matcher
+
+
+def scan_pages(
+    pages: Iterator[str], matcher: Matcher, stop_on_first: bool = False
+) -> list[tuple[PatternMatch, str]]:
+    """
+    Scan text page by page and return every pattern hit together with the
+    text its offsets refer to. Stops once every pattern has matched, or on
+    the first hit when ``stop_on_first`` is set.
+    """
+    results: list[tuple[PatternMatch, str]] = []
+    found: set[int] = set()
+    tail = ""
+
+    for text in pages:
+        window = tail + text
+        for match in matcher.scan(window, ignore=found):
+            found.add(match.pattern_id)
+            results.append((match, window))
+
+        if len(found) == len(matcher.patterns) or (stop_on_first and found):
+            break
+        tail = window[-PAGE_OVERLAP_CHARS:]
+
+    return results
+
+
+def scan_text(
+    text: str, version: str, patterns: Optional[list["CompiledPattern"]] = None
+) -> list[PatternMatch]:
+    """
+    Scan the text of a message. Runs in a worker process, so a pattern that
+    backtracks without end can be killed.
+
+    The patterns are only sent to a worker that raised MatcherMissing for
+    their version, so most calls don't pickle the pattern set.
+    """
+    if patterns is None:
+        matcher = _matchers.get(version)
+        if matcher is None:
+            raise MatcherMissing(version)
+        return matcher.scan(text)
+    return get_matcher(version, patterns).scan(text)
+
+
+def scan_document(
+    content: Union[bytes, str],
+    extractor: "Extractor",
+    version: str,
+    patterns: list["CompiledPattern"],
+    limits: "ExtractionLimits",
+    stop_on_first: bool = False,
+) -> list[tuple[PatternMatch, str]]:
+    """
+    Extract and scan a file. Runs in an extraction worker process.
+
+    ``content`` is the downloaded bytes, or the path of a download spilled to
+    disk. The extractor yields text chunk by chunk, so extraction stops as
+    soon as scanning is done.
+    """
+    matcher = get_matcher(version, patterns)
+
+    with open_source(content) as f:
+        return scan_pages(extractor(f, limits), matcher, stop_on_first)
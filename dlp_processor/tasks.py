@@ -1,38 +1,108 @@
+import asyncio
+import contextlib
 import logging
-import re
+import os
+from typing import Optional
 
 from enums import SourceType
-from utils import create_caught_message, fetch_patterns, process_file
+from metrics import PATTERN_HITS_TOTAL, STAGE_SECONDS
+from patterns import PatternSet, pattern_store
+from utils import (
+    build_caught_message,
+    create_caught_messages,
+    scan_file,
+    scan_message_text,
+)
 
 logger = logging.getLogger(__name__)
 
+# Attachments of one message scanned at the same time
+MESSAGE_FILE_CONCURRENCY = int(os.getenv("MESSAGE_FILE_CONCURRENCY", "4"))
+
+# Attachments scanned at the same time across every task of the processor
+file_scan_semaphore = asyncio.Semaphore(int(os.getenv("FILE_SCAN_CONCURRENCY", "8")))
+
+
+async def scan_attachment(
+    file_info: dict,
+    pattern_set: PatternSet,
+    additional_info: dict,
+    message_semaphore: Optional[asyncio.Semaphore] = None,
+) -> list[dict]:
+    """
+    Download and scan one attachment, returning its caught messages.
+    """
+    async with message_semaphore or contextlib.nullcontext(), file_scan_semaphore:
+        results = await scan_file(file_info, pattern_set)
+
+    file_context = {
+        **additional_info,
+        "source_type": SourceType.FILE,
+        "file_name": file_info.get("name"),
+        "file_id": file_info.get("id"),
+    }
+    return [
+        build_caught_message(match, file_text, file_context)
+        for match, file_text in results
+    ]
+
 
 async def scan_message_task(message_text: str, additional_info: dict) -> None:
-    patterns = await fetch_patterns()
+    pattern_set = await pattern_store.get()
     message_text = message_text or ""
     print(f"Scanning message: {message_text}")
     print(f"Additional info: {additional_info}")
 
+    caught_messages = []
+
     # Scan the message text
-    for pattern in patterns:
-        regex = re.compile(pattern["regex_pattern"])
-        if regex.search(message_text):
-            additional_info["source_type"] = SourceType.MESSAGE
-            await create_caught_message(pattern["id"], message_text, additional_info)
+    message_context = {**additional_info, "source_type": SourceType.MESSAGE}
+    with STAGE_SECONDS.labels("regex_scan").time():
+        matches = await scan_message_text(message_text, pattern_set)
+    for match in matches:
+        caught_messages.append(
+            build_caught_message(match, message_text, message_context)
+        )
 
-    # Process attached files
+    # Scan attached files concurrently, keeping their results in order
     files = additional_info.get("files", [])
+    message_semaphore = asyncio.Semaphore(MESSAGE_FILE_CONCURRENCY)
+
+    file_results = await asyncio.gather(
+        *(
+            scan_attachment(file_info, pattern_set, additional_info, message_semaphore)
+            for file_info in files
+        ),
+        return_exceptions=True,
+    )
+    for file_info, result in zip(files, file_results):
+        if isinstance(result, BaseException):
+            logger.error(
+                f"Failed to scan file {file_info.get('id')}",
+                exc_info=(type(result), result, result.__traceback__),
+            )
+            continue
+        caught_messages.extend(result)
+
+    await report_caught_messages(caught_messages)
+
+
+async def scan_file_task(file_info: dict, additional_info: dict) -> None:
+    """
+    Scan one attachment of a message. Unlike in scan_message_task a failure
+    is raised, so the Manager retries the attachment.
+    """
+    pattern_set = await pattern_store.get()
+    logger.info(f"Scanning file: {file_info.get('id')}")
 
-    for file_info in files:
-        file_text = await process_file(file_info)
-        file_text = file_text or ""
+    caught_messages = await scan_attachment(file_info, pattern_set, additional_info)
+    await report_caught_messages(caught_messages)
 
-        for pattern in patterns:
-            regex = re.compile(pattern["regex_pattern"])
-            if regex.search(file_text):
 
-                additional_info["file_name"] = file_info.get("name")
-                additional_info["file_id"] = file_info.get("id")
-                additional_info["source_type"] = SourceType.FILE
+async def report_caught_messages(caught_messages: list[dict]) -> None:
+    await create_caught_messages(caught_messages)
 
-                await create_caught_message(pattern["id"], file_text, additional_info)
+    # Counted once created, so a retried report does not count its hits twice
+    for caught_message in caught_messages:
+        source_type = SourceType(caught_message["source_type"]).value
+        PATTERN_HITS_TOTAL.labels(caught_message["pattern_matched"], source_type).inc()
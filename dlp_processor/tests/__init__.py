@@ -1,11 +1,45 @@
+import asyncio
 import json
 import os
+import time
 from unittest import IsolatedAsyncioTestCase
-from unittest.mock import AsyncMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import aio_pika
+import metrics
 
 from manager import Manager
 
 
+def make_message(body: dict) -> AsyncMock:
+    message = AsyncMock()
+    message.body = json.dumps(body).encode()
+    message.headers = {}
+    message.content_type = "application/json"
+    return message
+
+
+class FakeQueueIterator:
+    """Stand-in for ``aio_pika.Queue.iterator()`` yielding a fixed list of messages."""
+
+    def __init__(self, messages: list):
+        self.messages = list(messages)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.messages:
+            raise StopAsyncIteration
+        return self.messages.pop(0)
+
+
 class TestManager(IsolatedAsyncioTestCase):
     def setUp(self):
         patcher = patch.dict(
@@ -28,9 +62,12 @@ class TestManager(IsolatedAsyncioTestCase):
 
         mock_aio_pika_connect.return_value = mock_connection
         mock_connection.channel.return_value = mock_channel
+        mock_connection.reconnect_callbacks = MagicMock()
         mock_channel.declare_queue.return_value = mock_queue
 
-        manager = Manager(queue_name="test_queue", tasks=self.sample_tasks)
+        manager = Manager(
+            queue_name="test_queue", tasks=self.sample_tasks, prefetch_count=5
+        )
 
         # Act
         await manager._connect()
@@ -43,34 +80,405 @@ class TestManager(IsolatedAsyncioTestCase):
             loop=manager.loop,
         )
         mock_connection.channel.assert_awaited_once()
-        mock_channel.set_qos.assert_awaited_once_with(prefetch_count=1)
+        mock_channel.set_qos.assert_awaited_once_with(prefetch_count=5)
         mock_channel.declare_queue.assert_awaited_once_with("test_queue", durable=True)
 
         self.assertEqual(manager.connection, mock_connection)
         self.assertEqual(manager.channel, mock_channel)
         self.assertEqual(manager.queue, mock_queue)
+        mock_connection.reconnect_callbacks.add.assert_called_once_with(
+            manager._on_reconnect
+        )
 
     @patch("aio_pika.connect_robust")
-    async def test_get_messages(self, mock_aio_pika_connect):
+    async def test_connect_subscribes_to_fanout_exchanges(self, mock_aio_pika_connect):
         # Arrange
-        mock_queue = AsyncMock()
-        mock_message = AsyncMock()
-        mock_message.body.decode.return_value = json.dumps(
-            {"task": "say", "args": ["Hello"], "kwargs": {}}
+        mock_connection = AsyncMock()
+        mock_channel = AsyncMock()
+        mock_event_queue = AsyncMock()
+
+        mock_aio_pika_connect.return_value = mock_connection
+        mock_connection.channel.return_value = mock_channel
+        mock_connection.reconnect_callbacks = MagicMock()
+        mock_channel.declare_queue.side_effect = [AsyncMock(), mock_event_queue]
+
+        on_event = AsyncMock()
+        manager = Manager(
+            queue_name="test_queue",
+            tasks=self.sample_tasks,
+            subscriptions={"pattern_updates": on_event},
+        )
+
+        # Act
+        await manager._connect()
+        consumer = mock_event_queue.consume.await_args.args[0]
+        await consumer(make_message({"version": "v2"}))
+
+        # Assert
+        mock_channel.declare_exchange.assert_awaited_once_with(
+            "pattern_updates", aio_pika.ExchangeType.FANOUT, durable=True
+        )
+        mock_channel.declare_queue.assert_awaited_with(exclusive=True, auto_delete=True)
+        mock_event_queue.bind.assert_awaited_once_with(
+            mock_channel.declare_exchange.return_value
         )
-        mock_queue.get.return_value = mock_message
+        self.assertEqual(mock_event_queue.consume.await_args.kwargs, {"no_ack": True})
+        on_event.assert_awaited_once_with({"version": "v2"})
+
+    async def test_reconnect_runs_hooks(self):
+        # Arrange
+        on_reconnect = MagicMock()
+        manager = Manager(
+            queue_name="test_queue",
+            tasks=self.sample_tasks,
+            on_reconnect=[on_reconnect],
+        )
+
+        # Act
+        await manager._on_reconnect(MagicMock())
+
+        # Assert
+        on_reconnect.assert_called_once()
+
+    def test_concurrency_settings(self):
+        # Arrange
+        with patch.dict(os.environ, {"MANAGER_CONCURRENCY": "4"}):
+            # Act
+            manager = Manager(queue_name="test_queue", tasks=self.sample_tasks)
+
+        # Assert
+        self.assertEqual(manager.concurrency, 4)
+        self.assertEqual(manager.prefetch_count, 4)
 
+    async def test_main_runs_and_acks_messages(self):
+        # Arrange
+        messages = [
+            make_message({"task": "say", "args": ["Hello"], "kwargs": {}}),
+            make_message({"task": "say", "args": [], "kwargs": {"something": "Bye"}}),
+        ]
         manager = Manager(queue_name="test_queue", tasks=self.sample_tasks)
         manager.connection = AsyncMock()
         manager.connection.is_closed = False
-        manager.queue = mock_queue
+        manager.queue = MagicMock()
+        manager.queue.iterator.return_value = FakeQueueIterator(messages)
+
+        # Act
+        await manager.main()
+        await manager.close()
+
+        # Assert
+        self.sample_tasks["say"].assert_any_await("Hello")
+        self.sample_tasks["say"].assert_any_await(something="Bye")
+        for message in messages:
+            message.ack.assert_awaited_once()
+
+    async def test_run_task_records_metrics(self):
+        # Arrange
+        message = make_message({"task": "say", "args": ["Hello"], "kwargs": {}})
+        message.headers = {"enqueued_at": time.time() - 2}
+        manager = Manager(queue_name="test_queue", tasks=self.sample_tasks)
+        queue_wait = metrics.QUEUE_WAIT_SECONDS.labels()
+        waits_before, wait_sum_before = queue_wait.count, queue_wait.sum
+        ok_before = metrics.TASKS_TOTAL.labels("say", "ok").value
+
+        # Act
+        await manager._semaphore.acquire()
+        await manager._run_task(message)
+
+        # Assert
+        self.assertEqual(queue_wait.count, waits_before + 1)
+        self.assertGreaterEqual(queue_wait.sum - wait_sum_before, 2)
+        self.assertEqual(metrics.TASKS_TOTAL.labels("say", "ok").value, ok_before + 1)
+        self.assertEqual(metrics.TASKS_IN_FLIGHT.labels().value, 0)
+
+    async def test_main_bounds_concurrency(self):
+        # Arrange
+        running = 0
+        max_running = 0
+
+        async def slow_task():
+            nonlocal running, max_running
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+        messages = [make_message({"task": "slow"}) for _ in range(6)]
+        manager = Manager(
+            queue_name="test_queue", tasks={"slow": slow_task}, concurrency=2
+        )
+        manager.connection = AsyncMock()
+        manager.connection.is_closed = False
+        manager.queue = MagicMock()
+        manager.queue.iterator.return_value = FakeQueueIterator(messages)
+
+        # Act
+        await manager.main()
+        await manager.close()
+
+        # Assert
+        self.assertEqual(max_running, 2)
+        for message in messages:
+            message.ack.assert_awaited_once()
+
+    async def test_main_survives_failing_and_unknown_tasks(self):
+        # Arrange
+        failing_task = AsyncMock(side_effect=RuntimeError("boom"))
+        messages = [
+            make_message({"task": "fail"}),
+            make_message({"task": "unknown"}),
+            make_message({"task": "say", "args": ["Hello"]}),
+        ]
+        manager = Manager(
+            queue_name="test_queue",
+            tasks={"fail": failing_task, **self.sample_tasks},
+        )
+        manager.connection = AsyncMock()
+        manager.connection.is_closed = False
+        manager.channel = AsyncMock()
+        manager.queue = MagicMock()
+        manager.queue.iterator.return_value = FakeQueueIterator(messages)
+
+        # Act
+        await manager.main()
+        await manager.close()
+
+        # Assert: failed and unknown tasks were moved on, not left unacked
+        for message in messages:
+            message.ack.assert_awaited_once()
+        self.sample_tasks["say"].assert_awaited_once_with("Hello")
+
+    async def test_failed_task_is_retried_with_backoff(self):
+        # Arrange
+        message = make_message({"task": "fail"})
+        message.headers = {"enqueued_at": 1.0, "attempts": 1}
+        manager = Manager(
+            queue_name="test_queue",
+            tasks={"fail": AsyncMock(side_effect=RuntimeError("boom"))},
+            max_attempts=5,
+            retry_delay=2,
+        )
+        manager.channel = AsyncMock()
 
         # Act
-        messages = await manager._get_messages()
+        await manager._semaphore.acquire()
+        with self.assertLogs("manager", level="WARNING"):
+            await manager._run_task(message)
+
+        # Assert: the second failure waits twice the first delay
+        manager.channel.declare_queue.assert_awaited_once_with(
+            "test_queue.retry.4000",
+            durable=True,
+            arguments={
+                "x-message-ttl": 4000,
+                "x-dead-letter-exchange": "",
+                "x-dead-letter-routing-key": "test_queue",
+            },
+        )
+        publish = manager.channel.default_exchange.publish.await_args
+        self.assertEqual(publish.kwargs["routing_key"], "test_queue.retry.4000")
+        retried = publish.args[0]
+        self.assertEqual(retried.body, message.body)
+        self.assertEqual(retried.headers["attempts"], 2)
+        self.assertEqual(retried.headers["last_error"], "RuntimeError: boom")
+        self.assertEqual(retried.headers["enqueued_at"], 1.0)
+        message.ack.assert_awaited_once()
+
+    async def test_task_failing_too_often_is_dead_lettered(self):
+        # Arrange
+        message = make_message({"task": "fail"})
+        message.headers = {"attempts": 2}
+        manager = Manager(
+            queue_name="test_queue",
+            tasks={"fail": AsyncMock(side_effect=RuntimeError("boom"))},
+            max_attempts=3,
+        )
+        manager.channel = AsyncMock()
+        dead_letters = metrics.DEAD_LETTERS_TOTAL.labels("fail")
+        dead_letters_before = dead_letters.value
+
+        # Act
+        await manager._semaphore.acquire()
+        with self.assertLogs("manager", level="ERROR"):
+            await manager._run_task(message)
+
+        # Assert
+        manager.channel.declare_queue.assert_awaited_once_with(
+            "test_queue.dead", durable=True, arguments=None
+        )
+        publish = manager.channel.default_exchange.publish.await_args
+        self.assertEqual(publish.kwargs["routing_key"], "test_queue.dead")
+        self.assertEqual(publish.args[0].headers["attempts"], 3)
+        self.assertEqual(dead_letters.value, dead_letters_before + 1)
+        message.ack.assert_awaited_once()
+
+    async def test_unknown_and_malformed_messages_are_dead_lettered(self):
+        # Arrange
+        unknown = make_message({"task": "unknown"})
+        malformed = make_message({})
+        malformed.body = b"not json"
+        manager = Manager(queue_name="test_queue", tasks=self.sample_tasks)
+        manager.channel = AsyncMock()
+
+        # Act
+        for message in (unknown, malformed):
+            await manager._semaphore.acquire()
+            with self.assertLogs("manager", level="ERROR"):
+                await manager._run_task(message)
+
+        # Assert: declared once, no retries
+        manager.channel.declare_queue.assert_awaited_once()
+        routing_keys = [
+            call.kwargs["routing_key"]
+            for call in manager.channel.default_exchange.publish.await_args_list
+        ]
+        self.assertEqual(routing_keys, ["test_queue.dead", "test_queue.dead"])
+        unknown.ack.assert_awaited_once()
+        malformed.ack.assert_awaited_once()
+
+    async def test_message_stays_unacked_when_retry_cannot_be_published(self):
+        # Arrange
+        message = make_message({"task": "fail"})
+        manager = Manager(
+            queue_name="test_queue",
+            tasks={"fail": AsyncMock(side_effect=RuntimeError("boom"))},
+        )
+        manager.channel = AsyncMock()
+        manager.channel.default_exchange.publish.side_effect = ConnectionError()
+
+        # Act
+        await manager._semaphore.acquire()
+        with self.assertLogs("manager", level="ERROR"):
+            await manager._run_task(message)
+
+        # Assert
+        message.ack.assert_not_awaited()
+
+    def test_retry_delay_is_capped(self):
+        # Arrange
+        manager = Manager(
+            queue_name="test_queue",
+            tasks=self.sample_tasks,
+            retry_delay=5,
+            max_retry_delay=30,
+        )
+
+        # Act
+        delays = [manager.retry_delay_for(attempts) for attempts in range(1, 6)]
+
+        # Assert
+        self.assertEqual(delays, [5, 10, 20, 30, 30])
+
+    async def test_main_and_close_run_lifecycle_hooks(self):
+        # Arrange
+        calls = []
+
+        async def start():
+            calls.append("start")
+
+        def stop():
+            calls.append("stop")
+
+        manager = Manager(
+            queue_name="test_queue",
+            tasks=self.sample_tasks,
+            on_startup=[start],
+            on_shutdown=[stop],
+        )
+        manager.connection = AsyncMock()
+        manager.connection.is_closed = False
+        manager.queue = MagicMock()
+        manager.queue.iterator.return_value = FakeQueueIterator(
+            [make_message({"task": "say"})]
+        )
+
+        # Act
+        await manager.main()
+        await manager.close()
+
+        # Assert
+        self.assertEqual(calls, ["start", "stop"])
+
+    async def test_update_queue_stats_estimates_drain_time(self):
+        # Arrange
+        manager = Manager(queue_name="test_queue", tasks=self.sample_tasks)
+        manager.channel = AsyncMock()
+        queue = manager.channel.declare_queue.return_value
+        queue.declaration_result.message_count = 600
+        queue.declaration_result.consumer_count = 3
+        manager._finished = 100
+
+        # Act
+        await manager.update_queue_stats(elapsed=10)
+
+        # Assert: 10 tasks/s on each of 3 consumers drain 600 messages in 20 s
+        manager.channel.declare_queue.assert_awaited_once_with(
+            "test_queue", passive=True, robust=False
+        )
+        self.assertEqual(metrics.QUEUE_DEPTH.labels("test_queue").value, 600)
+        self.assertEqual(metrics.QUEUE_CONSUMERS.labels("test_queue").value, 3)
+        self.assertEqual(metrics.QUEUE_PROCESSING_RATE.labels("test_queue").value, 10)
+        self.assertEqual(metrics.QUEUE_DRAIN_SECONDS.labels("test_queue").value, 20)
+        self.assertEqual(manager._finished, 0)
+
+    async def test_update_queue_stats_smooths_rate(self):
+        # Arrange
+        manager = Manager(queue_name="test_queue", tasks=self.sample_tasks)
+        manager.channel = AsyncMock()
+        queue = manager.channel.declare_queue.return_value
+        queue.declaration_result.message_count = 50
+        queue.declaration_result.consumer_count = 1
+        manager._finished = 100
+        await manager.update_queue_stats(elapsed=10)
+
+        # Act: nothing finished while the backlog stayed
+        await manager.update_queue_stats(elapsed=10)
+
+        # Assert
+        rate = metrics.QUEUE_PROCESSING_RATE.labels("test_queue").value
+        self.assertAlmostEqual(rate, 7)
+        self.assertAlmostEqual(
+            metrics.QUEUE_DRAIN_SECONDS.labels("test_queue").value, 50 / 7
+        )
+
+    async def test_update_queue_stats_without_consumers(self):
+        # Arrange
+        manager = Manager(queue_name="test_queue", tasks=self.sample_tasks)
+        manager.channel = AsyncMock()
+        queue = manager.channel.declare_queue.return_value
+        queue.declaration_result.message_count = 50
+        queue.declaration_result.consumer_count = 0
+
+        # Act
+        await manager.update_queue_stats(elapsed=10)
+
+        # Assert
+        self.assertEqual(
+            metrics.QUEUE_DRAIN_SECONDS.labels("test_queue").value, float("inf")
+        )
+
+    async def test_main_monitors_queue_until_closed(self):
+        # Arrange
+        manager = Manager(
+            queue_name="test_queue", tasks=self.sample_tasks, stats_interval=0.01
+        )
+        manager.connection = AsyncMock()
+        manager.connection.is_closed = False
+        manager.channel = AsyncMock()
+        queue = manager.channel.declare_queue.return_value
+        queue.declaration_result.message_count = 0
+        queue.declaration_result.consumer_count = 1
+        manager.queue = MagicMock()
+        manager.queue.iterator.return_value = FakeQueueIterator([])
+
+        # Act
+        await manager.main()
+        await asyncio.sleep(0.05)
+        await manager.close()
 
         # Assert
-        mock_queue.get.assert_awaited_once_with(fail=False, timeout=5)
-        self.assertEqual(messages, [mock_message])
+        manager.channel.declare_queue.assert_awaited()
+        self.assertIsNone(manager._monitor)
 
     @patch("aio_pika.connect_robust")
     async def test_close(self, mock_aio_pika_connect):
@@ -0,0 +1,50 @@
+import io
+import zipfile
+
+WORD_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+SHEET_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+
+
+def make_zip(members: dict[str, bytes]) -> bytes:
+    """
+    Build a zip archive from member names and contents.
+    """
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, content in members.items():
+            archive.writestr(name, content)
+    return buffer.getvalue()
+
+
+def make_docx(paragraphs: list[str]) -> bytes:
+    """
+    Build a minimal DOCX with one run per paragraph.
+    """
+    body = "".join(f"<w:p><w:r><w:t>{text}</w:t></w:r></w:p>" for text in paragraphs)
+    document = f'<w:document xmlns:w="{WORD_NS}"><w:body>{body}</w:body></w:document>'
+    return make_zip({"word/document.xml": document.encode()})
+
+
+def make_xlsx(rows: list[list[str]]) -> bytes:
+    """
+    Build a minimal XLSX whose cells are all shared strings.
+    """
+    strings: list[str] = []
+    sheet_rows = []
+    for row in rows:
+        cells = []
+        for value in row:
+            strings.append(value)
+            cells.append(f'<c t="s"><v>{len(strings) - 1}</v></c>')
+        sheet_rows.append(f"<row>{''.join(cells)}</row>")
+
+    shared = "".join(f"<si><t>{value}</t></si>" for value in strings)
+    return make_zip(
+        {
+            "xl/sharedStrings.xml": f'<sst xmlns="{SHEET_NS}">{shared}</sst>'.encode(),
+            "xl/worksheets/sheet1.xml": (
+                f'<worksheet xmlns="{SHEET_NS}"><sheetData>'
+                f"{''.join(sheet_rows)}</sheetData></worksheet>"
+            ).encode(),
+        }
+    )
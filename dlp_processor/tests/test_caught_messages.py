@@ -0,0 +1,119 @@
+import hashlib
+from unittest import IsolatedAsyncioTestCase, TestCase
+from unittest.mock import patch
+
+from aiohttp import ClientResponseError, web
+from aiohttp.test_utils import TestServer
+from enums import SourceType
+from http_client import HttpClient
+from matcher import PatternMatch
+from utils import build_caught_message, create_caught_messages, match_snippet
+
+
+class TestMatchSnippet(TestCase):
+    @patch("utils.SNIPPET_CONTEXT_CHARS", 4)
+    def test_keeps_context_around_match(self):
+        # Arrange
+        content = "my SSN is 123-45-6789 ok?"
+        match = PatternMatch(1, 10, 21)
+
+        # Act
+        snippet = match_snippet(match, content)
+
+        # Assert
+        self.assertEqual(snippet, " is 123-45-6789 ok?")
+
+    @patch("utils.SNIPPET_CONTEXT_CHARS", 2)
+    @patch("utils.SNIPPET_MAX_MATCH_CHARS", 3)
+    def test_truncates_long_matches(self):
+        # Act
+        snippet = match_snippet(PatternMatch(1, 2, 12), "ab0123456789cd")
+
+        # Assert
+        self.assertEqual(snippet, "ab01234")
+
+
+class TestBuildCaughtMessage(TestCase):
+    def test_stores_offsets_and_content_hash(self):
+        # Arrange
+        content = "the secret is out"
+        additional_info = {
+            "user": "U123",
+            "channel": "C123",
+            "ts": "1.0",
+            "source_type": SourceType.FILE,
+            "file_id": "F1",
+            "file_name": "leak.pdf",
+        }
+
+        # Act
+        caught_message = build_caught_message(
+            PatternMatch(2, 4, 10), content, additional_info
+        )
+
+        # Assert
+        self.assertEqual(caught_message["match_start"], 4)
+        self.assertEqual(caught_message["match_end"], 10)
+        self.assertEqual(
+            caught_message["content_hash"],
+            hashlib.sha256(content.encode()).hexdigest(),
+        )
+        self.assertEqual(caught_message["content"], content)
+        self.assertEqual(caught_message["file_id"], "F1")
+
+
+class TestCreateCaughtMessages(IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.payloads = []
+        self.status = 201
+
+        async def bulk_create(request):
+            self.payloads.append(await request.json())
+            return web.json_response([], status=self.status)
+
+        app = web.Application()
+        app.router.add_post("/api/caught_messages/bulk/", bulk_create)
+        self.server = TestServer(app)
+        await self.server.start_server()
+
+        self.client = HttpClient(limit=10, limit_per_host=2, keepalive_timeout=30)
+        patcher = patch("utils.http_client", self.client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def asyncTearDown(self):
+        await self.client.close()
+        await self.server.close()
+
+    async def test_sends_content_once_per_hash(self):
+        # Arrange
+        info = {"user": "U123", "channel": "C123", "ts": "1.0"}
+        content = "SSN 123-45-6789 is a secret"
+        caught_messages = [
+            build_caught_message(PatternMatch(1, 4, 15), content, info),
+            build_caught_message(PatternMatch(2, 21, 27), content, info),
+        ]
+        base_url = str(self.server.make_url("")).rstrip("/")
+
+        # Act
+        with patch.dict("os.environ", {"WEBSERVER_BASE_URL": base_url}):
+            await create_caught_messages(caught_messages)
+
+        # Assert
+        [payload] = self.payloads
+        self.assertEqual(payload[0]["content"], content)
+        self.assertNotIn("content", payload[1])
+        self.assertEqual(payload[0]["content_hash"], payload[1]["content_hash"])
+        self.assertIn("content", caught_messages[1])
+
+    async def test_failed_request_raises(self):
+        # Arrange
+        self.status = 500
+        info = {"user": "U123", "channel": "C123", "ts": "1.0"}
+        caught_messages = [build_caught_message(PatternMatch(1, 0, 3), "abc", info)]
+        base_url = str(self.server.make_url("")).rstrip("/")
+
+        # Act / Assert: raised for the Manager to retry the task
+        with patch.dict("os.environ", {"WEBSERVER_BASE_URL": base_url}):
+            with self.assertLogs("utils"), self.assertRaises(ClientResponseError):
+                await create_caught_messages(caught_messages)
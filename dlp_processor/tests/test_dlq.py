@@ -0,0 +1,75 @@
+import json
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import AsyncMock
+
+from dlq import list_dead_letters, purge_dead_letters, requeue_dead_letters
+
+
+def dead_letter(body: dict) -> AsyncMock:
+    message = AsyncMock()
+    message.body = json.dumps(body).encode()
+    message.content_type = "application/json"
+    message.headers = {
+        "enqueued_at": 1.0,
+        "attempts": 5,
+        "last_error": "RuntimeError: boom",
+        "dead_lettered_at": 0,
+    }
+    return message
+
+
+class TestDeadLetterQueue(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.messages = [
+            dead_letter({"task": "scan_message", "args": [str(index)]})
+            for index in range(3)
+        ]
+        self.queue = AsyncMock()
+        self.queue.get.side_effect = self.messages + [None]
+        self.channel = AsyncMock()
+        self.channel.declare_queue.return_value = self.queue
+
+    async def test_list_leaves_messages_in_queue(self):
+        # Act
+        entries = await list_dead_letters(self.channel, "slack_messages", limit=2)
+
+        # Assert
+        self.channel.declare_queue.assert_awaited_once_with(
+            "slack_messages.dead", durable=True
+        )
+        self.assertEqual(
+            entries[0],
+            {
+                "dead_lettered_at": "1970-01-01T00:00:00+00:00",
+                "attempts": 5,
+                "error": "RuntimeError: boom",
+                "body": {"task": "scan_message", "args": ["0"]},
+            },
+        )
+        self.assertEqual(len(entries), 2)
+        for message in self.messages:
+            message.ack.assert_not_awaited()
+
+    async def test_requeue_resets_attempts(self):
+        # Act
+        count = await requeue_dead_letters(self.channel, "slack_messages", limit=None)
+
+        # Assert
+        self.assertEqual(count, 3)
+        publishes = self.channel.default_exchange.publish.await_args_list
+        self.assertEqual(
+            [call.kwargs["routing_key"] for call in publishes], ["slack_messages"] * 3
+        )
+        self.assertEqual(publishes[0].args[0].headers, {"enqueued_at": 1.0})
+        for message in self.messages:
+            message.ack.assert_awaited_once()
+
+    async def test_purge(self):
+        # Arrange
+        self.queue.purge.return_value.message_count = 3
+
+        # Act
+        count = await purge_dead_letters(self.channel, "slack_messages")
+
+        # Assert
+        self.assertEqual(count, 3)
@@ -0,0 +1,151 @@
+import hashlib
+import os
+import tempfile
+from unittest import IsolatedAsyncioTestCase, TestCase
+from unittest.mock import patch
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from downloads import DownloadBuffer, DownloadTooLarge
+from extractors import ExtractionLimits, extract_pdf
+from http_client import HttpClient
+from patterns import PatternSet
+from scanning import scan_document
+from utils import download_file
+
+from tests.pdf import make_pdf
+
+
+class TestDownloadBuffer(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def test_small_download_stays_in_memory(self):
+        # Arrange
+        buffer = DownloadBuffer(
+            max_bytes=100, spill_bytes=10, directory=self.directory.name
+        )
+
+        # Act
+        buffer.write(b"abc")
+        buffer.write(b"def")
+        download = buffer.finish()
+
+        # Assert
+        self.assertEqual(download.source, b"abcdef")
+        self.assertEqual(download.sha256, hashlib.sha256(b"abcdef").hexdigest())
+        self.assertEqual(os.listdir(self.directory.name), [])
+
+    def test_large_download_spills_to_disk(self):
+        # Arrange
+        buffer = DownloadBuffer(
+            max_bytes=100, spill_bytes=4, directory=self.directory.name
+        )
+
+        # Act
+        buffer.write(b"abc")
+        buffer.write(b"def")
+        download = buffer.finish()
+
+        # Assert
+        self.assertIsNone(download.content)
+        with open(download.source, "rb") as f:
+            self.assertEqual(f.read(), b"abcdef")
+        self.assertEqual(download.size, 6)
+
+        download.cleanup()
+        self.assertEqual(os.listdir(self.directory.name), [])
+
+    def test_rejects_oversized_download(self):
+        # Arrange
+        buffer = DownloadBuffer(
+            max_bytes=5, spill_bytes=2, directory=self.directory.name
+        )
+        buffer.write(b"abc")
+
+        # Act / Assert
+        with self.assertRaises(DownloadTooLarge):
+            buffer.write(b"def")
+        buffer.abort()
+        self.assertEqual(os.listdir(self.directory.name), [])
+
+    def test_scans_spilled_pdf_from_path(self):
+        # Arrange
+        pattern_set = PatternSet(
+            [{"id": 1, "name": "SSN", "regex_pattern": r"\d{3}-\d{2}-\d{4}"}],
+            version="spilled",
+        )
+        buffer = DownloadBuffer(
+            max_bytes=10**6, spill_bytes=16, directory=self.directory.name
+        )
+        buffer.write(make_pdf(["SSN 123-45-6789"]))
+        download = buffer.finish()
+        self.addCleanup(download.cleanup)
+
+        # Act
+        results = scan_document(
+            download.source,
+            extract_pdf,
+            "spilled",
+            pattern_set.patterns,
+            ExtractionLimits(),
+        )
+
+        # Assert
+        self.assertEqual([match.pattern_id for match, _ in results], [1])
+
+
+class TestDownloadFile(IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        async def small(request):
+            return web.Response(body=b"x" * 1000)
+
+        async def streamed(request):
+            response = web.StreamResponse()
+            await response.prepare(request)
+            for _ in range(10):
+                await response.write(b"x" * 1000)
+            await response.write_eof()
+            return response
+
+        app = web.Application()
+        app.router.add_get("/small", small)
+        app.router.add_get("/streamed", streamed)
+        self.server = TestServer(app)
+        await self.server.start_server()
+
+        client = HttpClient(limit=10, limit_per_host=2, keepalive_timeout=30)
+        patcher = patch("utils.http_client", client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addAsyncCleanup(client.close)
+
+    async def asyncTearDown(self):
+        await self.server.close()
+
+    async def test_downloads_file(self):
+        # Act
+        download = await download_file(str(self.server.make_url("/small")), "token")
+
+        # Assert
+        self.assertEqual(download.size, 1000)
+        self.assertEqual(download.sha256, hashlib.sha256(b"x" * 1000).hexdigest())
+
+    async def test_rejects_declared_size_over_limit(self):
+        # Act
+        download = await download_file(
+            str(self.server.make_url("/small")), "token", max_bytes=999
+        )
+
+        # Assert
+        self.assertIsNone(download)
+
+    async def test_stops_streamed_download_over_limit(self):
+        # Act
+        download = await download_file(
+            str(self.server.make_url("/streamed")), "token", max_bytes=5000
+        )
+
+        # Assert
+        self.assertIsNone(download)
@@ -0,0 +1,286 @@
+import asyncio
+import hashlib
+import io
+import time
+from concurrent.futures.process import BrokenProcessPool
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import AsyncMock, patch
+
+from downloads import Download
+from extraction import ExtractionPool
+from extractors import extract_pdf, extract_text_from_pdf
+from file_cache import FileScanCache
+from matcher import PatternMatch
+from patterns import PatternSet
+from scanning import scan_document
+from utils import scan_file, scan_message_text
+
+from tests.pdf import make_pdf
+
+
+def make_download(content: bytes) -> Download:
+    return Download(
+        size=len(content), sha256=hashlib.sha256(content).hexdigest(), content=content
+    )
+
+
+class TestExtractionPool(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.pool = ExtractionPool(max_workers=1, timeout=10)
+        self.addCleanup(self.pool.shutdown)
+
+    async def test_run_extracts_in_worker_process(self):
+        # Arrange
+        content = make_pdf(["SSN 123-45-6789", "second page"])
+
+        # Act
+        text = await self.pool.run(extract_text_from_pdf, io.BytesIO(content), 1)
+
+        # Assert
+        self.assertIn("123-45-6789", text)
+        self.assertNotIn("second page", text)
+
+    async def test_run_times_out(self):
+        # Arrange
+        self.pool.timeout = 0.5
+
+        # Act / Assert
+        with self.assertRaises(asyncio.TimeoutError):
+            await self.pool.run(time.sleep, 2)
+
+    async def test_timeout_terminates_pool(self):
+        # Act
+        with self.assertRaises(asyncio.TimeoutError):
+            await self.pool.run(time.sleep, 30, timeout=0.5)
+
+        # Assert: the stuck worker is gone and the next call gets a new pool
+        self.assertIsNone(self.pool._executor)
+        self.assertEqual(await self.pool.run(len, "abc"), 3)
+
+    async def test_stale_failure_keeps_the_restarted_pool(self):
+        # Arrange
+        self.pool.max_workers = 2
+        self.pool._slots = asyncio.Semaphore(2)
+        runaway = asyncio.create_task(self.pool.run(time.sleep, 30, timeout=1))
+        in_flight = asyncio.create_task(self.pool.run(time.sleep, 3))
+        await asyncio.sleep(0.5)
+
+        # Act: the runaway call terminates the pool in_flight is running on,
+        # and a new call starts on its replacement before in_flight fails
+        with self.assertRaises(asyncio.TimeoutError):
+            await runaway
+        restarted = asyncio.create_task(self.pool.run(time.sleep, 2))
+        with self.assertRaises(BrokenProcessPool):
+            await in_flight
+
+        # Assert
+        self.assertIsNone(await restarted)
+        self.assertIsNotNone(self.pool._executor)
+
+    async def test_timeout_excludes_waiting_for_a_worker(self):
+        # Act: the second call waits a second for the only worker
+        slow, fast = await asyncio.gather(
+            self.pool.run(time.sleep, 1),
+            self.pool.run(len, "abc", timeout=0.5),
+        )
+
+        # Assert
+        self.assertIsNone(slow)
+        self.assertEqual(fast, 3)
+
+
+class TestScanMessageText(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.pool = ExtractionPool(max_workers=1, timeout=10)
+        self.addCleanup(self.pool.shutdown)
+
+        patcher = patch("utils.scan_pool", self.pool)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_scans_in_worker_process(self):
+        # Arrange
+        pattern_set = PatternSet(
+            [{"id": 1, "name": "SSN", "regex_pattern": r"\d{3}-\d{2}-\d{4}"}],
+            version="message-text",
+        )
+
+        # Act
+        matches = await scan_message_text("SSN 123-45-6789", pattern_set)
+
+        # Assert
+        self.assertEqual(matches, [PatternMatch(1, 4, 15)])
+
+    async def test_sends_patterns_once_per_worker(self):
+        # Arrange
+        pattern_set = PatternSet(
+            [{"id": 1, "name": "SSN", "regex_pattern": r"\d{3}-\d{2}-\d{4}"}],
+            version="sent-once",
+        )
+        calls = []
+        run = self.pool.run
+
+        async def record(func, *args, **kwargs):
+            calls.append(len(args))
+            return await run(func, *args, **kwargs)
+
+        # Act
+        with patch.object(self.pool, "run", record):
+            for _ in range(3):
+                matches = await scan_message_text("SSN 123-45-6789", pattern_set)
+
+        # Assert: one call without patterns, one with, then none with them
+        self.assertEqual(matches, [PatternMatch(1, 4, 15)])
+        self.assertEqual(calls, [2, 3, 2, 2])
+
+    @patch("utils.SCAN_TIMEOUT", 0.5)
+    async def test_gives_up_on_catastrophic_backtracking(self):
+        # Arrange
+        pattern_set = PatternSet(
+            [{"id": 1, "name": "Words", "regex_pattern": r"(\w+\s?)+$"}],
+            version="backtracking",
+        )
+
+        # Act
+        start = time.perf_counter()
+        with self.assertRaises(asyncio.TimeoutError), self.assertLogs("utils"):
+            await scan_message_text("a" * 40 + "!", pattern_set)
+
+        # Assert: raised for the Manager to retry
+        self.assertLess(time.perf_counter() - start, 5)
+
+
+class TestScanFile(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.pattern_set_data = [
+            {"id": 1, "name": "SSN", "regex_pattern": r"\d{3}-\d{2}-\d{4}"}
+        ]
+        self.pattern_set = PatternSet(self.pattern_set_data, version="v1")
+
+        patcher = patch("utils.file_scan_cache", FileScanCache(max_entries=10))
+        self.file_scan_cache = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @patch("utils.download_file", new_callable=AsyncMock)
+    async def test_skips_unsupported_files(self, mock_download_file):
+        # Arrange
+        file_info = {"id": "F1", "filetype": "gif"}
+
+        # Act
+        results = await scan_file(file_info, self.pattern_set)
+
+        # Assert
+        self.assertEqual(results, [])
+        mock_download_file.assert_not_awaited()
+
+    @patch("utils.download_file", new_callable=AsyncMock)
+    async def test_skips_files_over_size_limit(self, mock_download_file):
+        # Arrange
+        file_info = {"id": "F1", "filetype": "pdf", "size": 10**12}
+
+        # Act
+        results = await scan_file(file_info, self.pattern_set)
+
+        # Assert
+        self.assertEqual(results, [])
+        mock_download_file.assert_not_awaited()
+
+    @patch("utils.extraction_pool")
+    @patch("utils.download_file", new_callable=AsyncMock)
+    async def test_scans_pdf_in_pool(self, mock_download_file, mock_pool):
+        # Arrange
+        mock_download_file.return_value = make_download(b"%PDF")
+        mock_pool.run = AsyncMock(return_value=[])
+        file_info = {"id": "F1", "filetype": "pdf", "url_private": "https://x"}
+
+        # Act
+        results = await scan_file(file_info, self.pattern_set)
+
+        # Assert
+        self.assertEqual(results, [])
+        mock_pool.run.assert_awaited_once()
+        self.assertIs(mock_pool.run.await_args.args[0], scan_document)
+        self.assertIs(mock_pool.run.await_args.args[2], extract_pdf)
+
+    @patch("utils.extraction_pool")
+    @patch("utils.download_file", new_callable=AsyncMock)
+    async def test_extraction_timeout_returns_no_results(
+        self, mock_download_file, mock_pool
+    ):
+        # Arrange
+        mock_download_file.return_value = make_download(b"%PDF")
+        mock_pool.run = AsyncMock(side_effect=asyncio.TimeoutError)
+        file_info = {"id": "F1", "filetype": "pdf", "url_private": "https://x"}
+
+        # Act
+        results = await scan_file(file_info, self.pattern_set)
+
+        # Assert
+        self.assertEqual(results, [])
+
+    @patch("utils.extraction_pool")
+    @patch("utils.download_file", new_callable=AsyncMock)
+    async def test_dead_worker_fails_the_scan(self, mock_download_file, mock_pool):
+        # Arrange
+        mock_download_file.return_value = make_download(b"%PDF")
+        mock_pool.run = AsyncMock(side_effect=BrokenProcessPool)
+        file_info = {"id": "F1", "filetype": "pdf", "url_private": "https://x"}
+
+        # Act / Assert: raised for the task to be retried or dead-lettered
+        with self.assertLogs("utils"), self.assertRaises(BrokenProcessPool):
+            await scan_file(file_info, self.pattern_set)
+
+    @patch("utils.extraction_pool")
+    @patch("utils.download_file", new_callable=AsyncMock)
+    async def test_known_file_skips_download_and_extraction(
+        self, mock_download_file, mock_pool
+    ):
+        # Arrange
+        mock_download_file.return_value = make_download(b"%PDF")
+        mock_pool.run = AsyncMock(
+            return_value=[(PatternMatch(1, 0, 11), "123-45-6789")]
+        )
+        file_info = {"id": "F1", "filetype": "pdf", "url_private": "https://x"}
+
+        # Act
+        first = await scan_file(file_info, self.pattern_set)
+        second = await scan_file(file_info, self.pattern_set)
+
+        # Assert
+        self.assertEqual(first, second)
+        mock_download_file.assert_awaited_once()
+        mock_pool.run.assert_awaited_once()
+
+    @patch("utils.extraction_pool")
+    @patch("utils.download_file", new_callable=AsyncMock)
+    async def test_identical_content_skips_extraction(
+        self, mock_download_file, mock_pool
+    ):
+        # Arrange
+        mock_download_file.return_value = make_download(b"%PDF")
+        mock_pool.run = AsyncMock(return_value=[])
+
+        # Act
+        for file_id in ("F1", "F2"):
+            file_info = {"id": file_id, "filetype": "pdf", "url_private": "https://x"}
+            await scan_file(file_info, self.pattern_set)
+
+        # Assert
+        self.assertEqual(mock_download_file.await_count, 2)
+        mock_pool.run.assert_awaited_once()
+
+    @patch("utils.extraction_pool")
+    @patch("utils.download_file", new_callable=AsyncMock)
+    async def test_new_pattern_version_rescans(self, mock_download_file, mock_pool):
+        # Arrange
+        mock_download_file.return_value = make_download(b"%PDF")
+        mock_pool.run = AsyncMock(return_value=[])
+        file_info = {"id": "F1", "filetype": "pdf", "url_private": "https://x"}
+        await scan_file(file_info, self.pattern_set)
+
+        # Act
+        await scan_file(file_info, PatternSet(self.pattern_set_data, version="v2"))
+
+        # Assert
+        self.assertEqual(mock_download_file.await_count, 2)
+        self.assertEqual(mock_pool.run.await_count, 2)
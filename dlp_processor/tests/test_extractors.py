@@ -0,0 +1,136 @@
+import io
+from unittest import TestCase
+
+from extractors import (
+    ExtractionLimitExceeded,
+    ExtractionLimits,
+    extract_docx,
+    extract_pdf,
+    extract_plain_text,
+    extract_xlsx,
+    extract_zip,
+    find_extractor,
+)
+
+from tests.office import make_docx, make_xlsx, make_zip
+from tests.pdf import make_pdf
+
+
+def extract(extractor, content: bytes, limits=ExtractionLimits()) -> str:
+    return "".join(extractor(io.BytesIO(content), limits))
+
+
+class TestFindExtractor(TestCase):
+    def test_prefers_slack_filetype(self):
+        self.assertIs(find_extractor("docx", "application/pdf"), extract_docx)
+
+    def test_falls_back_to_mimetype_and_extension(self):
+        self.assertIs(
+            find_extractor("binary", "text/csv; charset=utf-8"), extract_plain_text
+        )
+        self.assertIs(find_extractor("binary", None, "REPORT.XLSX"), extract_xlsx)
+
+    def test_unsupported_file(self):
+        self.assertIsNone(find_extractor("gif", "image/gif", "cat.gif"))
+
+
+class TestExtractors(TestCase):
+    def test_plain_text(self):
+        # Act
+        text = extract(extract_plain_text, "name,ssn\nbob,123-45-6789\n".encode())
+
+        # Assert
+        self.assertEqual(text, "name,ssn\nbob,123-45-6789\n")
+
+    def test_docx(self):
+        # Act
+        text = extract(extract_docx, make_docx(["Hello", "SSN 123-45-6789"]))
+
+        # Assert
+        self.assertEqual(text, "Hello\nSSN 123-45-6789\n")
+
+    def test_xlsx(self):
+        # Arrange
+        content = make_xlsx([["name", "ssn"], ["bob", "123-45-6789"]])
+
+        # Act
+        text = extract(extract_xlsx, content)
+
+        # Assert
+        self.assertIn("name\tssn\nbob\t123-45-6789\n", text)
+
+    def test_zip_walks_supported_members(self):
+        # Arrange
+        content = make_zip(
+            {
+                "notes.txt": b"plain 111-11-1111",
+                "image.png": b"\x89PNG 222-22-2222",
+                "doc.pdf": make_pdf(["pdf 333-33-3333"]),
+                "inner.zip": make_zip({"deep.docx": make_docx(["docx 444-44-4444"])}),
+            }
+        )
+
+        # Act
+        text = extract(extract_zip, content)
+
+        # Assert
+        self.assertIn("111-11-1111", text)
+        self.assertNotIn("222-22-2222", text)
+        self.assertIn("333-33-3333", text)
+        self.assertIn("444-44-4444", text)
+
+    def test_zip_respects_depth_and_member_limits(self):
+        # Arrange
+        content = make_zip(
+            {
+                "a.txt": b"first",
+                "b.txt": b"second",
+                "inner.zip": make_zip({"deep.txt": b"nested"}),
+            }
+        )
+
+        # Act
+        limits = ExtractionLimits(max_archive_members=1)
+        first_member = extract(extract_zip, content, limits)
+        top_level = extract(extract_zip, content, ExtractionLimits(max_archive_depth=0))
+
+        # Assert
+        self.assertEqual(first_member.strip("\f"), "first")
+        self.assertIn("second", top_level)
+        self.assertNotIn("nested", top_level)
+
+    def test_zip_bomb_is_stopped(self):
+        # Arrange
+        content = make_zip({"bomb.txt": b"0" * 1_000_000})
+
+        # Act / Assert
+        with self.assertRaises(ExtractionLimitExceeded):
+            extract(extract_zip, content, ExtractionLimits(max_archive_bytes=100_000))
+
+    def test_nested_archives_share_the_size_limit(self):
+        # Arrange: each inner archive alone stays below the limit
+        inner = make_zip({"part.txt": b"0" * 40_000})
+        content = make_zip({f"inner{i}.zip": inner for i in range(3)})
+
+        # Act / Assert
+        with self.assertRaises(ExtractionLimitExceeded):
+            extract(extract_zip, content, ExtractionLimits(max_archive_bytes=100_000))
+
+    def test_member_larger_than_what_is_left_is_not_read(self):
+        # Arrange
+        content = make_zip({"a.txt": b"0" * 60_000, "b.docx": b"1" * 60_000})
+
+        # Act / Assert
+        with self.assertRaises(ExtractionLimitExceeded):
+            extract(extract_zip, content, ExtractionLimits(max_archive_bytes=100_000))
+
+    def test_pdf(self):
+        # Arrange
+        content = make_pdf(["first", "second"])
+
+        # Act
+        text = extract(extract_pdf, content, ExtractionLimits(max_pages=1))
+
+        # Assert
+        self.assertIn("first", text)
+        self.assertNotIn("second", text)
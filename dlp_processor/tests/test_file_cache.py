@@ -0,0 +1,115 @@
+import hashlib
+import os
+import tempfile
+from unittest import TestCase
+
+from file_cache import FileScanCache, LRUCache
+from matcher import PatternMatch
+
+RESULTS = [(PatternMatch(1, 4, 15), "SSN 123-45-6789")]
+
+
+class TestLRUCache(TestCase):
+    def test_evicts_least_recently_used(self):
+        # Arrange
+        cache = LRUCache(max_entries=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+
+        # Act
+        cache.get("a")
+        cache.put("c", 3)
+
+        # Assert
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(len(cache), 2)
+
+    def test_evicts_beyond_max_size(self):
+        # Arrange
+        cache = LRUCache(max_entries=10, max_size=10, size=len)
+        cache.put("a", "x" * 4)
+        cache.put("b", "x" * 4)
+
+        # Act
+        cache.put("a", "x" * 5)
+        cache.put("c", "x" * 3)
+
+        # Assert: "b" is the least recently used once "a" is replaced
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), "x" * 5)
+        self.assertEqual(cache.get("c"), "x" * 3)
+
+
+class TestFileScanCache(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def test_memory_only(self):
+        # Arrange
+        cache = FileScanCache(max_entries=10, directory="")
+        digest = hashlib.sha256(b"%PDF").hexdigest()
+
+        # Act
+        cache.put("F1", digest, "v1", RESULTS)
+
+        # Assert
+        self.assertEqual(cache.get_hash("F1"), digest)
+        self.assertEqual(cache.get(digest, "v1"), RESULTS)
+        self.assertIsNone(cache.get(digest, "v2"))
+
+    def test_disk_tier_survives_restart(self):
+        # Arrange
+        digest = hashlib.sha256(b"%PDF").hexdigest()
+        FileScanCache(max_entries=10, directory=self.directory.name).put(
+            "F1", digest, "v1", []
+        )
+
+        # Act
+        cache = FileScanCache(max_entries=10, directory=self.directory.name)
+
+        # Assert
+        self.assertEqual(cache.get_hash("F1"), digest)
+        self.assertEqual(cache.get(digest, "v1"), [])
+
+    def test_page_text_is_not_written_to_disk(self):
+        # Arrange
+        digest = hashlib.sha256(b"%PDF").hexdigest()
+        FileScanCache(max_entries=10, directory=self.directory.name).put(
+            "F1", digest, "v1", RESULTS
+        )
+
+        # Act
+        cache = FileScanCache(max_entries=10, directory=self.directory.name)
+
+        # Assert: the file is still known, its results have to be scanned again
+        self.assertEqual(cache.get_hash("F1"), digest)
+        self.assertIsNone(cache.get(digest, "v1"))
+        self.assertFalse(os.path.exists(os.path.join(self.directory.name, "results")))
+
+    def test_results_are_bounded_by_page_text(self):
+        # Arrange
+        cache = FileScanCache(max_entries=10, directory="", max_bytes=20)
+
+        # Act
+        cache.put(None, "a", "v1", RESULTS)
+        cache.put(None, "b", "v1", RESULTS)
+
+        # Assert
+        self.assertIsNone(cache.get("a", "v1"))
+        self.assertEqual(cache.get("b", "v1"), RESULTS)
+
+    def test_disk_tier_is_bounded(self):
+        # Arrange
+        cache = FileScanCache(
+            max_entries=10, directory=self.directory.name, max_disk_entries=3
+        )
+
+        # Act
+        for index in range(5):
+            cache.put(None, hashlib.sha256(str(index).encode()).hexdigest(), "v1", [])
+
+        # Assert
+        results_dir = os.path.join(self.directory.name, "results")
+        self.assertEqual(len(os.listdir(results_dir)), 3)
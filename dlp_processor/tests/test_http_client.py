@@ -0,0 +1,66 @@
+from unittest import IsolatedAsyncioTestCase
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from http_client import HttpClient
+from metrics import HTTP_CONNECTIONS_CREATED_TOTAL, HTTP_CONNECTIONS_REUSED_TOTAL
+
+
+class TestHttpClient(IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        async def ok(request):
+            return web.json_response({"ok": True})
+
+        app = web.Application()
+        app.router.add_get("/", ok)
+        self.server = TestServer(app)
+        await self.server.start_server()
+
+        self.client = HttpClient(limit=10, limit_per_host=2, keepalive_timeout=30)
+
+    async def asyncTearDown(self):
+        await self.client.close()
+        await self.server.close()
+
+    async def test_reuses_connections(self):
+        # Arrange
+        url = str(self.server.make_url("/"))
+        created_before = HTTP_CONNECTIONS_CREATED_TOTAL.labels().value
+        reused_before = HTTP_CONNECTIONS_REUSED_TOTAL.labels().value
+
+        # Act
+        for _ in range(3):
+            session = await self.client.get_session()
+            async with session.get(url) as response:
+                await response.json()
+
+        # Assert
+        self.assertEqual(
+            self.client.stats(),
+            {"requests": 3, "connections_created": 1, "connections_reused": 2},
+        )
+        self.assertEqual(
+            HTTP_CONNECTIONS_CREATED_TOTAL.labels().value, created_before + 1
+        )
+        self.assertEqual(
+            HTTP_CONNECTIONS_REUSED_TOTAL.labels().value, reused_before + 2
+        )
+
+    async def test_get_session_returns_shared_session(self):
+        # Act
+        first = await self.client.get_session()
+        second = await self.client.get_session()
+
+        # Assert
+        self.assertIs(first, second)
+
+    async def test_close_releases_session(self):
+        # Arrange
+        session = await self.client.get_session()
+
+        # Act
+        await self.client.close()
+
+        # Assert
+        self.assertTrue(session.closed)
+        self.assertIsNot(await self.client.get_session(), session)
@@ -0,0 +1,102 @@
+import re
+from unittest import TestCase
+
+from matcher import Matcher, PatternMatch, required_literal, requires_digit
+from patterns import CompiledPattern
+
+
+def compile_patterns(regexes: list[str]) -> list[CompiledPattern]:
+    return [
+        CompiledPattern(index + 1, f"pattern {index + 1}", re.compile(regex))
+        for index, regex in enumerate(regexes)
+    ]
+
+
+def sequential_scan(patterns: list[CompiledPattern], text: str) -> list[PatternMatch]:
+    matches = []
+    for pattern in patterns:
+        match = pattern.regex.search(text)
+        if match:
+            matches.append(PatternMatch(pattern.id, *match.span()))
+    return matches
+
+
+class TestMatcher(TestCase):
+    def setUp(self):
+        self.patterns = compile_patterns(
+            [
+                r"\b\d{3}-\d{2}-\d{4}\b",
+                r"(?:\d[ -]*?){13,16}",
+                r"\d{3}",
+                r"(?i)secret",
+                r"(\w)\1{3}",
+                r"^token",
+            ]
+        )
+        self.matcher = Matcher(self.patterns)
+
+    def test_no_match(self):
+        # Act
+        matches = self.matcher.scan("nothing sensitive in here")
+
+        # Assert
+        self.assertEqual(matches, [])
+
+    def test_reports_every_pattern_that_hit(self):
+        # Arrange
+        text = "SSN 123-45-6789 and card 1111 2222 3333 4444, a SECRET aaaa"
+
+        # Act
+        matches = self.matcher.scan(text)
+
+        # Assert
+        self.assertEqual([m.pattern_id for m in matches], [1, 2, 3, 4, 5])
+
+    def test_matches_sequential_scan(self):
+        # Arrange
+        texts = [
+            "",
+            "token 123",
+            "the token 123",
+            "1234-5678-9012-3456 then 987-65-4321",
+            "987-65-4321 then 1234-5678-9012-3456",
+            "zzzz secret",
+            "12",
+        ]
+
+        for text in texts:
+            # Act
+            matches = self.matcher.scan(text)
+
+            # Assert
+            self.assertEqual(matches, sequential_scan(self.patterns, text), text)
+
+    def test_overlapping_patterns_are_not_shadowed(self):
+        # Arrange
+        patterns = compile_patterns([r"\d{3}-\d{2}", r"\d{3}-\d{2}-\d{4}"])
+        matcher = Matcher(patterns)
+
+        # Act
+        matches = matcher.scan("id 123-45-6789")
+
+        # Assert
+        self.assertEqual(matches, [PatternMatch(1, 3, 9), PatternMatch(2, 3, 14)])
+
+
+class TestPrefilter(TestCase):
+    def test_required_literal(self):
+        self.assertEqual(
+            required_literal(re.compile(r"\bpassword[:=]\s*\S+")), "password"
+        )
+        self.assertEqual(required_literal(re.compile(r"AKIA[0-9A-Z]{16}")), "AKIA")
+        self.assertIsNone(required_literal(re.compile(r"(?i)password")))
+        self.assertIsNone(required_literal(re.compile(r"cat|dog")))
+        self.assertIsNone(required_literal(re.compile(r"\d{3}-\d{2}")))
+
+    def test_requires_digit(self):
+        self.assertTrue(requires_digit(re.compile(r"\b\d{3}-\d{2}-\d{4}\b")))
+        self.assertTrue(requires_digit(re.compile(r"(?:\d[ -]*?){13,16}")))
+        self.assertTrue(requires_digit(re.compile(r"ID-[0-9]+")))
+        self.assertFalse(requires_digit(re.compile(r"\d*x")))
+        self.assertFalse(requires_digit(re.compile(r"[^0-9]+")))
+        self.assertFalse(requires_digit(re.compile(r"\d+|none")))
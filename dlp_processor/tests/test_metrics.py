@@ -0,0 +1,79 @@
+from unittest import IsolatedAsyncioTestCase, TestCase
+from unittest.mock import MagicMock
+
+from metrics import Counter, Gauge, Histogram, MetricsServer
+
+
+class TestMetrics(TestCase):
+    def test_counter_with_labels(self):
+        # Arrange
+        counter = Counter("test_hits_total", "Hits.", ("pattern_id", "source"))
+
+        # Act
+        counter.labels(1, "file").inc()
+        counter.labels(1, "file").inc(2)
+        counter.labels(2, 'say "hi"').inc()
+
+        # Assert
+        self.assertEqual(
+            counter.render(),
+            "# HELP test_hits_total Hits.\n"
+            "# TYPE test_hits_total counter\n"
+            'test_hits_total{pattern_id="1",source="file"} 3\n'
+            'test_hits_total{pattern_id="2",source="say \\"hi\\""} 1\n',
+        )
+
+    def test_gauge(self):
+        # Arrange
+        gauge = Gauge("test_in_flight", "In flight.")
+
+        # Act
+        gauge.inc()
+        gauge.inc()
+        gauge.dec()
+
+        # Assert
+        self.assertIn("test_in_flight 1\n", gauge.render())
+
+    def test_histogram_buckets_are_cumulative(self):
+        # Arrange
+        histogram = Histogram("test_seconds", "Seconds.", ("stage",), buckets=(0.1, 1))
+
+        # Act
+        for value in (0.05, 0.5, 5):
+            histogram.labels("download").observe(value)
+
+        # Assert
+        self.assertEqual(
+            histogram.render().splitlines()[2:],
+            [
+                'test_seconds_bucket{stage="download",le="0.1"} 1',
+                'test_seconds_bucket{stage="download",le="1"} 2',
+                'test_seconds_bucket{stage="download",le="+Inf"} 3',
+                'test_seconds_sum{stage="download"} 5.55',
+                'test_seconds_count{stage="download"} 3',
+            ],
+        )
+
+    def test_histogram_times_block(self):
+        # Arrange
+        histogram = Histogram("test_block_seconds", "Seconds.")
+
+        # Act
+        with self.assertRaises(ValueError):
+            with histogram.time():
+                raise ValueError()
+
+        # Assert
+        self.assertEqual(histogram.labels().count, 1)
+
+
+class TestMetricsServer(IsolatedAsyncioTestCase):
+    async def test_serves_processor_metrics(self):
+        # Act
+        response = await MetricsServer(port=0).handle_metrics(MagicMock())
+
+        # Assert
+        self.assertTrue(response.content_type.startswith("text/plain"))
+        self.assertIn("# TYPE dlp_stage_seconds histogram", response.text)
+        self.assertIn("dlp_tasks_in_flight", response.text)
@@ -0,0 +1,200 @@
+from unittest import IsolatedAsyncioTestCase, TestCase
+from unittest.mock import AsyncMock, patch
+
+from patterns import PatternSet, PatternStore, pattern_set_version
+
+PATTERNS = [
+    {"id": 1, "name": "SSN", "regex_pattern": r"\b\d{3}-\d{2}-\d{4}\b"},
+    {
+        "id": 2,
+        "name": "Credit Card",
+        "regex_pattern": r"\b\d{4}-?\d{4}-?\d{4}-?\d{4}\b",
+    },
+]
+
+
+class TestPatternSet(TestCase):
+    def test_compiles_patterns(self):
+        # Act
+        pattern_set = PatternSet(PATTERNS, version="v1")
+
+        # Assert
+        self.assertEqual(len(pattern_set), 2)
+        self.assertEqual([p.id for p in pattern_set.patterns], [1, 2])
+        self.assertTrue(pattern_set.patterns[0].regex.search("SSN 123-45-6789"))
+
+    def test_skips_invalid_patterns(self):
+        # Arrange
+        patterns = PATTERNS + [
+            {"id": 3, "name": "Broken", "regex_pattern": "(unclosed"}
+        ]
+
+        # Act
+        pattern_set = PatternSet(patterns, version="v1")
+
+        # Assert
+        self.assertEqual([p.id for p in pattern_set.patterns], [1, 2])
+
+
+class TestPatternStore(IsolatedAsyncioTestCase):
+    @patch("patterns.fetch_patterns", new_callable=AsyncMock)
+    async def test_get_caches_within_ttl(self, mock_fetch_patterns):
+        # Arrange
+        mock_fetch_patterns.return_value = (PATTERNS, '"v1"')
+        store = PatternStore(ttl=60)
+
+        # Act
+        first = await store.get()
+        second = await store.get()
+
+        # Assert
+        mock_fetch_patterns.assert_awaited_once_with(None)
+        self.assertIs(first, second)
+        self.assertEqual(first.version, '"v1"')
+
+    @patch("patterns.fetch_patterns", new_callable=AsyncMock)
+    async def test_revalidates_with_etag_after_ttl(self, mock_fetch_patterns):
+        # Arrange
+        mock_fetch_patterns.side_effect = [(PATTERNS, '"v1"'), (None, '"v1"')]
+        store = PatternStore(ttl=0)
+
+        # Act
+        first = await store.get()
+        second = await store.get()
+
+        # Assert
+        self.assertEqual(mock_fetch_patterns.await_args_list[1].args, ('"v1"',))
+        self.assertIs(first, second)
+
+    @patch("patterns.fetch_patterns", new_callable=AsyncMock)
+    async def test_rebuilds_when_version_changes(self, mock_fetch_patterns):
+        # Arrange
+        mock_fetch_patterns.side_effect = [(PATTERNS, '"v1"'), (PATTERNS[:1], '"v2"')]
+        store = PatternStore(ttl=60)
+
+        # Act
+        first = await store.get()
+        store.invalidate()
+        second = await store.get()
+
+        # Assert
+        self.assertEqual(len(first), 2)
+        self.assertEqual(len(second), 1)
+        self.assertEqual(second.version, '"v2"')
+
+    @patch("patterns.fetch_patterns", new_callable=AsyncMock)
+    async def test_version_falls_back_to_content_hash(self, mock_fetch_patterns):
+        # Arrange
+        mock_fetch_patterns.return_value = (PATTERNS, None)
+        store = PatternStore(ttl=60)
+
+        # Act
+        pattern_set = await store.get()
+
+        # Assert
+        self.assertEqual(pattern_set.version, pattern_set_version(PATTERNS))
+
+    @patch("patterns.fetch_patterns", new_callable=AsyncMock)
+    async def test_failed_first_fetch_is_retried(self, mock_fetch_patterns):
+        # Arrange
+        mock_fetch_patterns.side_effect = [(None, None), (PATTERNS, '"v1"')]
+        store = PatternStore(ttl=60)
+
+        # Act
+        first = await store.get()
+        second = await store.get()
+
+        # Assert
+        self.assertEqual(len(first), 0)
+        self.assertEqual(len(second), 2)
+
+    @patch("patterns.fetch_patterns", new_callable=AsyncMock)
+    async def test_push_mode_does_not_poll(self, mock_fetch_patterns):
+        # Arrange
+        mock_fetch_patterns.side_effect = [(PATTERNS, '"v1"'), (PATTERNS[:1], '"v2"')]
+        store = PatternStore(ttl=0, push_ttl=300)
+        store.enable_push()
+
+        # Act
+        with patch("patterns.time.monotonic", return_value=1000.0):
+            first = await store.get()
+            second = await store.get()
+        # A missed announcement is caught up with once push_ttl is over
+        with patch("patterns.time.monotonic", return_value=1301.0):
+            third = await store.get()
+
+        # Assert
+        self.assertIs(first, second)
+        self.assertEqual(mock_fetch_patterns.await_count, 2)
+        self.assertEqual(third.version, '"v2"')
+
+    @patch("patterns.fetch_patterns", new_callable=AsyncMock)
+    async def test_pattern_event_swaps_in_new_version(self, mock_fetch_patterns):
+        # Arrange
+        mock_fetch_patterns.side_effect = [(PATTERNS, '"v1"'), (PATTERNS[:1], '"v2"')]
+        store = PatternStore(ttl=60)
+        store.enable_push()
+        first = await store.get()
+
+        # Act
+        await store.on_pattern_event({"version": '"v2"'})
+        second = await store.get()
+
+        # Assert
+        self.assertEqual(mock_fetch_patterns.await_args_list[1].args, ('"v1"',))
+        self.assertEqual(len(first), 2)
+        self.assertEqual(second.version, '"v2"')
+
+    @patch("patterns.fetch_patterns", new_callable=AsyncMock)
+    async def test_pattern_event_waits_for_announced_version(
+        self, mock_fetch_patterns
+    ):
+        # Arrange: the first webserver process asked still serves v1
+        mock_fetch_patterns.side_effect = [
+            (PATTERNS, '"v1"'),
+            (None, '"v1"'),
+            (PATTERNS[:1], '"v2"'),
+        ]
+        store = PatternStore(ttl=60, event_retry_delay=0)
+        store.enable_push()
+        await store.get()
+
+        # Act
+        await store.on_pattern_event({"version": '"v2"'})
+
+        # Assert
+        self.assertEqual(mock_fetch_patterns.await_count, 3)
+        self.assertEqual((await store.get()).version, '"v2"')
+
+    @patch("patterns.fetch_patterns", new_callable=AsyncMock)
+    async def test_pattern_event_gives_up_after_max_attempts(
+        self, mock_fetch_patterns
+    ):
+        # Arrange
+        mock_fetch_patterns.side_effect = [(PATTERNS, '"v1"')] + [(None, '"v1"')] * 3
+        store = PatternStore(ttl=60, event_retry_delay=0, event_max_attempts=3)
+        store.enable_push()
+        await store.get()
+
+        # Act
+        with self.assertLogs("patterns", "WARNING"):
+            await store.on_pattern_event({"version": '"v2"'})
+
+        # Assert: left to the push_ttl revalidation
+        self.assertEqual(mock_fetch_patterns.await_count, 4)
+        self.assertEqual((await store.get()).version, '"v1"')
+
+    @patch("patterns.fetch_patterns", new_callable=AsyncMock)
+    async def test_pattern_event_for_loaded_version_is_ignored(
+        self, mock_fetch_patterns
+    ):
+        # Arrange
+        mock_fetch_patterns.return_value = (PATTERNS, '"v1"')
+        store = PatternStore(ttl=60)
+        await store.get()
+
+        # Act
+        await store.on_pattern_event({"version": '"v1"'})
+
+        # Assert
+        mock_fetch_patterns.assert_awaited_once()
@@ -0,0 +1,106 @@
+import io
+import re
+from unittest import TestCase
+
+from extractors import (
+    ExtractionLimits,
+    extract_pdf,
+    extract_text_from_pdf,
+    iter_pdf_pages,
+)
+from matcher import Matcher
+from patterns import CompiledPattern, PatternSet
+from scanning import scan_document, scan_pages
+
+from tests.pdf import make_pdf
+
+
+class TestScanning(TestCase):
+    def setUp(self):
+        self.pattern_set = PatternSet(
+            [
+                {"id": 1, "name": "SSN", "regex_pattern": r"\d{3}-\d{2}-\d{4}"},
+                {"id": 2, "name": "Secret", "regex_pattern": r"secret"},
+            ],
+            version="v1",
+        )
+
+    def test_pages_match_extract_text(self):
+        # Arrange
+        content = make_pdf(["first page", "second page", "third page"])
+
+        # Act
+        pages = list(iter_pdf_pages(io.BytesIO(content)))
+
+        # Assert
+        self.assertEqual(len(pages), 3)
+        self.assertEqual("".join(pages), extract_text_from_pdf(io.BytesIO(content)))
+
+    def test_scan_pdf_reports_page_of_each_match(self):
+        # Arrange
+        content = make_pdf(["nothing here", "SSN 123-45-6789", "a secret"])
+
+        # Act
+        results = scan_document(
+            content, extract_pdf, "v1", self.pattern_set.patterns, ExtractionLimits()
+        )
+
+        # Assert
+        self.assertEqual([match.pattern_id for match, _ in results], [1, 2])
+        match, text = results[0]
+        self.assertEqual(text[match.start : match.end], "123-45-6789")
+
+    def test_full_extraction_mode(self):
+        # Arrange
+        content = make_pdf(["SSN 123-45-6789", "a secret"])
+
+        # Act
+        limits = ExtractionLimits(streaming=False)
+        results = scan_document(
+            content, extract_pdf, "v1", self.pattern_set.patterns, limits
+        )
+
+        # Assert
+        self.assertEqual([match.pattern_id for match, _ in results], [1, 2])
+
+    def test_stops_once_every_pattern_matched(self):
+        # Arrange
+        pages_read = []
+
+        def pages():
+            for text in ["a secret", "SSN 123-45-6789", "unread", "unread"]:
+                pages_read.append(text)
+                yield text
+
+        # Act
+        results = scan_pages(pages(), self.pattern_set.matcher)
+
+        # Assert
+        self.assertEqual(len(results), 2)
+        self.assertEqual(len(pages_read), 2)
+
+    def test_stops_on_first_hit(self):
+        # Arrange
+        pages_read = []
+
+        def pages():
+            for text in ["a secret", "SSN 123-45-6789"]:
+                pages_read.append(text)
+                yield text
+
+        # Act
+        results = scan_pages(pages(), self.pattern_set.matcher, stop_on_first=True)
+
+        # Assert
+        self.assertEqual([match.pattern_id for match, _ in results], [2])
+        self.assertEqual(len(pages_read), 1)
+
+    def test_finds_matches_across_page_breaks(self):
+        # Arrange
+        matcher = Matcher([CompiledPattern(1, "SSN", re.compile(r"123-45-6789"))])
+
+        # Act
+        results = scan_pages(iter(["SSN 123-", "45-6789"]), matcher)
+
+        # Assert
+        self.assertEqual(len(results), 1)
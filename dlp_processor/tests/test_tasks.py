@@ -0,0 +1,147 @@
+import asyncio
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import AsyncMock, patch
+
+from enums import SourceType
+from matcher import PatternMatch
+from patterns import PatternSet
+from tasks import scan_file_task, scan_message_task
+
+PATTERN_SET = PatternSet(
+    [
+        {"id": 1, "name": "SSN", "regex_pattern": r"\b\d{3}-\d{2}-\d{4}\b"},
+        {"id": 2, "name": "Secret", "regex_pattern": r"secret"},
+    ],
+    version="v1",
+)
+
+
+@patch("utils.SCAN_TIMEOUT", 0)
+@patch("tasks.create_caught_messages", new_callable=AsyncMock)
+@patch("tasks.scan_file", new_callable=AsyncMock)
+@patch("tasks.pattern_store")
+class TestScanMessageTask(IsolatedAsyncioTestCase):
+    async def test_sends_one_batch_per_message(
+        self, mock_pattern_store, mock_scan_file, mock_create_caught_messages
+    ):
+        # Arrange
+        mock_pattern_store.get = AsyncMock(return_value=PATTERN_SET)
+        mock_scan_file.return_value = [(PatternMatch(2, 0, 6), "secret page")]
+        additional_info = {
+            "user": "U123",
+            "channel": "C123",
+            "ts": "1624325400.000200",
+            "files": [{"id": "F1", "name": "leak.pdf", "filetype": "pdf"}],
+        }
+
+        # Act
+        await scan_message_task("SSN 123-45-6789 is a secret", additional_info)
+
+        # Assert
+        mock_create_caught_messages.assert_awaited_once()
+        caught_messages = mock_create_caught_messages.await_args.args[0]
+        self.assertEqual(
+            [(m["pattern_matched"], m["source_type"]) for m in caught_messages],
+            [(1, SourceType.MESSAGE), (2, SourceType.MESSAGE), (2, SourceType.FILE)],
+        )
+        self.assertEqual(caught_messages[2]["file_id"], "F1")
+        self.assertEqual(caught_messages[2]["message_content"], "secret page")
+
+    async def test_clean_message_sends_nothing(
+        self, mock_pattern_store, mock_scan_file, mock_create_caught_messages
+    ):
+        # Arrange
+        mock_pattern_store.get = AsyncMock(return_value=PATTERN_SET)
+
+        # Act
+        await scan_message_task("hello", {"user": "U123", "channel": "C123"})
+
+        # Assert
+        mock_create_caught_messages.assert_awaited_once_with([])
+        mock_scan_file.assert_not_awaited()
+
+    @patch("tasks.MESSAGE_FILE_CONCURRENCY", 2)
+    async def test_scans_attachments_concurrently(
+        self, mock_pattern_store, mock_scan_file, mock_create_caught_messages
+    ):
+        # Arrange
+        mock_pattern_store.get = AsyncMock(return_value=PATTERN_SET)
+        running, peak = 0, 0
+
+        async def scan_file(file_info, pattern_set):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return [(PatternMatch(2, 0, 6), f"secret in {file_info['id']}")]
+
+        mock_scan_file.side_effect = scan_file
+        files = [{"id": f"F{index}", "name": f"{index}.pdf"} for index in range(5)]
+        additional_info = {"user": "U123", "channel": "C123", "files": files}
+
+        # Act
+        await scan_message_task("hello", additional_info)
+
+        # Assert
+        self.assertEqual(peak, 2)
+        caught_messages = mock_create_caught_messages.await_args.args[0]
+        self.assertEqual(
+            [m["file_id"] for m in caught_messages], ["F0", "F1", "F2", "F3", "F4"]
+        )
+        self.assertNotIn("source_type", additional_info)
+        self.assertNotIn("file_id", additional_info)
+
+    async def test_failed_attachment_does_not_drop_others(
+        self, mock_pattern_store, mock_scan_file, mock_create_caught_messages
+    ):
+        # Arrange
+        mock_pattern_store.get = AsyncMock(return_value=PATTERN_SET)
+        mock_scan_file.side_effect = [
+            RuntimeError("broken file"),
+            [(PatternMatch(2, 0, 6), "secret page")],
+        ]
+        files = [{"id": "F1"}, {"id": "F2"}]
+
+        # Act
+        with self.assertLogs("tasks", level="ERROR"):
+            await scan_message_task("hello", {"files": files})
+
+        # Assert
+        caught_messages = mock_create_caught_messages.await_args.args[0]
+        self.assertEqual([m["file_id"] for m in caught_messages], ["F2"])
+
+
+@patch("tasks.create_caught_messages", new_callable=AsyncMock)
+@patch("tasks.scan_file", new_callable=AsyncMock)
+@patch("tasks.pattern_store")
+class TestScanFileTask(IsolatedAsyncioTestCase):
+    async def test_sends_caught_messages_of_one_file(
+        self, mock_pattern_store, mock_scan_file, mock_create_caught_messages
+    ):
+        # Arrange
+        mock_pattern_store.get = AsyncMock(return_value=PATTERN_SET)
+        mock_scan_file.return_value = [(PatternMatch(2, 0, 6), "secret page")]
+        file_info = {"id": "F1", "name": "leak.pdf", "filetype": "pdf"}
+
+        # Act
+        await scan_file_task(file_info, {"user": "U123", "channel": "C123"})
+
+        # Assert
+        mock_scan_file.assert_awaited_once_with(file_info, PATTERN_SET)
+        [caught_message] = mock_create_caught_messages.await_args.args[0]
+        self.assertEqual(caught_message["source_type"], SourceType.FILE)
+        self.assertEqual(caught_message["file_id"], "F1")
+        self.assertEqual(caught_message["channel"], "C123")
+
+    async def test_failure_is_raised_for_retry(
+        self, mock_pattern_store, mock_scan_file, mock_create_caught_messages
+    ):
+        # Arrange
+        mock_pattern_store.get = AsyncMock(return_value=PATTERN_SET)
+        mock_scan_file.side_effect = RuntimeError("broken file")
+
+        # Act / Assert
+        with self.assertRaises(RuntimeError):
+            await scan_file_task({"id": "F1"}, {})
+        mock_create_caught_messages.assert_not_awaited()
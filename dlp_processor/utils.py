@@ -1,24 +1,69 @@
-import io
+import asyncio
+import hashlib
 import logging
 import os
-from typing import Optional
+import zipfile
+from concurrent.futures.process import BrokenProcessPool
+from typing import TYPE_CHECKING, Optional
+from xml.etree.ElementTree import ParseError
 
 import aiohttp
+
+from downloads import Download, DownloadBuffer, DownloadTooLarge
 from enums import SourceType
-from pdfminer.high_level import extract_text
+from extraction import extraction_pool, scan_pool
+from extractors import (
+    ExtractionLimitExceeded,
+    ExtractionLimits,
+    Extractor,
+    find_extractor,
+)
+from file_cache import file_scan_cache
+from http_client import http_client
+from matcher import PatternMatch
+from metrics import SCAN_TIMEOUTS_TOTAL, STAGE_SECONDS
+from scanning import MatcherMissing, scan_document, scan_text
+
+if TYPE_CHECKING:
+    from patterns import PatternSet
 
 logger = logging.getLogger(__name__)
 
 
-def extract_text_from_pdf(content) -> str:
-    with io.BytesIO(content) as f:
-        text = extract_text(f)
-    return text
+def env_flag(name: str, default: bool = False) -> bool:
+    return os.getenv(name, str(default)).lower() in ("1", "true", "yes")
+
+
+MAX_FILE_BYTES = int(os.getenv("MAX_FILE_BYTES", str(50 * 1024 * 1024)))
+DOWNLOAD_CHUNK_BYTES = int(os.getenv("DOWNLOAD_CHUNK_BYTES", str(64 * 1024)))
+MAX_PDF_PAGES = int(os.getenv("MAX_PDF_PAGES", "500"))
+PDF_STREAMING = env_flag("PDF_STREAMING", default=True)
+STOP_ON_FIRST_MATCH = env_flag("STOP_ON_FIRST_MATCH")
+# Characters of context kept on each side of a match in its snippet
+SNIPPET_CONTEXT_CHARS = int(os.getenv("SNIPPET_CONTEXT_CHARS", "100"))
+# Longer matches are cut in the snippet, their offsets are still exact
+SNIPPET_MAX_MATCH_CHARS = int(os.getenv("SNIPPET_MAX_MATCH_CHARS", "500"))
+# Seconds a message text scan may take, 0 scans in the event loop without a limit
+SCAN_TIMEOUT = float(os.getenv("SCAN_TIMEOUT", "5"))
 
+EXTRACTION_LIMITS = ExtractionLimits(
+    max_pages=MAX_PDF_PAGES,
+    streaming=PDF_STREAMING,
+    max_archive_members=int(os.getenv("ARCHIVE_MAX_MEMBERS", "1000")),
+    max_archive_bytes=int(os.getenv("ARCHIVE_MAX_BYTES", str(200 * 1024 * 1024))),
+    max_archive_depth=int(os.getenv("ARCHIVE_MAX_DEPTH", "2")),
+)
 
-async def fetch_patterns() -> list[dict]:
+
+async def fetch_patterns(
+    etag: Optional[str] = None,
+) -> tuple[Optional[list[dict]], Optional[str]]:
     """
     Retrieve the list of patterns from the webserver.
+
+    When ``etag`` is given the request is conditional. Returns a
+    ``(patterns, etag)`` tuple where ``patterns`` is None if the webserver
+    answered 304 Not Modified or the request failed.
     """
 
     auth_token = os.getenv("WEBSERVER_API_KEY")
@@ -28,38 +73,48 @@ async def fetch_patterns() -> list[dict]:
     headers = {
         "Authorization": f"Api-Key {auth_token}",
     }
+    if etag:
+        headers["If-None-Match"] = etag
 
-    async with aiohttp.ClientSession() as session:
+    session = await http_client.get_session()
+    with STAGE_SECONDS.labels("pattern_fetch").time():
         async with session.get(api_url, headers=headers) as response:
             if response.status == 200:
                 data = await response.json()
-                return data
+                return data, response.headers.get("ETag")
+            elif response.status == 304:
+                return None, etag
             else:
                 print(f"Failed to fetch patterns: {response.status}")
-                return []
+                return None, None
 
 
-async def create_caught_message(
-    match_id: str, content: str, additional_info: dict
-) -> None:
+def match_snippet(match: PatternMatch, content: str) -> str:
     """
-    Send a POST request to create a caught message.
+    The match with up to SNIPPET_CONTEXT_CHARS of context on each side.
     """
-    auth_token = os.getenv("WEBSERVER_API_KEY")
-    webserver_base_url = os.getenv("WEBSERVER_BASE_URL")
-    api_url = f"{webserver_base_url}/api/caught_messages/"
+    start = max(0, match.start - SNIPPET_CONTEXT_CHARS)
+    end = min(match.end, match.start + SNIPPET_MAX_MATCH_CHARS)
+    return content[start : end + SNIPPET_CONTEXT_CHARS]
 
-    headers = {
-        "Authorization": f"Api-Key {auth_token}",
-        "Content-Type": "application/json",
-    }
 
-    payload = {
+def build_caught_message(
+    match: PatternMatch, content: str, additional_info: dict
+) -> dict:
+    """
+    Build the payload of a caught message for the webserver: a snippet and
+    the offsets of the match, and the content it was found in with its hash.
+    """
+    return {
         "user_id": additional_info.get("user"),
         "channel": additional_info.get("channel"),
         "timestamp": additional_info.get("ts"),
-        "pattern_matched": match_id,
-        "message_content": content,
+        "pattern_matched": match.pattern_id,
+        "message_content": match_snippet(match, content),
+        "match_start": match.start,
+        "match_end": match.end,
+        "content_hash": hashlib.sha256(content.encode()).hexdigest(),
+        "content": content,
         "file_name": (
             additional_info.get("file_name")
             if additional_info.get("source_type") == SourceType.FILE
@@ -73,46 +128,218 @@ async def create_caught_message(
         "source_type": additional_info.get("source_type"),
     }
 
-    async with aiohttp.ClientSession() as session:
+
+async def create_caught_messages(caught_messages: list[dict]) -> None:
+    """
+    Send a single POST request creating a batch of caught messages.
+
+    The content several caught messages were found in is sent only with the
+    first of them, the others refer to it by its hash. A failed request raises
+    ``aiohttp.ClientResponseError``, so the task is retried or dead-lettered
+    rather than losing the hits.
+    """
+    if not caught_messages:
+        return
+
+    payload = []
+    sent_contents = set()
+    for caught_message in caught_messages:
+        item = dict(caught_message)
+        if item.get("content_hash") in sent_contents:
+            item.pop("content", None)
+        else:
+            sent_contents.add(item.get("content_hash"))
+        payload.append(item)
+
+    auth_token = os.getenv("WEBSERVER_API_KEY")
+    webserver_base_url = os.getenv("WEBSERVER_BASE_URL")
+    api_url = f"{webserver_base_url}/api/caught_messages/bulk/"
+
+    headers = {
+        "Authorization": f"Api-Key {auth_token}",
+        "Content-Type": "application/json",
+    }
+
+    session = await http_client.get_session()
+    with STAGE_SECONDS.labels("caught_message_post").time():
         async with session.post(api_url, headers=headers, json=payload) as response:
             if response.status == 201:
-                print(f"Caught message created: {payload}")
+                print(f"Caught messages created: {len(caught_messages)}")
             else:
-                logger.error(f"Failed to create caught message: {response.status}")
+                logger.error(f"Failed to create caught messages: {response.status}")
                 error_data = await response.text()
                 logger.error(f"Error details: {error_data}")
+                response.raise_for_status()
 
 
-async def download_file(url: str, token: str) -> Optional[bytes]:
+async def download_file(
+    url: str, token: str, max_bytes: int = MAX_FILE_BYTES
+) -> Optional[Download]:
     """
     Downloads a file from a given URL using an authorization token.
+
+    The body is streamed in chunks; files over ``max_bytes`` are abandoned and
+    large ones are spilled to a temporary file instead of being kept in memory.
+    The caller must ``cleanup`` the returned Download.
     """
-    async with aiohttp.ClientSession() as session:
-        async with session.get(
-            url, headers={"Authorization": f"Bearer {token}"}
-        ) as response:
-            if response.status == 200:
-                return await response.read()
+    session = await http_client.get_session()
+    with STAGE_SECONDS.labels("download").time():
+        return await _download(session, url, token, max_bytes)
 
-            else:
-                logger.error(f"Failed to download file: {response.status}")
-                return None
 
+async def _download(
+    session: aiohttp.ClientSession, url: str, token: str, max_bytes: int
+) -> Optional[Download]:
+    async with session.get(
+        url, headers={"Authorization": f"Bearer {token}"}
+    ) as response:
+        if response.status != 200:
+            logger.error(f"Failed to download file: {response.status}")
+            return None
+
+        if (response.content_length or 0) > max_bytes:
+            logger.error(f"File at {url} exceeds {max_bytes} bytes")
+            return None
+
+        buffer = DownloadBuffer(max_bytes)
+        try:
+            async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_BYTES):
+                buffer.write(chunk)
+        except DownloadTooLarge:
+            buffer.abort()
+            logger.error(f"File at {url} exceeds {max_bytes} bytes")
+            return None
+        except BaseException:
+            buffer.abort()
+            raise
 
-async def process_file(file_info: dict) -> Optional[str]:
+        return buffer.finish()
+
+
+async def scan_message_text(text: str, pattern_set: "PatternSet") -> list[PatternMatch]:
     """
-    Download the file and process it based on its type.
+    Scan the text of a message within SCAN_TIMEOUT seconds.
+
+    The scan runs in a worker of the scan pool, which is killed when it takes
+    too long, so a pattern that backtracks catastrophically can't stall the
+    processor. A scan that timed out or whose worker died is raised, so the
+    Manager retries the message and eventually dead-letters it.
+    """
+    if not text or not pattern_set.patterns:
+        return []
+    if not SCAN_TIMEOUT:
+        return pattern_set.matcher.scan(text)
+
+    try:
+        try:
+            return await scan_pool.run(
+                scan_text, text, pattern_set.version, timeout=SCAN_TIMEOUT
+            )
+        except MatcherMissing:
+            # Sent once per worker and pattern set version
+            return await scan_pool.run(
+                scan_text,
+                text,
+                pattern_set.version,
+                pattern_set.patterns,
+                timeout=SCAN_TIMEOUT,
+            )
+    except asyncio.TimeoutError:
+        logger.error(
+            f"Timed out scanning a message of {len(text)} characters with "
+            f"patterns {pattern_set.version}, check them with benchmark_patterns"
+        )
+        SCAN_TIMEOUTS_TOTAL.labels(SourceType.MESSAGE.value).inc()
+        raise
+    except BrokenProcessPool:
+        logger.error(f"Scan worker died scanning a message of {len(text)} characters")
+        raise
+
+
+async def scan_file(
+    file_info: dict, pattern_set: "PatternSet"
+) -> list[tuple[PatternMatch, str]]:
+    """
+    Download the file and scan it based on its type.
+
+    Returns every pattern hit together with the text its offsets refer to.
     """
     token = os.getenv("SLACK_BOT_TOKEN")
     url = file_info.get("url_private") or ""
     filetype = file_info.get("filetype")
+    file_id = file_info.get("id")
 
-    content = await download_file(url, str(token))
-    if not content:
-        return None
+    if not pattern_set.patterns:
+        return []
 
-    if filetype == "pdf":
-        return extract_text_from_pdf(content)
-    else:
+    extractor = find_extractor(
+        filetype, file_info.get("mimetype"), file_info.get("name")
+    )
+    if extractor is None:
         logger.error(f"Unsupported file type: {filetype}")
-        return None
+        return []
+
+    if (file_info.get("size") or 0) > MAX_FILE_BYTES:
+        logger.error(f"File {file_info.get('id')} exceeds {MAX_FILE_BYTES} bytes")
+        return []
+
+    # Results depend on the patterns and on the settings that bound the scan
+    scan_key = (
+        f"{pattern_set.version}:{extractor.__name__}:"
+        f"{EXTRACTION_LIMITS}:{STOP_ON_FIRST_MATCH}"
+    )
+
+    digest = file_scan_cache.get_hash(file_id) if file_id else None
+    if digest is not None:
+        results = file_scan_cache.get(digest, scan_key)
+        if results is not None:
+            logger.info(f"Reusing scan results of file {file_id}")
+            return results
+
+    download = await download_file(url, str(token))
+    if not download or not download.size:
+        return []
+
+    try:
+        return await scan_download(download, extractor, file_id, pattern_set, scan_key)
+    finally:
+        download.cleanup()
+
+
+async def scan_download(
+    download: Download,
+    extractor: Extractor,
+    file_id: Optional[str],
+    pattern_set: "PatternSet",
+    scan_key: str,
+) -> list[tuple[PatternMatch, str]]:
+    results = file_scan_cache.get(download.sha256, scan_key)
+    if results is not None:
+        logger.info(f"Reusing scan results of identical content for file {file_id}")
+        file_scan_cache.put(file_id, download.sha256, scan_key, results)
+        return results
+
+    try:
+        with STAGE_SECONDS.labels("extraction").time():
+            results = await extraction_pool.run(
+                scan_document,
+                download.source,
+                extractor,
+                pattern_set.version,
+                pattern_set.patterns,
+                EXTRACTION_LIMITS,
+                STOP_ON_FIRST_MATCH,
+            )
+    except asyncio.TimeoutError:
+        logger.error(f"Timed out scanning {file_id}")
+        SCAN_TIMEOUTS_TOTAL.labels(SourceType.FILE.value).inc()
+        return []
+    except (ExtractionLimitExceeded, zipfile.BadZipFile, ParseError) as e:
+        logger.error(f"Could not scan {file_id}: {e}")
+        return []
+    except BrokenProcessPool:
+        logger.error(f"Extraction worker died scanning {file_id}")
+        raise
+
+    file_scan_cache.put(file_id, download.sha256, scan_key, results)
+    return results